@@ -0,0 +1,61 @@
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+import repository
+from database import engine
+from settings import CONFIG_SYNC_S
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigSync:
+    """
+    Mantém a configuração igual em todos os workers. Quem salva o .env soma 1
+    à versão no banco (`publish`); os demais conferem a versão no máximo a cada
+    CONFIG_SYNC_S segundos, antes de atender um pedido, e chamam `reload` quando
+    ela mudou.
+    """
+
+    def __init__(self):
+        self.reload: Optional[Callable[[], Awaitable[None]]] = None
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+
+    async def start(self):
+        """Registra a versão atual sem recarregar (o .env acabou de ser lido)."""
+        if engine is None:
+            return
+        try:
+            self.version = await repository.config.version()
+        except Exception as e:
+            logger.warning(f"Versão da configuração indisponível: {e}")
+        self._checked_at = time.monotonic()
+
+    async def publish(self):
+        """Avisa os outros workers que o .env mudou (este já se recarregou)."""
+        self.version = await repository.config.bump()
+        self._checked_at = time.monotonic()
+
+    async def check(self):
+        if engine is None or time.monotonic() - self._checked_at < CONFIG_SYNC_S:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            version = await repository.config.version()
+        except Exception as e:
+            logger.warning(f"Não foi possível conferir a versão da configuração: {e}")
+            return
+        if version == self.version:
+            return
+        logger.info(f"Configuração alterada por outro worker (versão {version}); recarregando")
+        if self.reload:
+            await self.reload()
+        self.version = version
+
+    async def middleware(self, request, call_next):
+        await self.check()
+        return await call_next(request)
+
+
+config_sync = ConfigSync()
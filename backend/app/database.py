@@ -1,36 +1,80 @@
 import logging
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.orm import scoped_session
+import zlib
+from sqlalchemy import create_engine, event, inspect, text, Boolean, Column, Integer, String, DateTime
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import declarative_base
 from datetime import datetime
 import os
 
-logger = logging.getLogger(__name__)
+from locks import exclusive
+from migrations import apply_migrations
+from settings import (
+    DATABASE_FILE,
+    DATABASE_IS_SQLITE,
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE_S,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT_S,
+    LOCK_DIR,
+)
 
-# O banco de dados será um único arquivo dentro da sua pasta de dados
-DATABASE_FILE = "/app/data/boletim.db"
-DATABASE_URL = f"sqlite:///{DATABASE_FILE}"
+logger = logging.getLogger(__name__)
 
+# Por padrão o banco é um único arquivo dentro da sua pasta de dados;
+# com DATABASE_URL, um servidor PostgreSQL compartilhado por todos os processos
 try:
-    # Garante que o diretório /app/data exista
-    os.makedirs(os.path.dirname(DATABASE_FILE), exist_ok=True)
+    if DATABASE_IS_SQLITE:
+        # Garante que o diretório /app/data exista
+        os.makedirs(os.path.dirname(DATABASE_FILE), exist_ok=True)
 
-    engine = create_engine(DATABASE_URL, connect_args={
-                           "check_same_thread": False})
+        engine = create_engine(DATABASE_URL, connect_args={
+                               "check_same_thread": False,
+                               # Com vários workers, espera o lock do arquivo em vez de falhar na hora
+                               "timeout": 30})
 
-    # Configuração para sessões de banco de dados
-    db_session = scoped_session(sessionmaker(autocommit=False,
-                                             autoflush=False,
-                                             bind=engine))
-
-    Base = declarative_base()
-    Base.query = db_session.query_property()
+        @event.listens_for(engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL: leitores de um worker não bloqueiam a gravação de outro
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+    else:
+        # pre_ping descarta conexões que caíram enquanto estavam paradas no pool
+        # (reinício do servidor, failover) antes de entregá-las a uma consulta
+        engine = create_engine(DATABASE_URL,
+                               pool_size=DB_POOL_SIZE,
+                               max_overflow=DB_MAX_OVERFLOW,
+                               pool_timeout=DB_POOL_TIMEOUT_S,
+                               pool_recycle=DB_POOL_RECYCLE_S,
+                               pool_pre_ping=True)
+        logger.info(f"✓ Banco: {engine.url.render_as_string(hide_password=True)} "
+                    f"(pool {DB_POOL_SIZE}+{DB_MAX_OVERFLOW})")
 
 except Exception as e:
     logger.error(f"✗ Erro fatal ao inicializar o banco de dados: {e}")
     engine = None
-    db_session = None
-    Base = declarative_base()
+
+
+def insert_on_conflict(table):
+    """
+    INSERT com ON CONFLICT do banco em uso: os caches e cotas gravam com
+    on_conflict_do_update/do_nothing, que o SQLite e o PostgreSQL escrevem igual.
+    """
+    if engine is not None and engine.dialect.name == "postgresql":
+        return postgresql_insert(table)
+    return sqlite_insert(table)
+
+
+def advisory_key(name: str) -> int:
+    """Chave numérica estável para pg_advisory_lock a partir de um nome."""
+    return zlib.crc32(f"boletim:{name}".encode())
+
+
+# Sessões: ver repository.py (executadas fora do event loop)
+Base = declarative_base()
 
 
 # --- Definição da Tabela do Histórico ---
@@ -45,16 +89,169 @@ class Boletim(Base):
     summary_text = Column(String, nullable=False)
     audio_filename = Column(String, nullable=True)
     categories = Column(String, nullable=True)
+    # Preenchido quando o boletim foi pré-produzido por um agendamento ("pronto")
+    schedule_id = Column(Integer, nullable=True)
 
     def __repr__(self):
         return f'<Boletim {self.id} - {self.timestamp}>'
 
+class ProviderUsage(Base):
+    """
+    Consumo de cota por serviço externo e período ('2025-01-31' para cotas
+    diárias, '2025-01' para mensais). A unidade depende do serviço:
+    requisições no GNews, caracteres na ElevenLabs.
+    """
+    __tablename__ = 'provider_usage'
+    provider = Column(String, primary_key=True)
+    period = Column(String, primary_key=True)
+    used = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class HeadlineCache(Base):
+    """
+    Últimas manchetes obtidas por categoria (JSON), servidas quando a cota
+    do GNews está no fim ou o serviço falha.
+    """
+    __tablename__ = 'headline_cache'
+    category = Column(String, primary_key=True)
+    articles = Column(String, nullable=False)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+class ArticleSummary(Base):
+    """
+    Resumo de uma notícia para o rádio, gerado uma única vez por conteúdo
+    (hash de título + detalhes), estilo e modelo e reaproveitado nos boletins
+    seguintes, por até ARTICLE_SUMMARY_TTL_HOURS.
+    """
+    __tablename__ = 'article_summaries'
+    article_hash = Column(String, primary_key=True)
+    style = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    summary_text = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class SummaryCache(Base):
+    """
+    Texto completo de um boletim, indexado por modelo, estilo, abertura/
+    encerramento e hash do conjunto de notícias. Vale por SUMMARY_CACHE_TTL_HOURS.
+    """
+    __tablename__ = 'summary_cache'
+    cache_key = Column(String, primary_key=True)
+    summary_text = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ArticleBody(Base):
+    """
+    Texto principal extraído da página de uma notícia, por URL. Evita baixar
+    de novo a mesma página enquanto ela aparecer nas manchetes.
+    """
+    __tablename__ = 'article_bodies'
+    url = Column(String, primary_key=True)
+    body_text = Column(String, nullable=False)
+    fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class FeedCache(Base):
+    """
+    Último estado de cada feed RSS/Atom: validadores do GET condicional
+    (ETag, Last-Modified) e os itens já convertidos para o formato do coletor (JSON).
+    """
+    __tablename__ = 'feed_cache'
+    url = Column(String, primary_key=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    items = Column(String, nullable=False, default="[]")
+    checked_at = Column(DateTime, default=datetime.utcnow)
+
+class Schedule(Base):
+    """
+    Pré-produção de boletins: a expressão cron (no fuso SCHEDULE_TIMEZONE)
+    diz quando gerar um boletim com estas categorias e opções, para que ele
+    já esteja pronto na hora de ir ao ar.
+    """
+    __tablename__ = 'schedules'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    cron = Column(String, nullable=False)
+    categories = Column(String, nullable=False, default="geral")
+    num_articles = Column(Integer, nullable=False, default=10)
+    style = Column(String, nullable=False, default="jornalistico")
+    summary_mode = Column(String, nullable=True)
+    tts_engine = Column(String, nullable=False, default="gtts")
+    enabled = Column(Boolean, nullable=False, default=True)
+    next_run_at = Column(DateTime, nullable=True, index=True)
+    last_run_at = Column(DateTime, nullable=True)
+    last_boletim_id = Column(Integer, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ConfigVersion(Base):
+    """
+    Carimbo da configuração salva pela interface (.env). Cada gravação soma 1;
+    os demais workers comparam com a versão que carregaram e se recarregam.
+    """
+    __tablename__ = 'config_version'
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    """
+    Boletim gerado para cada idempotency_key, para que a repetição do pedido
+    receba o mesmo boletim mesmo caindo em outro worker.
+    """
+    __tablename__ = 'idempotency_keys'
+    key = Column(String, primary_key=True)
+    boletim_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Job(Base):
+    """
+    Fila de geração: a API grava o pedido (JSON) e um worker (`python -m worker`)
+    o reivindica, executa e grava o resultado ou o erro. `heartbeat_at` é
+    renovado enquanto o worker trabalha; parado por muito tempo, volta à fila.
+    """
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(String, nullable=False)
+    lane = Column(String, nullable=False, default="interactive")
+    status = Column(String, nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String, nullable=True)
+    result = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    error_status = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True, index=True)
+
 # --- Função de Inicialização ---
 
 
+def _add_missing_columns(conn):
+    """
+    Migração leve: create_all não altera tabelas existentes, então colunas
+    novas dos modelos são acrescentadas com ALTER TABLE (sempre anuláveis).
+    """
+    existing = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not existing.has_table(table.name):
+            continue
+        present = {c["name"] for c in existing.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            ddl_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}'))
+            logger.info(f"✓ Coluna {table.name}.{column.name} adicionada.")
+
+
 def init_db():
     """
-    Cria a tabela no banco de dados se ela não existir.
+    Cria as tabelas que faltam, acrescenta colunas novas e aplica as migrações
+    numeradas (migrations.py), tudo numa transação só.
     """
     if engine is None:
         logger.error(
@@ -64,7 +261,16 @@ def init_db():
     try:
         logger.info(
             "Inicializando o banco de dados e criando tabelas (se não existirem)...")
-        Base.metadata.create_all(bind=engine)
+        # Cada worker roda o init_db ao subir: um de cada vez, para que dois não
+        # tentem criar a mesma tabela ou coluna ao mesmo tempo
+        with exclusive(os.path.join(LOCK_DIR, "init_db.lock")), engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Processos em outras máquinas não enxergam a trava de arquivo;
+                # a do PostgreSQL vale até o fim da transação
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": advisory_key("init_db")})
+            Base.metadata.create_all(bind=conn)
+            _add_missing_columns(conn)
+            apply_migrations(conn)
         logger.info("✓ Banco de dados pronto.")
     except Exception as e:
         logger.error(f"✗ Erro ao criar tabelas do banco de dados: {e}")
@@ -1,10 +1,17 @@
 import os
 import logging
-from typing import Dict
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from locks import exclusive
+from settings import LOCK_DIR
 
 logger = logging.getLogger(__name__)
 
 ENV_FILE_PATH = '.env'
+# Trava compartilhada pelos workers: uma gravação por vez, leituras nunca veem o arquivo pela metade
+ENV_LOCK_PATH = os.path.join(LOCK_DIR, 'env.lock')
 
 
 def load_env_variables() -> Dict[str, str]:
@@ -26,7 +33,7 @@ def load_env_variables() -> Dict[str, str]:
         logger.warning(f"Arquivo .env não encontrado em {ENV_FILE_PATH}. Usando padrões.")
         return config
 
-    with open(ENV_FILE_PATH, 'r') as f:
+    with exclusive(ENV_LOCK_PATH, shared=True), open(ENV_FILE_PATH, 'r') as f:
         for line in f:
             line = line.strip()
             if line and not line.startswith('#') and '=' in line:
@@ -46,6 +53,12 @@ def load_env_variables() -> Dict[str, str]:
     return config
 
 
+def reload_environment():
+    """Recarrega o .env no os.environ (depois de uma gravação deste ou de outro worker)."""
+    with exclusive(ENV_LOCK_PATH, shared=True):
+        load_dotenv(ENV_FILE_PATH, override=True)
+
+
 def update_env_file(updates: Dict[str, str]) -> bool:
     """
     Atualiza com segurança o arquivo .env, preservando linhas e comentários.
@@ -56,37 +69,10 @@ def update_env_file(updates: Dict[str, str]) -> bool:
         return False
 
     try:
-        with open(ENV_FILE_PATH, 'r') as f:
-            lines = f.readlines()
-
-        keys_updated = set()
-
-        with open(ENV_FILE_PATH, 'w') as f:
-            for line in lines:
-                if line.strip().startswith('#') or not line.strip():
-                    f.write(line)
-                    continue
-
-                try:
-                    key, old_value = line.split('=', 1)
-                    key = key.strip()
-
-                    if key in updates:
-                        new_value = updates[key]
-                        if new_value is not None:
-                            f.write(f"{key}={new_value}\n")  # ← SEM aspas
-                            keys_updated.add(key)
-                        else:
-                            f.write(line)
-                    else:
-                        f.write(line)
-                except ValueError:
-                    f.write(line)
-
-            # Adiciona chaves novas que não existiam
-            for key, value in updates.items():
-                if key not in keys_updated and value is not None:
-                    f.write(f"{key}={value}\n")  # ← SEM aspas
+        with exclusive(ENV_LOCK_PATH):
+            with open(ENV_FILE_PATH, 'r') as f:
+                lines = f.readlines()
+            _write_atomic(_apply_updates(lines, updates))
 
         logger.info(f"Arquivo .env atualizado com as chaves: {list(updates.keys())}")
         return True
@@ -94,3 +80,65 @@ def update_env_file(updates: Dict[str, str]) -> bool:
     except Exception as e:
         logger.error(f"Erro ao escrever no arquivo .env: {e}")
         return False
+
+
+def _apply_updates(lines: List[str], updates: Dict[str, str]) -> List[str]:
+    output = []
+    keys_updated = set()
+
+    for line in lines:
+        if line.strip().startswith('#') or not line.strip():
+            output.append(line)
+            continue
+
+        try:
+            key, old_value = line.split('=', 1)
+            key = key.strip()
+
+            if key in updates:
+                new_value = updates[key]
+                if new_value is not None:
+                    output.append(f"{key}={new_value}\n")  # ← SEM aspas
+                    keys_updated.add(key)
+                else:
+                    output.append(line)
+            else:
+                output.append(line)
+        except ValueError:
+            output.append(line)
+
+    # Adiciona chaves novas que não existiam
+    for key, value in updates.items():
+        if key not in keys_updated and value is not None:
+            output.append(f"{key}={value}\n")  # ← SEM aspas
+
+    return output
+
+
+def _write_atomic(lines: List[str]):
+    """
+    Grava num arquivo temporário e troca de uma vez (os.replace), para que um
+    worker lendo o .env nunca encontre o arquivo truncado. Quando o .env é um
+    bind mount de arquivo único (docker-compose), a troca não é permitida e a
+    gravação é feita no próprio arquivo — ainda protegida pela trava.
+    """
+    tmp_path = f"{ENV_FILE_PATH}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, 'w') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, ENV_FILE_PATH)
+        return
+    except OSError as e:
+        logger.debug(f"Troca atômica do .env indisponível ({e}); gravando no lugar.")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    with open(ENV_FILE_PATH, 'r+') as f:
+        f.seek(0)
+        f.writelines(lines)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,119 @@
+import logging
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import text
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento): um processo só, sem travas
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _open(path: str) -> int:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+
+@contextmanager
+def exclusive(path: str, shared: bool = False):
+    """
+    Trava de arquivo (flock) entre os processos da API: só um worker por vez
+    entra no bloco (ou vários leitores, com `shared=True`). Bloqueia até conseguir.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = _open(path)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # fechar o descritor libera a trava
+
+
+class LeaderLock:
+    """
+    Eleição de um único processo para tarefas que não podem rodar em dobro
+    (agendamentos). `try_acquire` não bloqueia: quem conseguir a trava a mantém
+    até sair; se o processo morrer, o sistema a libera e outro worker assume.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        fd = _open(self.path)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None and self._fd >= 0:
+            os.close(self._fd)
+        self._fd = None
+
+
+class AdvisoryLeaderLock:
+    """
+    Mesma eleição do LeaderLock, com uma trava do PostgreSQL (pg_try_advisory_lock)
+    no lugar do arquivo: vale para processos em máquinas diferentes que usam o
+    mesmo banco. A trava pertence a uma conexão retirada do pool e mantida aberta; se
+    ela cair, o servidor libera a trava e `try_acquire` percebe no ciclo seguinte.
+    """
+
+    def __init__(self, engine, key: int):
+        self.engine = engine
+        self.key = key
+        self._conn = None
+
+    @property
+    def held(self) -> bool:
+        return self._conn is not None
+
+    def try_acquire(self) -> bool:
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                return True
+            except Exception as e:
+                logger.warning(f"⚠️ Conexão da trava de liderança perdida: {e}")
+                self.release()
+        # Autocommit: a conexão fica ociosa entre os ciclos, sem transação aberta
+        conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        except Exception:
+            conn.invalidate()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def release(self):
+        if self._conn is not None:
+            # Descarta a conexão em vez de devolvê-la ao pool com a trava presa
+            self._conn.invalidate()
+            self._conn.close()
+        self._conn = None
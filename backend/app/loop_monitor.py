@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Desligado por padrão: MONITOR_LOOP=1 ativa
+MONITOR_LOOP = os.getenv("MONITOR_LOOP", "0").lower() in ("1", "true", "sim")
+MONITOR_LOOP_LIMITE_MS = float(os.getenv("MONITOR_LOOP_LIMITE_MS", "100"))
+MONITOR_LOOP_INTERVALO_MS = float(os.getenv("MONITOR_LOOP_INTERVALO_MS", "50"))
+
+# Frames de bibliotecas não identificam o culpado — procuramos o código do app
+_CAMINHOS_BIBLIOTECA = tuple(
+    p for p in {sysconfig.get_paths().get("stdlib"), sysconfig.get_paths().get("purelib"),
+                sysconfig.get_paths().get("platlib")} if p
+) + ("<",)  # frames congelados, ex.: <frozen importlib._bootstrap>
+
+
+def _origem(pilha: traceback.StackSummary) -> str:
+    """Frame mais interno que pertence ao app (ou o mais interno de todos)."""
+    frame = next((f for f in reversed(pilha) if not f.filename.startswith(_CAMINHOS_BIBLIOTECA)), pilha[-1])
+    return f"{os.path.basename(frame.filename)}:{frame.lineno} ({frame.name})"
+
+
+class LoopMonitor:
+    """
+    Mede o atraso do event loop e identifica quem o bloqueia.
+
+    Uma task "batimento" acorda a cada intervalo e registra o atraso. Uma
+    thread vigia o último batimento: se o loop passar do limite sem bater,
+    captura a pilha da thread do loop naquele instante (sys._current_frames).
+    Quando o loop volta, a duração do bloqueio é atribuída àquela pilha.
+
+    Serve à API e aos processos do host (telemetria.py), por isso não depende
+    de nada do backend: `on_lag` recebe cada atraso em segundos (na API, o
+    histograma do Prometheus).
+    """
+
+    def __init__(self, limite_ms: float = MONITOR_LOOP_LIMITE_MS,
+                 intervalo_ms: float = MONITOR_LOOP_INTERVALO_MS,
+                 on_lag: Optional[Callable[[float], None]] = None):
+        self.on_lag    = on_lag
+        self.limite    = limite_ms / 1000
+        self.intervalo = intervalo_ms / 1000
+        self.atrasos   = deque(maxlen=2000)  # ms, últimos batimentos
+        self.ofensores = {}                  # origem -> agregado
+        self.bloqueios = 0
+        self._lock     = threading.Lock()
+        self._batida   = time.monotonic()
+        self._captura  = None                # (origem, pilha formatada) do bloqueio em curso
+        self._thread_loop_id = None
+        self._task     = None
+        self._parar    = threading.Event()
+
+    @property
+    def ativo(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Inicia o monitor no loop corrente."""
+        if self.ativo:
+            return
+        self._thread_loop_id = threading.get_ident()
+        self._batida = time.monotonic()
+        self._parar.clear()
+        self._task = asyncio.get_running_loop().create_task(self._batimento())
+        threading.Thread(target=self._vigiar, name="loop-monitor", daemon=True).start()
+        logger.info(f"✓ Monitor do event loop ativo (limite {self.limite * 1000:.0f} ms)")
+
+    async def stop(self):
+        self._parar.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _batimento(self):
+        while True:
+            inicio = time.monotonic()
+            await asyncio.sleep(self.intervalo)
+            agora = time.monotonic()
+            atraso = max(0.0, agora - inicio - self.intervalo)
+            with self._lock:
+                self._batida = agora
+                self.atrasos.append(atraso * 1000)
+                captura, self._captura = self._captura, None
+            if self.on_lag:
+                self.on_lag(atraso)
+            if atraso >= self.limite:
+                self._registrar_bloqueio(atraso, captura)
+
+    def _vigiar(self):
+        while not self._parar.wait(self.intervalo / 2):
+            with self._lock:
+                parado = time.monotonic() - self._batida
+                if parado < self.limite or self._captura is not None:
+                    continue
+                frame = sys._current_frames().get(self._thread_loop_id)
+                if frame is None:
+                    continue
+                pilha = traceback.extract_stack(frame)
+                self._captura = (_origem(pilha), traceback.format_list(pilha[-15:]))
+
+    def _registrar_bloqueio(self, atraso: float, captura):
+        ms = round(atraso * 1000, 1)
+        origem, pilha = captura or ("desconhecida (bloqueio terminou antes da amostragem)", [])
+        with self._lock:
+            self.bloqueios += 1
+            item = self.ofensores.setdefault(origem, {
+                "origem": origem, "ocorrencias": 0, "total_ms": 0.0, "max_ms": 0.0, "pilha": pilha,
+            })
+            item["ocorrencias"] += 1
+            item["total_ms"] = round(item["total_ms"] + ms, 1)
+            if ms >= item["max_ms"]:
+                item["max_ms"] = ms
+                item["pilha"] = pilha or item["pilha"]
+            item["ultimo"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        logger.warning(f"✗ Event loop bloqueado por {ms} ms em {origem}")
+
+    def report(self, limite: int = 10) -> dict:
+        with self._lock:
+            amostras = sorted(self.atrasos)
+            piores = sorted(self.ofensores.values(), key=lambda o: o["total_ms"], reverse=True)[:limite]
+            piores = [dict(o) for o in piores]
+
+        def _p(q):
+            return round(amostras[min(len(amostras) - 1, int(len(amostras) * q))], 1) if amostras else 0.0
+
+        return {
+            "ativo":     self.ativo,
+            "limite_ms": self.limite * 1000,
+            "atraso_ms": {"p50": _p(0.50), "p99": _p(0.99), "max": round(amostras[-1], 1) if amostras else 0.0},
+            "bloqueios": self.bloqueios,
+            "ofensores": piores,
+        }
+
+    async def start_if_enabled(self):
+        """Evento de startup: só liga o monitor com MONITOR_LOOP=1."""
+        if MONITOR_LOOP:
+            await self.start()
@@ -1,25 +1,56 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
 import os
+import time
 from pathlib import Path
 
 # --- Importações do Projeto ---
 from services.news_collector import NewsCollector
+from services.enricher import ArticleEnricher
 from services.summarizer import NewsSummarizer
 from services.tts_generator import TTSGenerator
+from services import priority
+from services.quota import quota_status
+from services.scheduler import BulletinScheduler, matches_categories, next_run
+from services.job_queue import JobFailed, get_job_queue
+from services.singleflight import SingleFlight
+from services.storage import get_storage
+from services.upstream import upstream_status
 
 # --- Importações do Banco de Dados ---
-from database import db_session, init_db, Boletim as BoletimModel
+from database import engine, init_db
+import repository
 
 # --- Importação do Gerenciador de .env ---
 import env_manager
-from dotenv import load_dotenv
+from config_sync import config_sync
+
+# --- Tracing ---
+from tracing import configurar_tracing, tracing_middleware, tracer
+
+# --- Métricas Prometheus ---
+import metrics
+from loop_monitor import LoopMonitor
+from settings import (
+    AUDIO_DIR,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_BULLETINS,
+    BOLETIM_IDEMPOTENCY_TTL_S,
+    ENRICH_ARTICLES,
+    JOB_QUEUE_ENABLED,
+    JOB_WAIT_TIMEOUT_S,
+    SCHEDULE_READY_MAX_AGE_MIN,
+    TTS_PIPELINE,
+)
 
 # Configurar logging
 logging.basicConfig(
@@ -28,12 +59,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+configurar_tracing("boletim-api")
+loop_monitor = LoopMonitor(on_lag=metrics.EVENT_LOOP_LAG.observe)
+
 # Evento de Inicialização
 app = FastAPI(
     title="Boletim de Notícias API",
     description="API para coleta, sumarização e geração de áudio de notícias",
     version="4.0.0 (Híbrido)",
-    on_startup=[init_db]
+    on_startup=[init_db, loop_monitor.start_if_enabled],
+    on_shutdown=[loop_monitor.stop, metrics.mark_process_dead]
 )
 
 # Configurar CORS
@@ -47,13 +82,26 @@ app.add_middleware(
 
 # Mapeia a pasta /app/audio para a URL /audio
 # Isso resolve o erro do Player e permite streaming correto
-os.makedirs("/app/audio", exist_ok=True)
-app.mount("/audio", StaticFiles(directory="/app/audio"), name="audio")
+os.makedirs(AUDIO_DIR, exist_ok=True)
+audio_storage = get_storage()
+if audio_storage.name == "local":
+    app.mount("/audio", StaticFiles(directory=AUDIO_DIR), name="audio")
+else:
+    # Armazenamento remoto: /audio/<arquivo> redireciona para a URL assinada
+    @app.api_route("/audio/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+    async def serve_audio(filename: str, request: Request):
+        if request.method == "HEAD":
+            # Conferência de existência (confirmar_audio do MCP) sem redirecionar
+            exists = await audio_storage.exists(filename)
+            return Response(status_code=200 if exists else 404, media_type="audio/mpeg")
+        return RedirectResponse(audio_storage.url(filename), status_code=307)
 
 # Inicializar serviços
 news_collector = NewsCollector()
+article_enricher = ArticleEnricher()
 summarizer = NewsSummarizer()
 tts_generator = TTSGenerator()
+boletim_flights = SingleFlight("boletim")
 
 # ================================================================
 # MODELOS PYDANTIC ATUALIZADOS
@@ -68,9 +116,16 @@ class BoletimRequest(BaseModel):
     include_outro: bool = True
 
     summary_mode: str = os.getenv("AI_SUMMARY_MODE", "none")
+    # Ignora o cache de resumos e força uma nova chamada à IA
+    bypass_summary_cache: bool = False
+    # Baixa a página de cada notícia para resumir o texto completo (só com sumarização por IA)
+    enrich_articles: bool = ENRICH_ARTICLES
     tts_engine: str = "gtts"
     tts_voice_id: str = "21m00Tcm4TlvDq8ikWAM"
     tld: Optional[str] = "com.br"
+    # Repetições com a mesma chave (ex.: retry do cliente) recebem o mesmo boletim
+    # por BOLETIM_IDEMPOTENCY_TTL_S segundos, sem gerar outro
+    idempotency_key: Optional[str] = None
 
 
 class AudioRequest(BaseModel):
@@ -90,6 +145,79 @@ class BoletimResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class BoletimBatchRequest(BaseModel):
+    boletins: List[BoletimRequest]
+
+
+class BoletimBatchItem(BaseModel):
+    # Um dos dois: o boletim gerado ou o motivo da falha
+    boletim: Optional[BoletimResponse] = None
+    error: Optional[str] = None
+
+
+class BoletimBatchResponse(BaseModel):
+    boletins: List[BoletimBatchItem]
+    elapsed_s: float
+
+# --- Modelos Pydantic para Agendamentos ---
+
+
+class ScheduleRequest(BaseModel):
+    name: str
+    # Cron de 5 campos no fuso SCHEDULE_TIMEZONE. Ex.: "50 6,11,17 * * 1-5"
+    cron: str
+    categories: List[str] = ["geral"]
+    num_articles: int = 10
+    style: str = "jornalistico"
+    summary_mode: Optional[str] = None  # None = AI_SUMMARY_MODE do momento da geração
+    tts_engine: str = "gtts"
+    enabled: bool = True
+
+
+class ScheduleUpdate(BaseModel):
+    name: Optional[str] = None
+    cron: Optional[str] = None
+    categories: Optional[List[str]] = None
+    num_articles: Optional[int] = None
+    style: Optional[str] = None
+    summary_mode: Optional[str] = None
+    tts_engine: Optional[str] = None
+    enabled: Optional[bool] = None
+
+
+class ScheduleResponse(BaseModel):
+    id: int
+    name: str
+    cron: str
+    categories: str
+    num_articles: int
+    style: str
+    summary_mode: Optional[str] = None
+    tts_engine: str
+    enabled: bool
+    next_run_at: Optional[datetime] = None
+    last_run_at: Optional[datetime] = None
+    last_boletim_id: Optional[int] = None
+    last_error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    lane: str
+    attempts: int
+    worker: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
 # --- Modelos Pydantic para Configuração ---
 
 
@@ -101,6 +229,8 @@ class ConfigResponse(BaseModel):
     TTS_ENGINE: str
     LLM_MODO: str
     GROQ_MODELO: str
+    # Consumo das cotas dos planos (GNews/ElevenLabs) no período corrente
+    QUOTAS: Dict[str, Dict] = {}
 
 
 class ConfigSaveRequest(BaseModel):
@@ -112,14 +242,14 @@ class ConfigSaveRequest(BaseModel):
     llm_modo: Optional[str] = None
     groq_modelo: Optional[str] = None
 
-# Middleware do Banco de Dados
+app.middleware("http")(config_sync.middleware)
+app.middleware("http")(priority.priority_middleware)
+app.middleware("http")(metrics.metrics_middleware)
+# Registrado por último para envolver todas as demais camadas
+app.middleware("http")(tracing_middleware)
 
-
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    response = await call_next(request)
-    db_session.remove()
-    return response
+if engine is not None:
+    metrics.instrument_engine(engine)
 
 # --- Rotas Principais ---
 
@@ -137,11 +267,80 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas no formato de exposição do Prometheus."""
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/api/diagnostico/upstreams")
+async def get_upstream_diagnostics():
+    """Estado do circuit breaker, timeout adaptativo e orçamento de repetições por serviço externo."""
+    return upstream_status()
+
+
+@app.get("/api/diagnostico/prioridades")
+async def get_priority_diagnostics():
+    """Vagas ocupadas e filas por recurso, separadas em interativo e fundo."""
+    return priority.priority_status()
+
+
+@app.get("/api/diagnostico/loop")
+async def get_loop_diagnostics(limite: int = 10):
+    """Atraso do event loop e os trechos que mais o bloquearam (MONITOR_LOOP=1)."""
+    return loop_monitor.report(limite)
+
 # --- Rotas de Geração ---
 
 
 @app.post("/api/generate-boletim", response_model=BoletimResponse)
 async def generate_boletim(request: BoletimRequest):
+    """
+    Pedidos idênticos simultâneos geram um único boletim, entregue a todos.
+    Com idempotency_key, a chave identifica o pedido e o resultado continua
+    valendo por BOLETIM_IDEMPOTENCY_TTL_S segundos depois de pronto.
+    """
+    if request.idempotency_key:
+        # Repetição atendida por outro worker: o boletim já está no histórico
+        since = datetime.utcnow() - timedelta(seconds=BOLETIM_IDEMPOTENCY_TTL_S)
+        try:
+            previous = await repository.idempotency.get(request.idempotency_key, since)
+        except Exception as e:
+            logger.warning(f"Não foi possível consultar a chave de idempotência: {e}")
+            previous = None
+        if previous is not None:
+            metrics.SINGLEFLIGHT_CALLS.labels(boletim_flights.name, "replayed").inc()
+            return BoletimResponse.model_validate(previous)
+        key, ttl = ("idempotency", request.idempotency_key), BOLETIM_IDEMPOTENCY_TTL_S
+    else:
+        body = json.dumps(request.model_dump(exclude={"idempotency_key"}), sort_keys=True)
+        key, ttl = ("request", hashlib.sha256(body.encode()).hexdigest()), 0
+    return await boletim_flights.do(key, lambda: _generate_boletim_flight(request), ttl=ttl)
+
+
+async def _generate_boletim_flight(request: BoletimRequest) -> BoletimResponse:
+    if JOB_QUEUE_ENABLED:
+        return BoletimResponse.model_validate(await _run_job("boletim", request.model_dump(mode="json")))
+    return await _generate_boletim_local(request)
+
+
+async def _generate_boletim_local(request: BoletimRequest) -> BoletimResponse:
+    with metrics.GENERATIONS_IN_PROGRESS.labels("boletim").track_inprogress():
+        boletim = await _generate_boletim(request)
+    if request.idempotency_key and boletim.id:
+        try:
+            await repository.idempotency.add(
+                request.idempotency_key, boletim.id,
+                expired_before=datetime.utcnow() - timedelta(seconds=BOLETIM_IDEMPOTENCY_TTL_S))
+        except Exception as e:
+            logger.warning(f"Não foi possível registrar a chave de idempotência: {e}")
+    # Resposta compartilhada entre pedidos: nada de objeto ORM preso à sessão de um deles
+    return BoletimResponse.model_validate(boletim)
+
+
+async def _generate_boletim(request: BoletimRequest, schedule_id: Optional[int] = None):
     try:
         logger.info("Iniciando geração de boletim completo")
 
@@ -153,46 +352,10 @@ async def generate_boletim(request: BoletimRequest):
             raise HTTPException(
                 status_code=404, detail="Nenhuma notícia encontrada")
 
-        summary_text = await summarizer.summarize(
-            articles=articles,
-            style=request.style,
-            include_intro=request.include_intro,
-            include_outro=request.include_outro,
-            summary_mode=request.summary_mode or os.getenv(
-                "AI_SUMMARY_MODE", "none")
-        )
+        if _wants_enrichment(request):
+            articles = await article_enricher.enrich(articles)
 
-        audio_path = await tts_generator.generate(
-            text=summary_text,
-            tts_engine=request.tts_engine,
-            tts_voice_id=request.tts_voice_id,
-            tld=request.tld
-        )
-
-        audio_filename = os.path.basename(audio_path) if audio_path else None
-
-        try:
-            categories_str = ", ".join(request.categories)
-            novo_boletim = BoletimModel(
-                summary_text=summary_text,
-                audio_filename=audio_filename,
-                categories=categories_str
-            )
-            db_session.add(novo_boletim)
-            db_session.commit()
-            logger.info(f"✓ Boletim salvo no histórico (ID: {novo_boletim.id})")
-            return novo_boletim
-
-        except Exception as db_error:
-            logger.error(f"✗ Erro ao salvar boletim no banco de dados: {db_error}")
-            db_session.rollback()
-            return BoletimResponse(
-                id=0,
-                timestamp=datetime.utcnow(),
-                summary_text=summary_text,
-                audio_filename=audio_filename,
-                categories=", ".join(request.categories)
-            )
+        return await _produce_boletim(request, articles, schedule_id)
 
     except HTTPException as e:
         logger.error(f"Erro HTTP ao gerar boletim: {e.detail}")
@@ -202,8 +365,131 @@ async def generate_boletim(request: BoletimRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _summary_mode(request: BoletimRequest) -> str:
+    return request.summary_mode or os.getenv("AI_SUMMARY_MODE", "none")
+
+
+def _wants_enrichment(request: BoletimRequest) -> bool:
+    return request.enrich_articles and _summary_mode(request) == "groq"
+
+
+async def _produce_boletim(request: BoletimRequest, articles: List[Dict], schedule_id: Optional[int] = None):
+    """Resumo, áudio e registro no histórico de um boletim com as notícias já coletadas."""
+    summary_args = dict(
+        articles=articles,
+        style=request.style,
+        include_intro=request.include_intro,
+        include_outro=request.include_outro,
+        summary_mode=_summary_mode(request),
+        bypass_cache=request.bypass_summary_cache
+    )
+    tts_args = dict(tts_engine=request.tts_engine, tts_voice_id=request.tts_voice_id, tld=request.tld)
+
+    summary_text = audio_path = None
+    if TTS_PIPELINE:
+        # Cada parágrafo pronto já vai para o TTS enquanto a IA escreve os próximos
+        try:
+            summary_text, audio_path = await tts_generator.generate_pipelined(
+                summarizer.summarize_stream(**summary_args), **tts_args)
+        except Exception as e:
+            logger.warning(f"⚠️ Pipeline de resumo e áudio falhou ({e}). Refazendo em etapas.")
+
+    if audio_path is None:
+        summary_text = await summarizer.summarize(**summary_args)
+        audio_path = await tts_generator.generate(text=summary_text, **tts_args)
+
+    audio_filename = os.path.basename(audio_path) if audio_path else None
+
+    try:
+        with tracer.start_as_current_span("db.commit"):
+            novo_boletim = await repository.boletins.add(
+                summary_text=summary_text,
+                audio_filename=audio_filename,
+                categories=", ".join(request.categories),
+                schedule_id=schedule_id
+            )
+        logger.info(f"✓ Boletim salvo no histórico (ID: {novo_boletim.id})")
+        return novo_boletim
+
+    except Exception as db_error:
+        logger.error(f"✗ Erro ao salvar boletim no banco de dados: {db_error}")
+        return BoletimResponse(
+            id=0,
+            timestamp=datetime.utcnow(),
+            summary_text=summary_text,
+            audio_filename=audio_filename,
+            categories=", ".join(request.categories)
+        )
+
+
+@app.post("/api/generate-boletins", response_model=BoletimBatchResponse)
+async def generate_boletins(request: BoletimBatchRequest):
+    """
+    Vários boletins numa chamada, na ordem pedida. As categorias são buscadas
+    uma vez para o lote inteiro, as páginas (enriquecimento) também, e as
+    notícias repetidas entre boletins são resumidas uma vez só; a produção
+    (resumo + áudio) roda com até BATCH_CONCURRENCY boletins ao mesmo tempo.
+    A falha de um boletim não derruba os demais.
+    """
+    if not request.boletins:
+        raise HTTPException(status_code=400, detail="Lote vazio")
+    if len(request.boletins) > BATCH_MAX_BULLETINS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_BULLETINS} boletins por lote")
+    # Lotes cedem a vez aos pedidos do locutor (a menos que X-Prioridade diga o contrário)
+    with priority.background():
+        if JOB_QUEUE_ENABLED:
+            return BoletimBatchResponse.model_validate(await _run_job("lote", request.model_dump(mode="json")))
+        with metrics.GENERATIONS_IN_PROGRESS.labels("lote").track_inprogress():
+            return await _generate_boletins(request.boletins)
+
+
+async def _generate_boletins(requests: List[BoletimRequest]) -> BoletimBatchResponse:
+    start = time.perf_counter()
+    logger.info(f"Iniciando geração de {len(requests)} boletim(ns) em lote")
+
+    with tracer.start_as_current_span("boletim.batch") as span:
+        span.set_attribute("batch.size", len(requests))
+        article_sets = await news_collector.collect_batch(
+            [(r.categories, r.num_articles) for r in requests])
+
+        # Uma rodada de enriquecimento com as notícias de todos os boletins que pedem
+        wanted = [arts for r, arts in zip(requests, article_sets) if _wants_enrichment(r)]
+        if wanted:
+            unique = list({a["url"]: a for arts in wanted for a in arts}.values())
+            bodies = {a["url"]: a["body"] for a in await article_enricher.enrich(unique) if a.get("body")}
+            article_sets = [
+                [{**a, "body": bodies[a["url"]]} if a["url"] in bodies else a for a in arts]
+                if _wants_enrichment(r) else arts
+                for r, arts in zip(requests, article_sets)
+            ]
+
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def produce(request: BoletimRequest, articles: List[Dict]) -> BoletimBatchItem:
+            if not articles:
+                return BoletimBatchItem(error="Nenhuma notícia encontrada")
+            async with semaphore:
+                try:
+                    boletim = await _produce_boletim(request, articles)
+                    return BoletimBatchItem(boletim=BoletimResponse.model_validate(boletim))
+                except Exception as e:
+                    logger.error(f"✗ Boletim do lote ({', '.join(request.categories)}) falhou: {e}")
+                    return BoletimBatchItem(error=str(e))
+
+        items = await asyncio.gather(*(produce(r, a) for r, a in zip(requests, article_sets)))
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"✓ Lote concluído: {sum(1 for i in items if i.boletim)}/{len(items)} boletim(ns) em {elapsed:.1f}s")
+    return BoletimBatchResponse(boletins=items, elapsed_s=round(elapsed, 2))
+
+
 @app.post("/api/generate-audio")
 async def generate_audio_from_text(request: AudioRequest):
+    with metrics.GENERATIONS_IN_PROGRESS.labels("audio").track_inprogress():
+        return await _generate_audio_from_text(request)
+
+
+async def _generate_audio_from_text(request: AudioRequest):
     try:
         logger.info(f"Iniciando regeneração de áudio: {len(request.text)} caracteres")
         if not request.text:
@@ -243,7 +529,11 @@ async def generate_audio_from_text(request: AudioRequest):
 async def download_audio(filename: str):
     try:
         filename = os.path.basename(filename)
-        file_path = Path("/app/audio") / filename
+        url = audio_storage.url(filename, download=True)
+        if url:
+            # O navegador baixa direto do armazenamento; a API não repassa os bytes
+            return RedirectResponse(url, status_code=307)
+        file_path = audio_storage.local_path(filename)
 
         if not file_path.exists():
             logger.error(f"Arquivo não encontrado: {file_path}")
@@ -273,14 +563,28 @@ async def get_historico():
     """
     try:
         logger.info("Buscando histórico de boletins...")
-        boletins = db_session.query(BoletimModel).order_by(
-            BoletimModel.id.desc()).all()
-        return boletins
+        return await repository.boletins.list()
     except Exception as e:
         logger.error(f"Erro ao buscar histórico: {e}")
         return []
 
 
+@app.get("/api/historico/versao", response_model=dict)
+async def get_historico_versao():
+    """
+    Retorna um carimbo de versão do histórico.
+    Muda sempre que um boletim é criado ou excluído; usado pelo
+    assistente do locutor para invalidar respostas em cache.
+    """
+    try:
+        total, ultimo_id, ultimo_ts = await repository.boletins.version()
+        ts = ultimo_ts.isoformat() if ultimo_ts else ""
+        return {"versao": f"{total}:{ultimo_id or 0}:{ts}"}
+    except Exception as e:
+        logger.error(f"Erro ao calcular versão do histórico: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.delete("/api/historico/lote", response_model=dict)
 async def delete_boletins_em_lote(ate_id: int):
     """
@@ -288,9 +592,7 @@ async def delete_boletins_em_lote(ate_id: int):
     Retorna a quantidade de registros excluídos.
     """
     try:
-        boletins = db_session.query(BoletimModel).filter(
-            BoletimModel.id <= ate_id
-        ).all()
+        boletins = await repository.boletins.delete_up_to(ate_id)
 
         if not boletins:
             return {"success": True, "deletados": 0, "message": f"Nenhum boletim encontrado com ID <= {ate_id}."}
@@ -300,22 +602,17 @@ async def delete_boletins_em_lote(ate_id: int):
         for b in boletins:
             if b.audio_filename:
                 try:
-                    fp = Path("/app/audio") / os.path.basename(b.audio_filename)
-                    if fp.exists():
-                        fp.unlink()
+                    await audio_storage.delete(b.audio_filename)
                 except Exception as e:
                     erros_audio.append(b.audio_filename)
-            db_session.delete(b)
             deletados += 1
 
-        db_session.commit()
         msg = f"{deletados} boletim(ns) excluído(s) (ID <= {ate_id})."
         if erros_audio:
             msg += f" Áudios não removidos: {erros_audio}"
         logger.info(msg)
         return {"success": True, "deletados": deletados, "message": msg}
     except Exception as e:
-        db_session.rollback()
         logger.error(f"Erro ao excluir em lote: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -329,7 +626,7 @@ async def delete_boletim(boletim_id: int):
     try:
         logger.info(f"Tentando excluir boletim ID: {boletim_id}")
 
-        boletim_db = db_session.query(BoletimModel).get(boletim_id)
+        boletim_db = await repository.boletins.delete(boletim_id)
 
         if not boletim_db:
             logger.warning(f"Boletim ID {boletim_id} não encontrado no DB.")
@@ -338,29 +635,209 @@ async def delete_boletim(boletim_id: int):
 
         audio_filename = boletim_db.audio_filename
 
-        db_session.delete(boletim_db)
-        db_session.commit()
-
         logger.info(f"✓ Registro ID {boletim_id} excluído do DB.")
 
         if audio_filename:
             try:
-                file_path = Path("/app/audio") / \
-                    os.path.basename(audio_filename)
-                if file_path.exists():
-                    file_path.unlink()
-                    logger.info(f"✓ Arquivo de áudio {audio_filename} excluído do disco.")
+                if await audio_storage.delete(audio_filename):
+                    logger.info(f"✓ Arquivo de áudio {audio_filename} excluído ({audio_storage.name}).")
                 else:
-                    logger.warning(f"Arquivo de áudio {audio_filename} não encontrado no disco.")
+                    logger.warning(f"Arquivo de áudio {audio_filename} não encontrado ({audio_storage.name}).")
             except Exception as e_file:
                 logger.error(f"Erro ao excluir arquivo de áudio {audio_filename}: {e_file}")
 
         return {"success": True, "message": f"Boletim ID {boletim_id} excluído."}
     except Exception as e:
-        db_session.rollback()
         logger.error(f"Erro ao excluir boletim: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Rotas de Agendamento (pré-produção) ---
+
+
+async def _generate_scheduled(schedule: Dict) -> int:
+    request = BoletimRequest(
+        categories=[c.strip() for c in schedule["categories"].split(",") if c.strip()],
+        num_articles=schedule["num_articles"],
+        style=schedule["style"],
+        summary_mode=schedule["summary_mode"] or os.getenv("AI_SUMMARY_MODE", "none"),
+        tts_engine=schedule["tts_engine"],
+    )
+    with priority.background():
+        if JOB_QUEUE_ENABLED:
+            payload = {"request": request.model_dump(mode="json"), "schedule_id": schedule["id"]}
+            return (await _run_job("agendado", payload))["id"]
+        return await _generate_scheduled_local(request, schedule["id"])
+
+
+async def _generate_scheduled_local(request: BoletimRequest, schedule_id: int) -> int:
+    with metrics.GENERATIONS_IN_PROGRESS.labels("agendado").track_inprogress():
+        boletim = await _generate_boletim(request, schedule_id=schedule_id)
+    return boletim.id
+
+
+scheduler = BulletinScheduler(_generate_scheduled)
+app.router.on_startup.append(scheduler.start)
+app.router.on_shutdown.append(scheduler.stop)
+
+
+def _schedule_values(request: BaseModel, partial: bool = False) -> Dict:
+    values = request.model_dump(exclude_unset=partial)
+    if values.get("categories") is not None:
+        values["categories"] = ", ".join(values["categories"])
+    return values
+
+
+@app.get("/api/boletim-pronto", response_model=BoletimResponse)
+async def get_boletim_pronto(categorias: Optional[str] = None, idade_max_min: Optional[float] = None):
+    """
+    Boletim pré-produzido mais recente (por um agendamento) com exatamente estas
+    categorias (separadas por vírgula; sem o parâmetro, qualquer uma) e gerado
+    há no máximo `idade_max_min` minutos. É o caminho instantâneo na hora de ir ao ar.
+    """
+    idade = SCHEDULE_READY_MAX_AGE_MIN if idade_max_min is None else idade_max_min
+    pedidas = [c.strip() for c in categorias.split(",") if c.strip()] if categorias else None
+    try:
+        candidatos = await repository.boletins.ready(since=datetime.utcnow() - timedelta(minutes=idade))
+    except Exception as e:
+        logger.error(f"Erro ao buscar boletim pronto: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for boletim in candidatos:
+        if pedidas is None or matches_categories(boletim.categories, pedidas):
+            metrics.READY_LOOKUPS.labels("hit").inc()
+            return boletim
+    metrics.READY_LOOKUPS.labels("miss").inc()
+    raise HTTPException(status_code=404, detail="Nenhum boletim pronto para essas categorias")
+
+
+@app.get("/api/agendamentos", response_model=List[ScheduleResponse])
+async def get_agendamentos():
+    return await repository.schedules.list()
+
+
+@app.post("/api/agendamentos", response_model=ScheduleResponse)
+async def create_agendamento(request: ScheduleRequest):
+    try:
+        proxima = next_run(request.cron)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        agendamento = await repository.schedules.add(**_schedule_values(request), next_run_at=proxima)
+        logger.info(f"✓ Agendamento '{agendamento.name}' criado; próxima execução {proxima} UTC")
+        return agendamento
+    except Exception as e:
+        logger.error(f"Erro ao criar agendamento: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.patch("/api/agendamentos/{schedule_id}", response_model=ScheduleResponse)
+async def update_agendamento(schedule_id: int, request: ScheduleUpdate):
+    agendamento = await repository.schedules.get(schedule_id)
+    if not agendamento:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    values = _schedule_values(request, partial=True)
+    try:
+        if "cron" in values or values.get("enabled"):
+            values["next_run_at"] = next_run(values.get("cron", agendamento.cron))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await repository.schedules.update(schedule_id, **values)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar agendamento: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/api/agendamentos/{schedule_id}", response_model=dict)
+async def delete_agendamento(schedule_id: int):
+    try:
+        removido = await repository.schedules.delete(schedule_id)
+    except Exception as e:
+        logger.error(f"Erro ao excluir agendamento: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not removido:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return {"success": True, "message": f"Agendamento ID {schedule_id} excluído."}
+
+
+@app.post("/api/agendamentos/{schedule_id}/executar", response_model=BoletimResponse)
+async def run_agendamento(schedule_id: int):
+    """Pré-produz o boletim do agendamento agora, sem mudar o próximo horário."""
+    agendamento = await repository.schedules.get(schedule_id)
+    if not agendamento:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    schedule = {c.name: getattr(agendamento, c.name) for c in agendamento.__table__.columns}
+    boletim_id = await scheduler.run(schedule)
+    if not boletim_id:
+        raise HTTPException(status_code=500, detail="Falha ao gerar o boletim do agendamento")
+    return await repository.boletins.get(boletim_id)
+
+# --- Fila de geração (workers) ---
+
+
+async def _run_job(kind: str, payload: Dict) -> Any:
+    """Entrega a geração a um worker (`python -m worker`) e espera o resultado."""
+    queue = get_job_queue()
+    job_id = await queue.enqueue(kind, payload, priority.current_lane())
+    logger.info(f"Tarefa {job_id} ({kind}) enfileirada para os workers")
+    try:
+        return await queue.wait(job_id, JOB_WAIT_TIMEOUT_S)
+    except JobFailed as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+async def _execute_boletim(payload: Dict) -> Dict:
+    boletim = await _generate_boletim_local(BoletimRequest(**payload))
+    return boletim.model_dump(mode="json")
+
+
+async def _execute_lote(payload: Dict) -> Dict:
+    request = BoletimBatchRequest(**payload)
+    with metrics.GENERATIONS_IN_PROGRESS.labels("lote").track_inprogress():
+        return (await _generate_boletins(request.boletins)).model_dump(mode="json")
+
+
+async def _execute_agendado(payload: Dict) -> Dict:
+    boletim_id = await _generate_scheduled_local(BoletimRequest(**payload["request"]), payload["schedule_id"])
+    return {"id": boletim_id}
+
+
+JOB_HANDLERS = {
+    "boletim":  _execute_boletim,
+    "lote":     _execute_lote,
+    "agendado": _execute_agendado,
+}
+
+
+async def execute_job(kind: str, payload: Dict) -> Any:
+    """Ponto de entrada dos workers: executa a tarefa aqui e devolve o resultado (JSON)."""
+    if kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Tipo de tarefa desconhecido: '{kind}'")
+    return await JOB_HANDLERS[kind](payload)
+
+
+@app.post("/api/tarefas", response_model=JobResponse, status_code=202)
+async def create_tarefa(request: BoletimRequest):
+    """
+    Enfileira um boletim e responde na hora; o resultado fica em
+    GET /api/tarefas/{id}. Requer JOB_QUEUE_ENABLED e ao menos um worker.
+    """
+    if not JOB_QUEUE_ENABLED:
+        raise HTTPException(status_code=409, detail="Fila de geração desativada (JOB_QUEUE_ENABLED=0)")
+    queue = get_job_queue()
+    job_id = await queue.enqueue("boletim", request.model_dump(mode="json"), priority.current_lane())
+    return await queue.get(job_id)
+
+
+@app.get("/api/tarefas/{job_id}", response_model=JobResponse)
+async def get_tarefa(job_id: int):
+    job = await get_job_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return job
+
 # --- Rotas de Configuração ---
 
 
@@ -372,7 +849,8 @@ async def get_configuracoes():
     """
     try:
         logger.info("Carregando configurações do .env para o frontend...")
-        config = env_manager.load_env_variables()
+        config = await asyncio.to_thread(env_manager.load_env_variables)
+        config["QUOTAS"] = await quota_status()
         return config
     except Exception as e:
         logger.error(f"Erro ao carregar configurações: {e}")
@@ -380,6 +858,21 @@ async def get_configuracoes():
             status_code=500, detail="Erro ao carregar configurações.")
 
 
+async def _reload_services():
+    # Recarrega o .env no os.environ para que os getenv() abaixo leiam os novos valores
+    # (trava e leitura do arquivo fora do event loop)
+    await asyncio.to_thread(env_manager.reload_environment)
+
+    # Troca só chaves e clientes: pedidos em andamento seguem com o estado atual
+    news_collector.api_key = os.getenv("GNEWS_API_KEY")
+    summarizer.reload()
+    await tts_generator.reload()
+
+
+config_sync.reload = _reload_services
+app.router.on_startup.append(config_sync.start)
+
+
 @app.post("/api/config", response_model=dict)
 async def save_configuracoes(request: ConfigSaveRequest):
     """
@@ -403,19 +896,15 @@ async def save_configuracoes(request: ConfigSaveRequest):
         if request.groq_modelo:
             updates['GROQ_MODELO'] = request.groq_modelo
 
-        success = env_manager.update_env_file(updates)
+        success = await asyncio.to_thread(env_manager.update_env_file, updates)
 
         if not success:
             raise HTTPException(
                 status_code=500, detail="Erro ao salvar o arquivo .env no servidor.")
 
-        # Recarrega o .env no os.environ para que os getenv() abaixo leiam os novos valores
-        load_dotenv(override=True)
-
-        # Recarregar os serviços com as novas chaves/configurações
-        news_collector.api_key = os.getenv("GNEWS_API_KEY")
-        summarizer.__init__()
-        tts_generator.__init__()
+        await _reload_services()
+        # Os demais workers recarregam ao ver a nova versão no banco
+        await config_sync.publish()
 
         return {"success": True, "message": "Configurações salvas!"}
 
@@ -0,0 +1,294 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+from settings import AUDIO_DIR
+
+# Vários workers: cada processo grava suas séries em PROMETHEUS_MULTIPROC_DIR
+# (definido antes de subir a API) e o /metrics soma as de todos
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# --- HTTP ---
+HTTP_REQUEST_DURATION = Histogram(
+    "boletim_http_request_duration_seconds",
+    "Latência das requisições HTTP por rota",
+    ["method", "route", "status"],
+)
+
+# --- Pipeline ---
+GENERATIONS_IN_PROGRESS = Gauge(
+    "boletim_generations_in_progress",
+    "Gerações em andamento",
+    ["kind"],
+    multiprocess_mode="livesum",
+)
+
+# --- Serviços externos (GNews, Groq, ElevenLabs, OpenAI, gTTS) ---
+UPSTREAM_REQUESTS = Counter(
+    "boletim_upstream_requests_total",
+    "Chamadas a serviços externos",
+    ["provider", "outcome"],
+)
+UPSTREAM_DURATION = Histogram(
+    "boletim_upstream_request_duration_seconds",
+    "Latência das chamadas a serviços externos",
+    ["provider"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+UPSTREAM_RETRIES = Counter(
+    "boletim_upstream_retries_total",
+    "Novas tentativas feitas a serviços externos",
+    ["provider"],
+)
+UPSTREAM_HEDGES = Counter(
+    "boletim_upstream_hedged_requests_total",
+    "Cópias disparadas porque a primeira requisição demorou",
+    ["provider"],
+)
+UPSTREAM_CIRCUIT_STATE = Gauge(
+    "boletim_upstream_circuit_state",
+    "Estado do circuit breaker (0 fechado, 1 meio-aberto, 2 aberto)",
+    ["provider"],
+    multiprocess_mode="livemax",
+)
+UPSTREAM_TIMEOUT = Gauge(
+    "boletim_upstream_timeout_seconds",
+    "Timeout adaptativo usado na última chamada",
+    ["provider"],
+    multiprocess_mode="liveall",
+)
+
+# --- Cotas dos planos (GNews: requisições, ElevenLabs: caracteres) ---
+QUOTA_CONSUMED = Counter(
+    "boletim_quota_consumed_total",
+    "Cota consumida por serviço externo, na unidade do plano",
+    ["provider"],
+)
+QUOTA_DENIED = Counter(
+    "boletim_quota_denied_total",
+    "Chamadas recusadas por falta de cota",
+    ["provider"],
+)
+
+# --- Pedidos idênticos simultâneos (single-flight) ---
+SINGLEFLIGHT_CALLS = Counter(
+    "boletim_singleflight_calls_total",
+    "Chamadas por grupo: executadas, que aproveitaram uma execução em andamento ou repetidas pela chave de idempotência",
+    ["group", "result"],
+)
+
+# --- Agendamentos (pré-produção) ---
+SCHEDULED_RUNS = Counter(
+    "boletim_scheduled_runs_total",
+    "Execuções de agendamentos: boletim pronto, falha ou horário perdido (pulado)",
+    ["result"],
+)
+READY_LOOKUPS = Counter(
+    "boletim_ready_lookups_total",
+    "Consultas ao boletim pré-produzido mais recente: encontrado (hit) ou não (miss)",
+    ["result"],
+)
+
+# --- Faixas de prioridade (interativo x fundo) ---
+PRIORITY_QUEUE_WAIT = Histogram(
+    "boletim_priority_queue_wait_seconds",
+    "Espera por uma vaga no recurso (gnews, llm, tts), por faixa de prioridade",
+    ["resource", "lane"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+PRIORITY_WAITING = Gauge(
+    "boletim_priority_waiting",
+    "Pedidos na fila de cada recurso, por faixa de prioridade",
+    ["resource", "lane"],
+    multiprocess_mode="livesum",
+)
+
+# --- Fila de geração (API → workers) ---
+JOBS = Counter(
+    "boletim_jobs_total",
+    "Tarefas da fila de geração: enfileiradas, concluídas, com falha ou devolvidas à fila",
+    ["kind", "result"],
+)
+JOB_QUEUE_WAIT = Histogram(
+    "boletim_job_queue_wait_seconds",
+    "Tempo entre enfileirar a tarefa e um worker reivindicá-la",
+    ["kind"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300),
+)
+
+# --- Sumarização incremental ---
+ARTICLE_SUMMARIES = Counter(
+    "boletim_article_summaries_total",
+    "Resumos por notícia: reaproveitados do cache, gerados ou com falha",
+    ["result"],
+)
+
+SUMMARY_CACHE = Counter(
+    "boletim_summary_cache_total",
+    "Consultas ao cache do boletim inteiro (hit, miss, bypass)",
+    ["result"],
+)
+
+LLM_CALL_DURATION = Histogram(
+    "boletim_llm_call_duration_seconds",
+    "Duração de cada chamada ao LLM de sumarização",
+    ["model", "kind"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+
+LLM_TOKENS = Counter(
+    "boletim_llm_tokens_total",
+    "Tokens por chamada ao LLM: estimados antes do envio, prompt e completion informados pela API",
+    ["model", "kind", "type"],
+)
+
+# --- Feeds RSS/Atom ---
+FEED_FETCHES = Counter(
+    "boletim_feed_fetches_total",
+    "Consultas aos feeds: modificado, não modificado (304), em dia (sem consulta) ou com falha",
+    ["feed", "result"],
+)
+
+# --- Enriquecimento das notícias ---
+ENRICH_FETCHES = Counter(
+    "boletim_enrich_fetches_total",
+    "Páginas de notícias: do cache, baixadas, com falha, grandes demais ou fora do prazo",
+    ["result"],
+)
+
+ENRICH_DURATION = Histogram(
+    "boletim_enrich_duration_seconds",
+    "Duração da etapa de enriquecimento de um boletim",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8),
+)
+
+# --- TTS ---
+TTS_PIPELINE_TAIL = Histogram(
+    "boletim_tts_pipeline_tail_seconds",
+    "Tempo entre o último parágrafo do resumo e o áudio pronto (pipeline sumarização → TTS)",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),
+)
+
+TTS_FALLBACKS = Counter(
+    "boletim_tts_fallback_total",
+    "Vezes em que um motor de TTS falhou e o gTTS assumiu",
+    ["from_engine"],
+)
+AUDIO_BYTES_WRITTEN = Counter(
+    "boletim_audio_bytes_written_total",
+    "Bytes de áudio gravados em disco",
+    ["engine"],
+)
+
+# --- Banco de dados ---
+DB_QUERY_DURATION = Histogram(
+    "boletim_db_query_duration_seconds",
+    "Duração das consultas SQL",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+DB_POOL_IN_USE = Gauge(
+    "boletim_db_pool_connections_in_use",
+    "Conexões do pool do banco emprestadas no momento",
+    multiprocess_mode="livesum",
+)
+
+# --- Event loop (só com MONITOR_LOOP=1) ---
+EVENT_LOOP_LAG = Histogram(
+    "boletim_event_loop_lag_seconds",
+    "Atraso do event loop medido pelo monitor de bloqueios",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def _audio_dir_bytes() -> float:
+    """Calculado apenas no momento da coleta (scrape), fora do caminho quente."""
+    try:
+        return float(sum(e.stat().st_size for e in os.scandir(AUDIO_DIR) if e.is_file()))
+    except OSError:
+        return 0.0
+
+
+class _AudioDirCollector:
+    # Coletor próprio (e não Gauge): o diretório é um só para todos os workers
+    def collect(self):
+        yield GaugeMetricFamily("boletim_audio_dir_bytes", "Tamanho total do diretório de áudio",
+                                value=_audio_dir_bytes())
+
+
+AUDIO_DIR_BYTES = _AudioDirCollector()
+REGISTRY.register(AUDIO_DIR_BYTES)
+
+
+@contextmanager
+def observe_upstream(provider: str):
+    """Mede latência e resultado (ok/error) de uma chamada externa."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        UPSTREAM_REQUESTS.labels(provider, "error").inc()
+        raise
+    else:
+        UPSTREAM_REQUESTS.labels(provider, "ok").inc()
+    finally:
+        UPSTREAM_DURATION.labels(provider).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """Registra a duração de cada consulta SQL e o uso do pool via eventos do SQLAlchemy."""
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_IN_USE.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        DB_POOL_IN_USE.dec()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "?"
+        DB_QUERY_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+async def metrics_middleware(request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Template da rota evita explosão de cardinalidade (/api/historico/{boletim_id})
+        route = request.scope.get("route")
+        label = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUEST_DURATION.labels(request.method, label, str(status)).observe(
+            time.perf_counter() - start)
+
+
+def render_metrics():
+    """Retorna (corpo, content-type) no formato de exposição do Prometheus."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(AUDIO_DIR_BYTES)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """No desligamento do worker: tira suas séries "live" da soma."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
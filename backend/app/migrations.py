@@ -0,0 +1,67 @@
+"""
+Migrações numeradas do esquema.
+
+Tabelas e colunas novas dos modelos continuam automáticas (create_all e
+_add_missing_columns, em database.init_db). Aqui ficam as mudanças que não dá
+para deduzir dos modelos — dados, índices, tipos — em ordem e uma única vez por
+banco: cada versão aplicada é registrada em `schema_migrations`.
+
+Para acrescentar uma, crie a função e anexe (versão, descrição, função) ao fim
+de MIGRATIONS. Ela recebe a conexão da transação de init_db e deve funcionar no
+SQLite e no PostgreSQL (SQL simples via text(), sem depender dos modelos atuais).
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _seed_config_version(conn: Connection):
+    # Com a linha já criada, ConfigRepository.bump é sempre um UPDATE atômico
+    # (dois workers salvando ao mesmo tempo não disputam o INSERT)
+    if conn.execute(text("SELECT 1 FROM config_version WHERE id = 1")).first() is None:
+        conn.execute(text("INSERT INTO config_version (id, version, updated_at) VALUES (1, 0, :now)"),
+                     {"now": datetime.utcnow()})
+
+
+def _index_job_claim(conn: Connection):
+    # A reivindicação procura a próxima tarefa na fila por status e ordem de chegada
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_claim ON jobs (status, lane, id)"))
+
+
+def _index_article_summaries_age(conn: Connection):
+    # Bancos anteriores ao índice do modelo: a limpeza dos resumos vencidos filtra por created_at
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_article_summaries_created_at "
+                      "ON article_summaries (created_at)"))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "linha única de config_version", _seed_config_version),
+    (2, "índice da reivindicação de tarefas", _index_job_claim),
+    (3, "índice da validade dos resumos por notícia", _index_article_summaries_age),
+]
+
+
+def apply_migrations(conn: Connection) -> int:
+    """Aplica as migrações pendentes na transação de `conn`; devolve quantas."""
+    _metadata.create_all(bind=conn)
+    applied = set(conn.scalars(select(schema_migrations.c.version)))
+    pending = [m for m in MIGRATIONS if m[0] not in applied]
+    for version, description, migrate in pending:
+        migrate(conn)
+        conn.execute(schema_migrations.insert().values(
+            version=version, description=description, applied_at=datetime.utcnow()))
+        logger.info(f"✓ Migração {version} aplicada: {description}")
+    return len(pending)
@@ -0,0 +1,192 @@
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import engine, insert_on_conflict, Boletim, ConfigVersion, IdempotencyKey, Schedule
+from settings import DB_THREADS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Sessões sem expirar no commit: os objetos saem da thread do banco já carregados
+# (e desligados da sessão), prontos para virar resposta da API
+_sessions = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False) if engine is not None else None
+# O SQLite aceita um escritor por vez: com uma thread só (padrão), as gravações
+# fazem fila aqui em vez de disputar o lock do arquivo. No PostgreSQL, várias
+# threads usam conexões do pool em paralelo.
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+
+def _in_session(fn: Callable[[Session], T]) -> T:
+    with _sessions() as session:
+        try:
+            result = fn(session)
+            session.commit()
+            return result
+        except Exception:
+            session.rollback()
+            raise
+
+
+async def run(fn: Callable[[Session], T]) -> T:
+    """
+    Executa `fn(session)` na thread do banco, numa transação própria (commit
+    no fim, rollback em erro). O event loop não espera pelo banco; o contexto
+    (trace) acompanha a chamada.
+    """
+    if _sessions is None:
+        raise RuntimeError("Banco de dados não inicializado")
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, ctx.run, _in_session, fn)
+
+
+class BoletimRepository:
+    """Histórico de boletins."""
+
+    async def add(self, summary_text: str, audio_filename: Optional[str], categories: str,
+                  schedule_id: Optional[int] = None) -> Boletim:
+        def add(session: Session) -> Boletim:
+            boletim = Boletim(summary_text=summary_text, audio_filename=audio_filename,
+                              categories=categories, schedule_id=schedule_id)
+            session.add(boletim)
+            session.flush()
+            return boletim
+        return await run(add)
+
+    async def get(self, boletim_id: int) -> Optional[Boletim]:
+        return await run(lambda session: session.get(Boletim, boletim_id))
+
+    async def list(self) -> List[Boletim]:
+        return await run(lambda session: list(session.scalars(select(Boletim).order_by(Boletim.id.desc()))))
+
+    async def version(self) -> Tuple[int, Optional[int], Optional[datetime]]:
+        """(total, último ID, último timestamp)."""
+        return await run(lambda session: tuple(session.execute(
+            select(func.count(Boletim.id), func.max(Boletim.id), func.max(Boletim.timestamp))).one()))
+
+    async def ready(self, since: datetime) -> List[Boletim]:
+        """Boletins pré-produzidos por agendamento desde `since`, do mais novo ao mais antigo."""
+        return await run(lambda session: list(session.scalars(select(Boletim).where(
+            Boletim.schedule_id.isnot(None),
+            Boletim.audio_filename.isnot(None),
+            Boletim.timestamp >= since,
+        ).order_by(Boletim.timestamp.desc()))))
+
+    async def delete(self, boletim_id: int) -> Optional[Boletim]:
+        """Remove e devolve o boletim (para apagar o áudio), ou None se não existir."""
+        def delete(session: Session) -> Optional[Boletim]:
+            boletim = session.get(Boletim, boletim_id)
+            if boletim is not None:
+                session.delete(boletim)
+            return boletim
+        return await run(delete)
+
+    async def delete_up_to(self, max_id: int) -> List[Boletim]:
+        """Remove e devolve todos os boletins com ID <= max_id."""
+        def delete(session: Session) -> List[Boletim]:
+            boletins = list(session.scalars(select(Boletim).where(Boletim.id <= max_id)))
+            for boletim in boletins:
+                session.delete(boletim)
+            return boletins
+        return await run(delete)
+
+
+class ScheduleRepository:
+    """Agendamentos de pré-produção."""
+
+    async def list(self) -> List[Schedule]:
+        return await run(lambda session: list(session.scalars(select(Schedule).order_by(Schedule.id))))
+
+    async def get(self, schedule_id: int) -> Optional[Schedule]:
+        return await run(lambda session: session.get(Schedule, schedule_id))
+
+    async def due(self, now: datetime) -> List[Dict]:
+        """Agendamentos ativos com horário vencido, como dicts (o agendador os passa adiante)."""
+        table = Schedule.__table__
+        return await run(lambda session: [dict(row._mapping) for row in session.execute(
+            table.select().where(table.c.enabled.is_(True), table.c.next_run_at <= now)
+            .order_by(table.c.next_run_at))])
+
+    async def add(self, **values) -> Schedule:
+        def add(session: Session) -> Schedule:
+            schedule = Schedule(**values)
+            session.add(schedule)
+            session.flush()
+            return schedule
+        return await run(add)
+
+    async def update(self, schedule_id: int, **values) -> Optional[Schedule]:
+        def update(session: Session) -> Optional[Schedule]:
+            schedule = session.get(Schedule, schedule_id)
+            if schedule is not None:
+                for name, value in values.items():
+                    setattr(schedule, name, value)
+            return schedule
+        return await run(update)
+
+    async def delete(self, schedule_id: int) -> bool:
+        def delete(session: Session) -> bool:
+            schedule = session.get(Schedule, schedule_id)
+            if schedule is None:
+                return False
+            session.delete(schedule)
+            return True
+        return await run(delete)
+
+
+class IdempotencyRepository:
+    """Chaves de idempotência já atendidas (vale para todos os workers)."""
+
+    async def get(self, key: str, since: datetime) -> Optional[Boletim]:
+        """Boletim gerado para `key` desde `since`, se ainda existir no histórico."""
+        def get(session: Session) -> Optional[Boletim]:
+            record = session.get(IdempotencyKey, key)
+            if record is None or record.created_at < since:
+                return None
+            return session.get(Boletim, record.boletim_id)
+        return await run(get)
+
+    async def add(self, key: str, boletim_id: int, expired_before: datetime):
+        """Registra a chave e aproveita para apagar as vencidas."""
+        def add(session: Session):
+            table = IdempotencyKey.__table__
+            session.execute(table.delete().where(table.c.created_at < expired_before))
+            # Dois workers atendendo a mesma chave: o último a terminar prevalece, sem erro
+            values = {"boletim_id": boletim_id, "created_at": datetime.utcnow()}
+            session.execute(insert_on_conflict(table).values(key=key, **values)
+                            .on_conflict_do_update(index_elements=["key"], set_=values))
+        await run(add)
+
+
+class ConfigRepository:
+    """Versão da configuração (.env) compartilhada entre os workers."""
+
+    async def version(self) -> int:
+        return await run(lambda session: session.scalar(select(ConfigVersion.version).where(ConfigVersion.id == 1)) or 0)
+
+    async def bump(self) -> int:
+        """Soma 1 à versão e devolve o novo valor."""
+        table = ConfigVersion.__table__
+
+        def bump(session: Session) -> int:
+            # UPDATE atômico: dois workers salvando juntos não perdem um incremento
+            updated = session.execute(update(table).where(table.c.id == 1).values(
+                version=table.c.version + 1, updated_at=datetime.utcnow())).rowcount
+            if not updated:
+                session.add(ConfigVersion(id=1, version=1))
+                session.flush()
+            return session.scalar(select(table.c.version).where(table.c.id == 1))
+        return await run(bump)
+
+
+boletins = BoletimRepository()
+schedules = ScheduleRepository()
+idempotency = IdempotencyRepository()
+config = ConfigRepository()
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from opentelemetry import trace
+from sqlalchemy.orm import Session
+
+import metrics
+import repository
+from database import engine, insert_on_conflict, ArticleBody
+from settings import (
+    ENRICH_CACHE_TTL_HOURS,
+    ENRICH_DEADLINE_S,
+    ENRICH_MAX_BYTES,
+    ENRICH_MAX_CHARS,
+    ENRICH_MAX_CONNECTIONS,
+    ENRICH_PER_HOST,
+    ENRICH_TIMEOUT_S,
+)
+
+try:
+    from selectolax.parser import HTMLParser as FastHTMLParser
+except ImportError:  # extração cai para o html.parser da biblioteca padrão
+    FastHTMLParser = None
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# Partes da página que não são o texto da notícia
+_SKIP_TAGS = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figure", "svg", "button")
+# Parágrafos curtos costumam ser legendas, assinaturas e chamadas para outras matérias
+_MIN_PARAGRAPH_CHARS = 40
+_SPACES = re.compile(r"\s+")
+
+
+class _ParagraphParser(HTMLParser):
+    """Coleta o texto dos <p> fora de menus/rodapés, marcando os que estão dentro de <article>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_depth = 0
+        self.article_depth = 0
+        self.current: Optional[List[str]] = None
+        self.paragraphs: List[tuple] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "article":
+            self.article_depth += 1
+        elif tag == "p" and not self.skip_depth:
+            self._close_paragraph()  # <p> sem fechamento explícito
+            self.current = []
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == "article":
+            self._close_paragraph()
+            self.article_depth = max(0, self.article_depth - 1)
+        elif tag == "p":
+            self._close_paragraph()
+
+    def handle_data(self, data):
+        if self.current is not None and not self.skip_depth:
+            self.current.append(data)
+
+    def _close_paragraph(self):
+        if self.current is not None:
+            self.paragraphs.append(("".join(self.current), self.article_depth > 0))
+            self.current = None
+
+
+def _paragraphs_stdlib(html: str) -> List[str]:
+    parser = _ParagraphParser()
+    parser.feed(html)
+    parser.close()
+    parser._close_paragraph()
+    in_article = [text for text, inside in parser.paragraphs if inside]
+    return in_article or [text for text, _ in parser.paragraphs]
+
+
+def _paragraphs_fast(html: str) -> List[str]:
+    tree = FastHTMLParser(html)
+    for node in tree.css(",".join(_SKIP_TAGS)):
+        node.decompose()
+    root = tree.css_first("article") or tree.body
+    return [p.text(separator=" ") for p in root.css("p")] if root else []
+
+
+def extract_text(html: str, max_chars: int = ENRICH_MAX_CHARS) -> str:
+    """Texto principal da página: parágrafos do <article> (ou da página toda) limitados a `max_chars`."""
+    paragraphs = _paragraphs_fast(html) if FastHTMLParser else _paragraphs_stdlib(html)
+    text = ""
+    for paragraph in paragraphs:
+        paragraph = _SPACES.sub(" ", paragraph).strip()
+        if len(paragraph) < _MIN_PARAGRAPH_CHARS:
+            continue
+        if len(text) + len(paragraph) + 1 > max_chars:
+            break
+        text = f"{text} {paragraph}" if text else paragraph
+    return text
+
+
+class ArticleEnricher:
+    """
+    Baixa as páginas das notícias em paralelo e extrai o texto principal.
+
+    Um único cliente com pool de conexões atende todas as páginas, com no
+    máximo ENRICH_PER_HOST downloads simultâneos por site. Cada página tem
+    timeout próprio e limite de tamanho; a etapa inteira tem um prazo — o que
+    não chegar a tempo segue só com a descrição do GNews. Textos extraídos
+    ficam no banco por URL.
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=ENRICH_MAX_CONNECTIONS,
+                                max_keepalive_connections=ENRICH_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(ENRICH_TIMEOUT_S),
+            follow_redirects=True,
+            max_redirects=3,
+            headers={"User-Agent": "Mozilla/5.0 (compatible; BoletimOnAir/1.0)"},
+        )
+        self._hosts: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(ENRICH_PER_HOST))
+
+    async def enrich(self, articles: List[Dict]) -> List[Dict]:
+        """Devolve as notícias com o campo 'body' preenchido quando a página foi lida."""
+        urls = list(dict.fromkeys(
+            a["url"] for a in articles if str(a.get("url", "")).startswith(("http://", "https://"))))
+        if not urls:
+            return articles
+
+        start = time.perf_counter()
+        with tracer.start_as_current_span("enrich.articles") as span:
+            bodies = await self._load_cached(urls)
+            metrics.ENRICH_FETCHES.labels("cached").inc(len(bodies))
+
+            tasks = {asyncio.ensure_future(self._fetch(url)): url for url in urls if url not in bodies}
+            if tasks:
+                done, late = await asyncio.wait(tasks, timeout=ENRICH_DEADLINE_S)
+                for task in late:
+                    task.cancel()
+                await asyncio.gather(*late, return_exceptions=True)
+                metrics.ENRICH_FETCHES.labels("timeout").inc(len(late))
+                if late:
+                    logger.warning(f"Enriquecimento: {len(late)} página(s) fora do prazo de {ENRICH_DEADLINE_S}s")
+
+                fresh = {tasks[task]: task.result() for task in done if task.result()}
+                await self._store_cached(fresh)
+                bodies.update(fresh)
+
+            span.set_attribute("enrich.urls", len(urls))
+            span.set_attribute("enrich.enriched", len(bodies))
+        metrics.ENRICH_DURATION.observe(time.perf_counter() - start)
+        logger.info(f"✓ Enriquecimento: {len(bodies)}/{len(urls)} notícia(s) com texto completo")
+
+        return [{**a, "body": bodies[a["url"]]} if a.get("url") in bodies else a for a in articles]
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        host = urlsplit(url).hostname or ""
+        try:
+            async with self._hosts[host]:
+                html = await asyncio.wait_for(self._download(url), ENRICH_TIMEOUT_S)
+            if html is None:
+                return None
+            # O parse de páginas grandes leva dezenas de ms: fora do event loop
+            text = await asyncio.to_thread(extract_text, html)
+            metrics.ENRICH_FETCHES.labels("fetched" if text else "empty").inc()
+            return text or None
+        except Exception as e:
+            logger.debug(f"Enriquecimento de {url} falhou: {type(e).__name__}: {e}")
+            metrics.ENRICH_FETCHES.labels("failed").inc()
+            return None
+
+    async def _download(self, url: str) -> Optional[str]:
+        """Lê no máximo ENRICH_MAX_BYTES; páginas maiores são cortadas (o texto costuma vir no início)."""
+        async with self.client.stream("GET", url) as r:
+            r.raise_for_status()
+            if "html" not in r.headers.get("content-type", ""):
+                metrics.ENRICH_FETCHES.labels("not_html").inc()
+                return None
+            chunks, size = [], 0
+            async for chunk in r.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= ENRICH_MAX_BYTES:
+                    metrics.ENRICH_FETCHES.labels("truncated").inc()
+                    break
+            return b"".join(chunks)[:ENRICH_MAX_BYTES].decode(r.encoding or "utf-8", errors="replace")
+
+    # --- Cache por URL (banco) ---
+
+    async def _load_cached(self, urls: List[str]) -> Dict[str, str]:
+        if engine is None or ENRICH_CACHE_TTL_HOURS <= 0:
+            return {}
+        table = ArticleBody.__table__
+        limite = datetime.utcnow() - timedelta(hours=ENRICH_CACHE_TTL_HOURS)
+        try:
+            return await repository.run(lambda session: {row.url: row.body_text for row in session.execute(
+                table.select().where(table.c.url.in_(urls), table.c.fetched_at >= limite))})
+        except Exception as e:
+            logger.warning(f"Cache de páginas indisponível: {e}")
+            return {}
+
+    async def _store_cached(self, bodies: Dict[str, str]):
+        if engine is None or ENRICH_CACHE_TTL_HOURS <= 0 or not bodies:
+            return
+        table = ArticleBody.__table__
+
+        def store(session: Session):
+            session.execute(table.delete().where(
+                table.c.fetched_at < datetime.utcnow() - timedelta(hours=ENRICH_CACHE_TTL_HOURS)))
+            stmt = insert_on_conflict(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.url],
+                set_={"body_text": stmt.excluded.body_text, "fetched_at": stmt.excluded.fetched_at})
+            session.execute(stmt, [
+                {"url": url, "body_text": text, "fetched_at": datetime.utcnow()}
+                for url, text in bodies.items()
+            ])
+
+        try:
+            await repository.run(store)
+        except Exception as e:
+            logger.warning(f"Não foi possível guardar páginas em cache: {e}")
@@ -0,0 +1,303 @@
+import asyncio
+import html
+import json
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import httpx
+from opentelemetry import trace
+
+import metrics
+import repository
+from database import engine, insert_on_conflict, FeedCache
+from settings import (
+    NEWS_FEEDS,
+    NEWS_FEEDS_MAX_ITEMS,
+    NEWS_FEEDS_REFRESH_S,
+    NEWS_FEEDS_TIMEOUT_S,
+)
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# Feeds públicos de veículos brasileiros, com as categorias do sistema que cobrem
+DEFAULT_FEEDS = [
+    {"name": "G1",              "url": "https://g1.globo.com/rss/g1/",                              "categories": ["geral"]},
+    {"name": "G1",              "url": "https://g1.globo.com/rss/g1/politica/",                     "categories": ["politica"]},
+    {"name": "G1",              "url": "https://g1.globo.com/rss/g1/economia/",                     "categories": ["economia"]},
+    {"name": "G1",              "url": "https://g1.globo.com/rss/g1/mundo/",                        "categories": ["mundo"]},
+    {"name": "G1",              "url": "https://g1.globo.com/rss/g1/tecnologia/",                   "categories": ["tecnologia"]},
+    {"name": "G1",              "url": "https://g1.globo.com/rss/g1/ciencia-e-saude/",              "categories": ["ciencia", "saude"]},
+    {"name": "G1",              "url": "https://g1.globo.com/rss/g1/pop-arte/",                     "categories": ["entretenimento"]},
+    {"name": "ge",              "url": "https://ge.globo.com/rss/ge/",                              "categories": ["esportes", "futebol"]},
+    {"name": "Folha de S.Paulo", "url": "https://feeds.folha.uol.com.br/emcimadahora/rss091.xml",   "categories": ["geral"]},
+    {"name": "Folha de S.Paulo", "url": "https://feeds.folha.uol.com.br/poder/rss091.xml",          "categories": ["politica"]},
+    {"name": "Folha de S.Paulo", "url": "https://feeds.folha.uol.com.br/mercado/rss091.xml",        "categories": ["economia"]},
+    {"name": "Folha de S.Paulo", "url": "https://feeds.folha.uol.com.br/esporte/rss091.xml",        "categories": ["esportes"]},
+    {"name": "Agência Brasil",  "url": "https://agenciabrasil.ebc.com.br/rss/ultimasnoticias/feed.xml", "categories": ["geral"]},
+]
+
+# Rótulos <category> dos itens (sem acento, minúsculos) → categorias do sistema
+CATEGORY_ALIASES = {
+    "politica":       "politica",
+    "poder":          "politica",
+    "economia":       "economia",
+    "mercado":        "economia",
+    "negocios":       "economia",
+    "mundo":          "mundo",
+    "internacional":  "mundo",
+    "tecnologia":     "tecnologia",
+    "ciencia":        "ciencia",
+    "saude":          "saude",
+    "esporte":        "esportes",
+    "esportes":       "esportes",
+    "futebol":        "futebol",
+    "entretenimento": "entretenimento",
+    "cultura":        "entretenimento",
+    "pop & arte":     "entretenimento",
+}
+
+_TAGS = re.compile(r"<[^>]+>")
+_SPACES = re.compile(r"\s+")
+
+
+def _local(tag: str) -> str:
+    """Nome da tag sem namespace: '{http://www.w3.org/2005/Atom}entry' → 'entry'."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return _SPACES.sub(" ", text).strip().lower()
+
+
+def _plain(text: str) -> str:
+    """Descrições de feeds costumam trazer HTML escapado (imagens, links)."""
+    return _SPACES.sub(" ", html.unescape(_TAGS.sub(" ", html.unescape(text or "")))).strip()
+
+
+def _iso_date(value: str) -> str:
+    """RFC 822 (RSS) ou ISO 8601 (Atom) → mesmo formato do GNews, em UTC."""
+    if not value:
+        return ""
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            moment = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return ""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FeedParser:
+    """
+    Parser incremental de RSS 2.0/Atom: recebe a resposta em pedaços e
+    converte cada <item>/<entry> assim que ele fecha. Para de ler quando
+    atinge `max_items` (os itens mais novos vêm primeiro nos feeds).
+    """
+
+    def __init__(self, max_items: int = NEWS_FEEDS_MAX_ITEMS):
+        self.max_items = max_items
+        self.items: List[Dict] = []
+        self._parser = XMLPullParser(events=("end",))
+
+    @property
+    def done(self) -> bool:
+        return len(self.items) >= self.max_items
+
+    def feed(self, chunk: bytes):
+        self._parser.feed(chunk)
+        for _, elem in self._parser.read_events():
+            if _local(elem.tag) in ("item", "entry") and not self.done:
+                item = self._convert(elem)
+                if item:
+                    self.items.append(item)
+                elem.clear()
+
+    def close(self):
+        self._parser.close()
+
+    @staticmethod
+    def _convert(elem) -> Optional[Dict]:
+        fields, labels, link = {}, [], ""
+        for child in elem:
+            name = _local(child.tag)
+            if name == "link":
+                # Atom: <link rel="alternate" href="..."/>; RSS: <link>...</link>
+                if not link and child.get("rel", "alternate") == "alternate":
+                    link = (child.get("href") or child.text or "").strip()
+            elif name == "category":
+                labels.append(child.get("term") or child.text or "")
+            else:
+                fields.setdefault(name, (child.text or "").strip())
+
+        title = _plain(fields.get("title", ""))
+        if not title:
+            return None
+        return {
+            "title":        title,
+            "summary":      _plain(fields.get("description") or fields.get("summary")
+                                   or fields.get("encoded") or fields.get("content") or ""),
+            "url":          link or fields.get("guid", ""),
+            "published_at": _iso_date(fields.get("pubDate") or fields.get("published")
+                                      or fields.get("updated") or fields.get("date") or ""),
+            "labels":       [l.strip() for l in labels if l.strip()],
+        }
+
+
+def load_feeds() -> List[Dict]:
+    """Lista de feeds: NEWS_FEEDS (JSON inline ou arquivo .json) ou a lista padrão."""
+    if not NEWS_FEEDS:
+        return DEFAULT_FEEDS
+    try:
+        raw = Path(NEWS_FEEDS).read_text(encoding="utf-8") if NEWS_FEEDS.endswith(".json") else NEWS_FEEDS
+        return json.loads(raw)
+    except (OSError, ValueError) as e:
+        logger.error(f"✗ NEWS_FEEDS inválido ({e}); usando a lista padrão")
+        return DEFAULT_FEEDS
+
+
+class FeedSource:
+    """
+    Notícias dos feeds RSS/Atom dos veículos, no mesmo formato do NewsCollector.
+
+    Cada feed é consultado no máximo a cada NEWS_FEEDS_REFRESH_S segundos,
+    sempre com GET condicional (If-None-Match / If-Modified-Since): um 304 não
+    transfere nada. Os itens convertidos ficam no banco e são reaproveitados
+    até a próxima mudança. Os feeds não têm cota — só a cortesia do intervalo.
+    """
+
+    def __init__(self, feeds: Optional[List[Dict]] = None):
+        self.feeds = feeds if feeds is not None else load_feeds()
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(NEWS_FEEDS_TIMEOUT_S),
+            follow_redirects=True,
+            headers={"User-Agent": "Mozilla/5.0 (compatible; BoletimOnAir/1.0)"},
+        )
+        # Pedidos simultâneos da mesma categoria esperam uma única atualização do feed
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def feeds_for(self, category: str) -> List[Dict]:
+        """Feeds da categoria e os gerais (seus itens trazem rótulos de seção)."""
+        return [f for f in self.feeds if f.get("url") and {category, "geral"} & set(f.get("categories", []))]
+
+    async def collect(self, category: str, limit: int) -> List[Dict]:
+        """Itens mais recentes da categoria (do próprio feed ou por rótulo do item)."""
+        feeds = self.feeds_for(category)
+        if not feeds:
+            return []
+
+        with tracer.start_as_current_span("feeds.collect") as span:
+            span.set_attribute("news.category", category)
+            results = await asyncio.gather(*(self._refresh(f) for f in feeds))
+
+        articles = []
+        for feed, items in zip(feeds, results):
+            feed_categories = set(feed.get("categories", []))
+            for item in items:
+                labels = {CATEGORY_ALIASES.get(_normalize(l)) for l in item["labels"]} - {None}
+                # Futebol também vale para esportes
+                if "futebol" in labels:
+                    labels.add("esportes")
+                if category not in feed_categories | labels:
+                    continue
+                articles.append({
+                    "title":        item["title"],
+                    "summary":      item["summary"],
+                    "source":       feed.get("name", "Feed"),
+                    "url":          item["url"],
+                    "category":     category,
+                    "published_at": item["published_at"],
+                })
+
+        articles.sort(key=lambda a: a["published_at"], reverse=True)
+        return articles[:limit]
+
+    async def _refresh(self, feed: Dict) -> List[Dict]:
+        """Itens do feed, consultando a origem só se o cache passou do intervalo."""
+        url, name = feed["url"], feed.get("name", feed["url"])
+        async with self._locks[url]:
+            cached = await self._load(url)
+            if cached and cached.checked_at >= datetime.utcnow() - timedelta(seconds=NEWS_FEEDS_REFRESH_S):
+                metrics.FEED_FETCHES.labels(name, "fresh").inc()
+                return json.loads(cached.items)
+
+            headers = {}
+            if cached and cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached and cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+            try:
+                with tracer.start_as_current_span("feeds.fetch") as span:
+                    span.set_attribute("feed.url", url)
+                    async with self.client.stream("GET", url, headers=headers) as r:
+                        span.set_attribute("http.response.status_code", r.status_code)
+                        if r.status_code == 304 and cached:
+                            metrics.FEED_FETCHES.labels(name, "not_modified").inc()
+                            await self._touch(url)
+                            return json.loads(cached.items)
+                        r.raise_for_status()
+                        parser = FeedParser()
+                        async for chunk in r.aiter_bytes():
+                            parser.feed(chunk)
+                            if parser.done:
+                                break
+                        else:
+                            parser.close()
+                        etag, last_modified = r.headers.get("etag"), r.headers.get("last-modified")
+            except (httpx.HTTPError, ParseError) as e:
+                logger.warning(f"✗ Feed '{name}' indisponível ({type(e).__name__}: {e})")
+                metrics.FEED_FETCHES.labels(name, "failed").inc()
+                # Itens antigos são melhores que nada; o intervalo recomeça para não insistir
+                await self._touch(url)
+                return json.loads(cached.items) if cached else []
+
+            metrics.FEED_FETCHES.labels(name, "modified").inc()
+            await self._store(url, etag, last_modified, parser.items)
+            return parser.items
+
+    # --- Estado dos feeds (banco) ---
+
+    async def _load(self, url: str):
+        if engine is None:
+            return None
+        table = FeedCache.__table__
+        try:
+            return await repository.run(
+                lambda session: session.execute(table.select().where(table.c.url == url)).first())
+        except Exception as e:
+            logger.warning(f"Cache de feeds indisponível: {e}")
+            return None
+
+    async def _store(self, url: str, etag: Optional[str], last_modified: Optional[str], items: List[Dict]):
+        if engine is None:
+            return
+        values = {"etag": etag, "last_modified": last_modified,
+                  "items": json.dumps(items, ensure_ascii=False), "checked_at": datetime.utcnow()}
+        try:
+            await repository.run(lambda session: session.execute(
+                insert_on_conflict(FeedCache.__table__).values(url=url, **values)
+                .on_conflict_do_update(index_elements=["url"], set_=values)))
+        except Exception as e:
+            logger.warning(f"Não foi possível guardar o feed em cache: {e}")
+
+    async def _touch(self, url: str):
+        if engine is None:
+            return
+        table = FeedCache.__table__
+        try:
+            await repository.run(lambda session: session.execute(
+                table.update().where(table.c.url == url).values(checked_at=datetime.utcnow())))
+        except Exception as e:
+            logger.warning(f"Não foi possível atualizar o feed em cache: {e}")
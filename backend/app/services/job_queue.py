@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+import metrics
+import repository
+from database import Job
+from services.priority import INTERACTIVE
+from settings import JOB_MAX_ATTEMPTS, JOB_POLL_S, JOB_QUEUE_BACKEND
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobFailed(Exception):
+    """A tarefa terminou com erro no worker (status HTTP e mensagem originais)."""
+
+    def __init__(self, detail: str, status_code: int = 500):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class JobQueue(ABC):
+    """
+    Fila de tarefas de geração entre a API e os workers. As tarefas são dicts
+    com id, kind, payload (já decodificado), lane, status, attempts e datas.
+    Outras filas (Redis, SQS...) entram implementando estes métodos e se
+    registrando em _BACKENDS.
+    """
+
+    @abstractmethod
+    async def enqueue(self, kind: str, payload: Dict, lane: str = INTERACTIVE) -> int:
+        """Põe a tarefa na fila da faixa `lane` e devolve o id."""
+
+    @abstractmethod
+    async def claim(self, worker: str) -> Optional[Dict]:
+        """Reivindica a próxima tarefa (interativas antes das de fundo), ou None."""
+
+    @abstractmethod
+    async def heartbeat(self, job_ids: List[int]):
+        """Renova o sinal de vida das tarefas em andamento deste worker."""
+
+    @abstractmethod
+    async def complete(self, job_id: int, result: Any):
+        """Marca a tarefa como concluída com o resultado (serializável em JSON)."""
+
+    @abstractmethod
+    async def fail(self, job_id: int, error: str, status_code: int = 500):
+        """Marca a tarefa como falha, com a mensagem e o status HTTP para a API."""
+
+    @abstractmethod
+    async def get(self, job_id: int) -> Optional[Dict]:
+        """A tarefa pelo id, ou None se ela não existe (mais)."""
+
+    @abstractmethod
+    async def requeue_stale(self, older_than: datetime) -> int:
+        """Devolve à fila tarefas de workers que pararam de dar sinal; devolve quantas."""
+
+    @abstractmethod
+    async def purge(self, finished_before: datetime) -> int:
+        """Apaga tarefas terminadas antes de `finished_before`; devolve quantas."""
+
+    async def wait(self, job_id: int, timeout: float) -> Any:
+        """Espera a tarefa terminar e devolve o resultado (ou levanta JobFailed/TimeoutError)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                raise JobFailed(f"Tarefa {job_id} não existe mais", 404)
+            if job["status"] == DONE:
+                return job["result"]
+            if job["status"] == FAILED:
+                raise JobFailed(job["error"] or "falha no worker", job["error_status"] or 500)
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Tarefa {job_id} ainda {job['status']} após {timeout:.0f}s")
+            await asyncio.sleep(JOB_POLL_S)
+
+
+def _decode(row) -> Dict:
+    job = dict(row._mapping)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+class DatabaseJobQueue(JobQueue):
+    """
+    Fila na tabela `jobs` do banco da aplicação. A reivindicação é um único
+    UPDATE ... WHERE status = 'queued' RETURNING: dois workers nunca pegam a
+    mesma tarefa, sem precisar de lock à parte. No PostgreSQL, a escolha da
+    próxima usa FOR UPDATE SKIP LOCKED: quem chega junto pega a seguinte em vez
+    de esperar a transação do outro e voltar sem nada.
+    """
+
+    table = Job.__table__
+
+    async def enqueue(self, kind: str, payload: Dict, lane: str = INTERACTIVE) -> int:
+        t = self.table
+
+        def enqueue(session: Session) -> int:
+            return session.execute(t.insert().values(
+                kind=kind, payload=json.dumps(payload), lane=lane, status=QUEUED,
+                attempts=0, created_at=datetime.utcnow(),
+            ).returning(t.c.id)).scalar_one()
+
+        job_id = await repository.run(enqueue)
+        metrics.JOBS.labels(kind, "queued").inc()
+        return job_id
+
+    async def claim(self, worker: str) -> Optional[Dict]:
+        t = self.table
+
+        def claim(session: Session) -> Optional[Dict]:
+            now = datetime.utcnow()
+            next_id = (select(t.c.id).where(t.c.status == QUEUED)
+                       .order_by(case((t.c.lane == INTERACTIVE, 0), else_=1), t.c.id)
+                       .limit(1).with_for_update(skip_locked=True).scalar_subquery())
+            row = session.execute(update(t).where(t.c.id == next_id, t.c.status == QUEUED).values(
+                status=RUNNING, worker=worker, attempts=t.c.attempts + 1,
+                started_at=now, heartbeat_at=now,
+            ).returning(*t.c)).first()
+            return _decode(row) if row else None
+
+        job = await repository.run(claim)
+        if job:
+            metrics.JOB_QUEUE_WAIT.labels(job["kind"]).observe(
+                (job["started_at"] - job["created_at"]).total_seconds())
+        return job
+
+    async def heartbeat(self, job_ids: List[int]):
+        if not job_ids:
+            return
+        t = self.table
+        await repository.run(lambda session: session.execute(update(t).where(
+            t.c.id.in_(job_ids), t.c.status == RUNNING).values(heartbeat_at=datetime.utcnow())))
+
+    async def _finish(self, job_id: int, **values):
+        t = self.table
+        await repository.run(lambda session: session.execute(update(t).where(
+            t.c.id == job_id, t.c.status == RUNNING).values(finished_at=datetime.utcnow(), **values)))
+
+    async def complete(self, job_id: int, result: Any):
+        await self._finish(job_id, status=DONE, result=json.dumps(result))
+
+    async def fail(self, job_id: int, error: str, status_code: int = 500):
+        await self._finish(job_id, status=FAILED, error=error, error_status=status_code)
+
+    async def get(self, job_id: int) -> Optional[Dict]:
+        t = self.table
+        row = await repository.run(lambda session: session.execute(t.select().where(t.c.id == job_id)).first())
+        return _decode(row) if row else None
+
+    async def requeue_stale(self, older_than: datetime) -> int:
+        t = self.table
+
+        def requeue(session: Session) -> List:
+            stale = (t.c.status == RUNNING) & (t.c.heartbeat_at < older_than)
+            failed = session.execute(update(t).where(stale, t.c.attempts >= JOB_MAX_ATTEMPTS).values(
+                status=FAILED, error="worker parou durante a execução", error_status=500,
+                finished_at=datetime.utcnow()).returning(t.c.kind)).all()
+            requeued = session.execute(update(t).where(stale).values(
+                status=QUEUED, worker=None).returning(t.c.kind)).all()
+            return [(row.kind, "failed") for row in failed] + [(row.kind, "requeued") for row in requeued]
+
+        outcomes = await repository.run(requeue)
+        for kind, result in outcomes:
+            metrics.JOBS.labels(kind, result).inc()
+        if outcomes:
+            logger.warning(f"⚠️ {len(outcomes)} tarefa(s) sem sinal do worker: devolvidas à fila ou encerradas")
+        return len(outcomes)
+
+    async def purge(self, finished_before: datetime) -> int:
+        t = self.table
+        return await repository.run(lambda session: session.execute(t.delete().where(
+            t.c.status.in_((DONE, FAILED)), t.c.finished_at < finished_before)).rowcount)
+
+
+_BACKENDS = {"database": DatabaseJobQueue}
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Fila configurada em JOB_QUEUE_BACKEND, compartilhada no processo todo."""
+    global _queue
+    if _queue is None:
+        if JOB_QUEUE_BACKEND not in _BACKENDS:
+            raise ValueError(f"JOB_QUEUE_BACKEND desconhecido: '{JOB_QUEUE_BACKEND}'")
+        _queue = _BACKENDS[JOB_QUEUE_BACKEND]()
+    return _queue
+
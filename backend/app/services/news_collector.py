@@ -1,10 +1,24 @@
+import json
 import logging
 import os
 import httpx
 import asyncio
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta
+from itertools import zip_longest
+from typing import List, Dict, Optional, Tuple
+from opentelemetry import trace
+
+import repository
+from database import engine, insert_on_conflict, HeadlineCache
+from services.feed_source import FeedSource
+from services.priority import get_limiter
+from services.quota import QuotaExceededError, get_quota
+from services.singleflight import SingleFlight
+from services.upstream import get_upstream
+from settings import GNEWS_BASE_URL, HEADLINE_CACHE_MAX_AGE_HOURS, NEWS_FEEDS_ENABLED
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 
 class NewsCollector:
@@ -12,12 +26,15 @@ class NewsCollector:
     Coleta notícias usando a API GNews via endpoint TOP-HEADLINES.
     Retorna apenas notícias recentes (sem mistura com dados históricos).
     Plano gratuito: atraso de 12h, sem limite de datas além de 30 dias.
+
+    Com NEWS_FEEDS_ENABLED, os feeds RSS/Atom dos veículos entram junto
+    (ver services.feed_source), intercalados com as manchetes do GNews.
     """
 
     def __init__(self):
         self.api_key    = os.getenv("GNEWS_API_KEY")
-        self.url_top    = "https://gnews.io/api/v4/top-headlines"
-        self.url_search = "https://gnews.io/api/v4/search"   # fallback
+        self.url_top    = f"{GNEWS_BASE_URL}/top-headlines"
+        self.url_search = f"{GNEWS_BASE_URL}/search"   # fallback
 
         if not self.api_key:
             logger.error("ERRO: GNEWS_API_KEY não definida.")
@@ -52,6 +69,11 @@ class NewsCollector:
         }
 
         self.client = httpx.AsyncClient()
+        self.upstream = get_upstream("gnews")
+        self.quota = get_quota("gnews")
+        self.feeds = FeedSource() if NEWS_FEEDS_ENABLED else None
+        self._flights = SingleFlight("gnews")
+        self.slots = get_limiter("gnews")
 
     async def collect(
         self,
@@ -62,15 +84,54 @@ class NewsCollector:
         if not self.api_key or not categories:
             return []
 
-        articles_per_category = max(1, int(limit / len(categories)))
+        articles_per_category = self._per_category(categories, limit)
         logger.info(f"Coletando top-headlines para: {categories}")
 
-        tasks = [
-            self._fetch_category(cat.lower().strip(), articles_per_category)
-            for cat in categories
+        with tracer.start_as_current_span("news.collect") as span:
+            span.set_attribute("news.categories", categories)
+            span.set_attribute("news.limit", limit)
+            tasks = [
+                self._collect_category(cat.lower().strip(), articles_per_category)
+                for cat in categories
+            ]
+            results = await asyncio.gather(*tasks)
+
+        return self._merge(results, limit)
+
+    async def collect_batch(self, specs: List[Tuple[List[str], int]]) -> List[List[Dict]]:
+        """
+        Notícias de vários boletins de uma vez: cada categoria é buscada uma única
+        vez, com o maior número de notícias pedido entre os boletins, e cada
+        boletim recebe o recorte que `collect` lhe daria. `specs` = [(categorias, limite)].
+        """
+        if not self.api_key:
+            return [[] for _ in specs]
+
+        needed: Dict[str, int] = {}
+        for categories, limit in specs:
+            for cat in categories:
+                cat = cat.lower().strip()
+                needed[cat] = max(needed.get(cat, 0), self._per_category(categories, limit))
+        logger.info(f"Coletando top-headlines em lote para {len(specs)} boletim(ns): {list(needed)}")
+
+        with tracer.start_as_current_span("news.collect_batch") as span:
+            span.set_attribute("news.categories", list(needed))
+            span.set_attribute("news.bulletins", len(specs))
+            results = await asyncio.gather(*(self._collect_category(cat, n) for cat, n in needed.items()))
+        by_category = dict(zip(needed, results))
+
+        return [
+            self._merge([by_category[cat.lower().strip()][:self._per_category(categories, limit)]
+                         for cat in categories], limit) if categories else []
+            for categories, limit in specs
         ]
-        results = await asyncio.gather(*tasks)
 
+    @staticmethod
+    def _per_category(categories: List[str], limit: int) -> int:
+        return max(1, int(limit / len(categories)))
+
+    @staticmethod
+    def _merge(results: List[List[Dict]], limit: int) -> List[Dict]:
         all_articles = []
         seen_titles  = set()
 
@@ -82,10 +143,50 @@ class NewsCollector:
 
         return all_articles[:limit]
 
+    async def _collect_category(self, category: str, max_articles: int) -> List[Dict]:
+        """
+        GNews e feeds em paralelo, intercalados (cada lista já vem da mais recente
+        para a mais antiga) — ordenar só pela data deixaria o GNews, com 12h de
+        atraso no plano gratuito, sempre de fora.
+        """
+        if self.feeds is None:
+            return await self._fetch_category(category, max_articles)
+
+        gnews, feeds = await asyncio.gather(
+            self._fetch_category(category, max_articles),
+            self._fetch_feeds(category, max_articles),
+        )
+        merged, seen_urls = [], set()
+        for article in (a for pair in zip_longest(gnews, feeds) for a in pair if a):
+            if article["url"] and article["url"] in seen_urls:
+                continue
+            seen_urls.add(article["url"])
+            merged.append(article)
+        return merged[:max_articles]
+
+    async def _fetch_feeds(self, category: str, max_articles: int) -> List[Dict]:
+        try:
+            return await self.feeds.collect(category, max_articles)
+        except Exception as e:
+            logger.error(f"Erro nos feeds para '{category}': {e}")
+            return []
+
     async def _fetch_category(self, category: str, max_articles: int) -> List[Dict]:
-        """Busca notícias pelo endpoint top-headlines; usa search como fallback."""
+        """Boletins simultâneos da mesma categoria dividem uma única busca (e uma só unidade da cota)."""
+        articles = await self._flights.do(
+            (category, max_articles), lambda: self._fetch_top_headlines(category, max_articles))
+        return list(articles)
+
+    async def _fetch_top_headlines(self, category: str, max_articles: int) -> List[Dict]:
+        """
+        Busca notícias pelo endpoint top-headlines; usa search como fallback.
+        Com a cota na reserva ou o GNews fora do ar, serve as últimas manchetes em cache.
+        """
 
         gnews_cat = self.GNEWS_CATEGORIES.get(category, "general")
+        cached = await self._load_cached(category)
+        if cached and await self.quota.saving():
+            return self._serve_cached(category, cached, max_articles)
 
         params = {
             "apikey":   self.api_key,
@@ -97,22 +198,30 @@ class NewsCollector:
 
         try:
             logger.info(f"top-headlines: categoria='{gnews_cat}' (solicitado: '{category}')")
-            r = await self.client.get(self.url_top, params=params, timeout=15.0)
-            r.raise_for_status()
-            articles = r.json().get("articles", [])
+            with tracer.start_as_current_span("gnews.top_headlines") as span:
+                span.set_attribute("news.category", category)
+                # Sem cache para servir, a chamada pode usar a reserva da cota
+                r = await self._get(self.url_top, params, essential=cached is None)
+                span.set_attribute("http.response.status_code", r.status_code)
+                articles = r.json().get("articles", [])
+                span.set_attribute("news.articles", len(articles))
 
             if articles:
-                return self._parse(articles, category)
+                return await self._store_cached(category, self._parse(articles, category))
 
             # Fallback para search se top-headlines não retornar resultados
             logger.warning(f"top-headlines vazio para '{gnews_cat}'. Tentando search...")
-            return await self._fallback_search(category, max_articles)
+            return await self._fallback_search(category, max_articles, cached)
 
+        except QuotaExceededError:
+            return self._serve_cached(category, cached, max_articles)
         except Exception as e:
             logger.error(f"Erro em top-headlines para '{category}': {e}")
-            return await self._fallback_search(category, max_articles)
+            return await self._fallback_search(category, max_articles, cached)
 
-    async def _fallback_search(self, category: str, max_articles: int) -> List[Dict]:
+    async def _fallback_search(
+        self, category: str, max_articles: int, cached: Optional[List[Dict]] = None
+    ) -> List[Dict]:
         """Fallback: busca por termos quando top-headlines falha."""
         query = self.SEARCH_FALLBACK.get(category, category)
         params = {
@@ -125,13 +234,72 @@ class NewsCollector:
         }
         try:
             logger.info(f"search fallback: query='{query}'")
-            r = await self.client.get(self.url_search, params=params, timeout=15.0)
-            r.raise_for_status()
-            articles = r.json().get("articles", [])
-            return self._parse(articles, category)
+            with tracer.start_as_current_span("gnews.search") as span:
+                span.set_attribute("news.category", category)
+                span.set_attribute("news.query", query)
+                r = await self._get(self.url_search, params, essential=cached is None)
+                span.set_attribute("http.response.status_code", r.status_code)
+                articles = r.json().get("articles", [])
+                span.set_attribute("news.articles", len(articles))
+            if articles:
+                return await self._store_cached(category, self._parse(articles, category))
+            return self._serve_cached(category, cached, max_articles)
+        except QuotaExceededError:
+            return self._serve_cached(category, cached, max_articles)
         except Exception as e:
             logger.error(f"Erro no fallback search para '{category}': {e}")
+            return self._serve_cached(category, cached, max_articles)
+
+    async def _get(self, url: str, params: Dict, essential: bool = True) -> httpx.Response:
+        """
+        GET com circuit breaker, repetições e timeout adaptativo (ver services.upstream).
+        Cada tentativa — repetição ou cópia hedged — conta na cota diária do plano
+        e espera sua vez no token bucket.
+        """
+        async def request(timeout: float) -> httpx.Response:
+            if not await self.quota.try_consume(1, essential=essential):
+                raise QuotaExceededError("cota diária do GNews no limite")
+            r = await self.client.get(url, params=params, timeout=timeout)
+            r.raise_for_status()
+            return r
+
+        # Vaga por prioridade antes do token bucket: a fila do ritmo fica curta
+        # e o pedido do locutor não espera atrás de um lote
+        async with self.slots.slot():
+            return await self.upstream.call(request, pace=self.quota.shaped)
+
+    # --- Cache de manchetes (banco) ---
+
+    async def _load_cached(self, category: str) -> Optional[List[Dict]]:
+        if engine is None:
+            return None
+        limite = datetime.utcnow() - timedelta(hours=HEADLINE_CACHE_MAX_AGE_HOURS)
+        table = HeadlineCache.__table__
+        try:
+            row = await repository.run(lambda session: session.execute(
+                table.select().where(table.c.category == category, table.c.fetched_at >= limite)
+            ).first())
+            return json.loads(row.articles) if row else None
+        except Exception as e:
+            logger.warning(f"Cache de manchetes indisponível: {e}")
+            return None
+
+    async def _store_cached(self, category: str, articles: List[Dict]) -> List[Dict]:
+        if engine is not None and articles:
+            values = {"articles": json.dumps(articles, ensure_ascii=False), "fetched_at": datetime.utcnow()}
+            try:
+                await repository.run(lambda session: session.execute(
+                    insert_on_conflict(HeadlineCache.__table__).values(category=category, **values)
+                    .on_conflict_do_update(index_elements=["category"], set_=values)))
+            except Exception as e:
+                logger.warning(f"Não foi possível guardar manchetes em cache: {e}")
+        return articles
+
+    def _serve_cached(self, category: str, cached: Optional[List[Dict]], max_articles: int) -> List[Dict]:
+        if not cached:
             return []
+        logger.warning(f"Servindo {min(len(cached), max_articles)} manchetes em cache para '{category}'")
+        return cached[:max_articles]
 
     def _parse(self, articles: List[Dict], category: str) -> List[Dict]:
         result = []
@@ -139,10 +307,11 @@ class NewsCollector:
             if not a.get("title"):
                 continue
             result.append({
-                "title":    a.get("title", ""),
-                "summary":  a.get("description", ""),
-                "source":   a.get("source", {}).get("name", "Fonte desconhecida"),
-                "url":      a.get("url", ""),
-                "category": category,
+                "title":        a.get("title", ""),
+                "summary":      a.get("description", ""),
+                "source":       a.get("source", {}).get("name", "Fonte desconhecida"),
+                "url":          a.get("url", ""),
+                "category":     category,
+                "published_at": a.get("publishedAt", ""),
             })
         return result
\ No newline at end of file
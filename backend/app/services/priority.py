@@ -0,0 +1,164 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import metrics
+from settings import (
+    PRIORITY_BACKGROUND_SHARE,
+    PRIORITY_GNEWS_SLOTS,
+    PRIORITY_LLM_SLOTS,
+    PRIORITY_TTS_SLOTS,
+)
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+# Menor = atendido antes
+_RANK = {INTERACTIVE: 0, BACKGROUND: 1}
+
+# Valores aceitos no cabeçalho X-Prioridade
+_HEADER_LANES = {
+    "interativo": INTERACTIVE, "interactive": INTERACTIVE, "alta": INTERACTIVE,
+    "lote": BACKGROUND, "background": BACKGROUND, "baixa": BACKGROUND,
+}
+
+# Faixa do pedido em andamento; None = não informada (vale como interativa)
+_lane: ContextVar[Optional[str]] = ContextVar("priority_lane", default=None)
+
+
+def current_lane() -> str:
+    return _lane.get() or INTERACTIVE
+
+
+@contextmanager
+def background():
+    """
+    Marca o trabalho deste bloco (e das tasks criadas nele) como de fundo —
+    lotes e agendamentos. Um X-Prioridade explícito no pedido prevalece.
+    """
+    token = _lane.set(BACKGROUND) if _lane.get() is None else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _lane.reset(token)
+
+
+@contextmanager
+def in_lane(lane: str):
+    """Executa o bloco na faixa indicada (a faixa gravada numa tarefa da fila, no worker)."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+async def priority_middleware(request, call_next):
+    """Lê o cabeçalho X-Prioridade (enviado pelo servidor MCP) para o restante do pedido."""
+    lane = _HEADER_LANES.get(request.headers.get("x-prioridade", "").strip().lower())
+    token = _lane.set(lane) if lane else None
+    try:
+        return await call_next(request)
+    finally:
+        if token is not None:
+            _lane.reset(token)
+
+
+class PriorityLimiter:
+    """
+    Semáforo com faixas de prioridade para um recurso (vagas no GNews, chamadas
+    ao LLM, sínteses de voz). Pedidos interativos passam à frente dos de fundo
+    na fila, e a faixa de fundo ocupa no máximo `background_slots` vagas — as
+    demais ficam livres para quem está no ar. Dentro da faixa, a fila é FIFO.
+    """
+
+    def __init__(self, name: str, slots: int, background_slots: int):
+        self.name = name
+        self.slots = max(1, slots)
+        self.lane_limits = {INTERACTIVE: self.slots, BACKGROUND: max(1, min(background_slots, self.slots))}
+        self.active: Counter = Counter()
+        self._waiters: List[tuple] = []  # (rank, seq, lane, future), ordenada
+        self._seq = itertools.count()
+
+    def _can_run(self, lane: str) -> bool:
+        return sum(self.active.values()) < self.slots and self.active[lane] < self.lane_limits[lane]
+
+    @asynccontextmanager
+    async def slot(self, lane: Optional[str] = None):
+        lane = lane or current_lane()
+        start = time.perf_counter()
+        # Só fura a fila quem não tem ninguém de prioridade igual ou maior esperando
+        ahead = any(w[0] <= _RANK[lane] for w in self._waiters)
+        if not ahead and self._can_run(lane):
+            self.active[lane] += 1
+        else:
+            await self._wait(lane)
+        metrics.PRIORITY_QUEUE_WAIT.labels(self.name, lane).observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self.active[lane] -= 1
+            self._wake()
+
+    async def _wait(self, lane: str):
+        future = asyncio.get_running_loop().create_future()
+        entry = (_RANK[lane], next(self._seq), lane, future)
+        bisect.insort(self._waiters, entry, key=lambda w: w[:2])
+        metrics.PRIORITY_WAITING.labels(self.name, lane).inc()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            elif future.done() and not future.cancelled():
+                # A vaga já tinha sido entregue a este pedido: devolve
+                self.active[lane] -= 1
+                self._wake()
+            raise
+        finally:
+            metrics.PRIORITY_WAITING.labels(self.name, lane).dec()
+
+    def _wake(self):
+        """Entrega vagas livres aos primeiros da fila cuja faixa ainda tem espaço."""
+        for entry in list(self._waiters):
+            if sum(self.active.values()) >= self.slots:
+                break
+            lane, future = entry[2], entry[3]
+            if future.done() or not self._can_run(lane):
+                continue
+            self._waiters.remove(entry)
+            self.active[lane] += 1
+            future.set_result(None)
+
+    def status(self) -> Dict:
+        waiting = Counter(w[2] for w in self._waiters)
+        return {
+            "slots":   self.slots,
+            "limits":  dict(self.lane_limits),
+            "active":  {lane: self.active[lane] for lane in _RANK},
+            "waiting": {lane: waiting[lane] for lane in _RANK},
+        }
+
+
+_SLOTS = {"gnews": PRIORITY_GNEWS_SLOTS, "llm": PRIORITY_LLM_SLOTS, "tts": PRIORITY_TTS_SLOTS}
+_limiters: Dict[str, PriorityLimiter] = {}
+
+
+def get_limiter(resource: str) -> PriorityLimiter:
+    """Limitador compartilhado por recurso ("gnews", "llm", "tts") no processo todo."""
+    if resource not in _limiters:
+        slots = _SLOTS[resource]
+        _limiters[resource] = PriorityLimiter(resource, slots, int(slots * PRIORITY_BACKGROUND_SHARE))
+    return _limiters[resource]
+
+
+def priority_status() -> Dict[str, Dict]:
+    return {name: limiter.status() for name, limiter in _limiters.items()}
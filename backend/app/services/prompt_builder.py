@@ -0,0 +1,103 @@
+import logging
+import math
+from typing import Dict, List, Tuple
+
+from settings import (
+    GROQ_SUMMARY_MODEL,
+    GROQ_SUMMARY_MODEL_SMALL,
+    SUMMARY_ARTICLE_MAX_TOKENS,
+    SUMMARY_MAX_INPUT_TOKENS,
+    SUMMARY_SMALL_MODEL_MAX_TOKENS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Estimativa conservadora para português nos tokenizadores do Llama
+CHARS_PER_TOKEN = 3.5
+
+# Menor trecho de detalhes que ainda vale a pena mandar ao modelo
+MIN_DETAIL_TOKENS = 40
+TITLE_MAX_TOKENS = 40
+# "NOTÍCIA 12: " + ". DETALHES: " + quebras de linha
+ITEM_OVERHEAD_TOKENS = 10
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta no fim de frase mais próximo do limite ou, se não houver, no fim de palavra."""
+    limit = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if end >= limit * 0.6:
+        return cut[:end + 1]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > 0 else cut).rstrip(",;:- ") + "…"
+
+
+class PromptBuilder:
+    """
+    Monta o conteúdo das notícias dentro de um orçamento de tokens de entrada.
+
+    O orçamento é dividido entre as notícias: as de detalhes curtos usam só o
+    que precisam e a sobra vai para as mais longas, até `article_max_tokens`
+    por notícia. Se nem o mínimo por notícia couber, as últimas são descartadas.
+    """
+
+    def __init__(
+        self,
+        max_input_tokens: int = SUMMARY_MAX_INPUT_TOKENS,
+        article_max_tokens: int = SUMMARY_ARTICLE_MAX_TOKENS,
+    ):
+        self.max_input_tokens = max_input_tokens
+        self.article_max_tokens = article_max_tokens
+
+    def fit(self, items: List[Tuple[str, str]], overhead_text: str = "") -> Dict:
+        """
+        `items` é uma lista de (título, detalhes). Retorna {"items", "dropped",
+        "estimated_tokens"}, com títulos e detalhes já truncados.
+        """
+        available = self.max_input_tokens - estimate_tokens(overhead_text)
+        titles = [truncate_to_tokens(t.strip(), TITLE_MAX_TOKENS) for t, _ in items]
+        fixed = [estimate_tokens(t) + ITEM_OVERHEAD_TOKENS for t in titles]
+
+        # Quantas notícias cabem com o mínimo de detalhes cada
+        keep, used = 0, 0
+        for cost in fixed:
+            if used + cost + MIN_DETAIL_TOKENS > available:
+                break
+            used += cost + MIN_DETAIL_TOKENS
+            keep += 1
+        keep = max(1, keep)
+        dropped = len(items) - keep
+        if dropped:
+            logger.warning(f"Orçamento de {self.max_input_tokens} tokens: {dropped} notícia(s) descartada(s)")
+
+        # Distribuição "water-filling": as menores primeiro, cada uma pega sua parte justa
+        remaining = available - sum(fixed[:keep])
+        needs = [(estimate_tokens(items[i][1].strip()), i) for i in range(keep)]
+        budgets = {}
+        for pos, (need, i) in enumerate(sorted(needs)):
+            share = remaining // (keep - pos)
+            budgets[i] = max(0, min(need, share, self.article_max_tokens))
+            remaining -= budgets[i]
+
+        fitted = [(titles[i], truncate_to_tokens(items[i][1].strip(), budgets[i]) if budgets[i] else "")
+                  for i in range(keep)]
+        estimated = estimate_tokens(overhead_text) + sum(
+            estimate_tokens(t) + estimate_tokens(d) + ITEM_OVERHEAD_TOKENS for t, d in fitted)
+        return {"items": fitted, "dropped": dropped, "estimated_tokens": estimated}
+
+    @staticmethod
+    def select_model(input_tokens: int) -> str:
+        """
+        Modelo do prompt do boletim inteiro (modo `completo`): boletins curtos vão
+        para o modelo pequeno (mais rápido e barato, texto mais simples).
+        """
+        if SUMMARY_SMALL_MODEL_MAX_TOKENS and input_tokens <= SUMMARY_SMALL_MODEL_MAX_TOKENS:
+            return GROQ_SUMMARY_MODEL_SMALL
+        return GROQ_SUMMARY_MODEL
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+import metrics
+import repository
+from database import engine, insert_on_conflict, ProviderUsage
+from settings import (
+    ELEVENLABS_CONCURRENCY,
+    ELEVENLABS_MONTHLY_CHARACTERS,
+    GNEWS_BURST,
+    GNEWS_DAILY_REQUESTS,
+    GNEWS_REQUESTS_PER_SECOND,
+    QUOTA_SOFT_RATIO,
+    WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+_usage = ProviderUsage.__table__
+
+
+class QuotaExceededError(Exception):
+    """Cota do plano esgotada — repetir a chamada não adianta."""
+    retryable = False
+
+
+class TokenBucket:
+    """Limita o ritmo: `rate` fichas por segundo, acumulando até `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:  # fila justa: quem chegou primeiro sai primeiro
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ProviderQuota:
+    """
+    Cota de um serviço externo, contabilizada no banco (sobrevive a restarts
+    e é compartilhada entre processos), mais o controle de ritmo e de
+    concorrência das chamadas.
+
+    Acima de `soft_ratio` da cota só passam consumos essenciais — os demais
+    recebem False e o chamador economiza (manchetes em cache, gTTS).
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        limit: int,
+        unit: str,
+        period: str = "day",
+        soft_ratio: float = QUOTA_SOFT_RATIO,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        concurrency: Optional[int] = None,
+    ):
+        self.provider = provider
+        self.limit = limit
+        self.unit = unit
+        self.period = period
+        self.soft_limit = int(limit * soft_ratio)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    def _period_key(self) -> str:
+        now = datetime.now(timezone.utc)
+        return now.strftime("%Y-%m-%d" if self.period == "day" else "%Y-%m")
+
+    async def used(self) -> int:
+        if engine is None:
+            return 0
+        period = self._period_key()
+        value = await repository.run(lambda session: session.execute(
+            select(_usage.c.used).where(_usage.c.provider == self.provider, _usage.c.period == period)
+        ).scalar())
+        return value or 0
+
+    async def try_consume(self, amount: int, essential: bool = False) -> bool:
+        """
+        Reserva `amount` da cota de forma atômica (UPDATE condicional), na thread
+        do banco. Sem banco disponível, libera a chamada em vez de parar o sistema.
+        """
+        if engine is None:
+            return True
+        period = self._period_key()
+        ceiling = (self.limit if essential else self.soft_limit) if self.limit else None
+
+        def consume(session: Session) -> bool:
+            session.execute(insert_on_conflict(_usage).values(
+                provider=self.provider, period=period, used=0, updated_at=datetime.utcnow()
+            ).on_conflict_do_nothing())
+            stmt = update(_usage).where(
+                _usage.c.provider == self.provider, _usage.c.period == period)
+            if ceiling is not None:
+                stmt = stmt.where(_usage.c.used + amount <= ceiling)
+            return session.execute(
+                stmt.values(used=_usage.c.used + amount, updated_at=datetime.utcnow())
+            ).rowcount == 1
+
+        granted = await repository.run(consume)
+        if granted:
+            metrics.QUOTA_CONSUMED.labels(self.provider).inc(amount)
+        else:
+            metrics.QUOTA_DENIED.labels(self.provider).inc()
+            logger.warning(
+                f"✗ Cota de '{self.provider}' no limite ({'total' if essential else 'reserva'}): "
+                f"{amount} {self.unit} recusados")
+        return granted
+
+    async def refund(self, amount: int):
+        """Devolve o que foi reservado para uma chamada que falhou (o serviço não cobra)."""
+        if engine is None:
+            return
+        period = self._period_key()
+        await repository.run(lambda session: session.execute(update(_usage).where(
+            _usage.c.provider == self.provider, _usage.c.period == period,
+            _usage.c.used >= amount,
+        ).values(used=_usage.c.used - amount, updated_at=datetime.utcnow())))
+
+    @asynccontextmanager
+    async def shaped(self):
+        """Respeita o ritmo e a concorrência máxima do plano antes de chamar o serviço."""
+        if self.semaphore:
+            await self.semaphore.acquire()
+        try:
+            if self.bucket:
+                await self.bucket.acquire()
+            yield
+        finally:
+            if self.semaphore:
+                self.semaphore.release()
+
+    async def saving(self) -> bool:
+        """True quando o consumo já chegou à reserva (só chamadas essenciais passam)."""
+        return bool(self.limit) and await self.used() >= self.soft_limit
+
+    async def status(self) -> Dict:
+        used = await self.used()
+        return {
+            "unit":      self.unit,
+            "period":    self._period_key(),
+            "limit":     self.limit or None,
+            "used":      used,
+            "remaining": max(0, self.limit - used) if self.limit else None,
+            "saving":    bool(self.limit) and used >= self.soft_limit,
+        }
+
+
+_quotas: Dict[str, ProviderQuota] = {}
+
+
+def get_quota(provider: str) -> ProviderQuota:
+    if not _quotas:
+        # A cota é contada no banco (uma só para todos os workers); o ritmo e a
+        # concorrência são controlados em cada processo, então o limite do plano
+        # é repartido entre os WORKERS
+        _quotas["gnews"] = ProviderQuota(
+            "gnews", GNEWS_DAILY_REQUESTS, "requests", "day",
+            rate=GNEWS_REQUESTS_PER_SECOND / WORKERS, burst=max(1, GNEWS_BURST // WORKERS))
+        _quotas["elevenlabs"] = ProviderQuota(
+            "elevenlabs", ELEVENLABS_MONTHLY_CHARACTERS, "characters", "month",
+            concurrency=max(1, ELEVENLABS_CONCURRENCY // WORKERS))
+    return _quotas[provider]
+
+
+async def quota_status() -> Dict[str, Dict]:
+    get_quota("gnews")  # garante o registro
+    try:
+        return {name: await quota.status() for name, quota in _quotas.items()}
+    except Exception as e:
+        logger.error(f"Erro ao consultar cotas: {e}")
+        return {}
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import metrics
+import repository
+from database import advisory_key, engine
+from locks import AdvisoryLeaderLock, LeaderLock
+from settings import (
+    LOCK_DIR,
+    SCHEDULE_MISFIRE_GRACE_MIN,
+    SCHEDULE_POLL_S,
+    SCHEDULE_TIMEZONE,
+    SCHEDULES_ENABLED,
+)
+
+try:
+    from zoneinfo import ZoneInfo
+    LOCAL_TZ = ZoneInfo(SCHEDULE_TIMEZONE)
+except Exception:  # imagem sem tzdata: horário de Brasília fixo
+    LOCAL_TZ = timezone(timedelta(hours=-3))
+
+logger = logging.getLogger(__name__)
+
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily":  "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+}
+# (nome, mínimo, máximo) de cada campo: minuto hora dia mês dia-da-semana
+_FIELDS = (("minuto", 0, 59), ("hora", 0, 23), ("dia", 1, 31), ("mês", 1, 12), ("dia da semana", 0, 7))
+# Limite de busca do próximo horário (ex.: "0 0 31 2 *" nunca acontece)
+_MAX_STEPS = 5000
+
+
+def _parse_field(spec: str, name: str, low: int, high: int) -> Set[int]:
+    values = set()
+    for part in spec.split(","):
+        rng, _, step = part.partition("/")
+        if rng == "*":
+            start, end = low, high
+        elif "-" in rng:
+            a, b = rng.split("-", 1)
+            start, end = int(a), int(b)
+        else:
+            start = end = int(rng)
+            if step:
+                end = high  # "5/15" = a partir de 5, de 15 em 15
+        step_n = int(step) if step else 1
+        if not (low <= start <= end <= high) or step_n < 1:
+            raise ValueError(f"{name} fora do intervalo {low}-{high}: '{part}'")
+        values.update(range(start, end + 1, step_n))
+    return values
+
+
+class CronExpression:
+    """
+    Expressão cron de 5 campos (minuto hora dia mês dia-da-semana), com '*',
+    listas, intervalos e passos ('*/15', '1-5', '7,12,18') e os atalhos
+    @hourly/@daily/@weekly. Dia da semana: 0 ou 7 = domingo. Como no cron,
+    se dia e dia da semana forem restritos, basta um dos dois coincidir.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = _ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Expressão cron precisa de 5 campos: '{expression}'")
+        try:
+            parsed = [_parse_field(spec, *meta) for spec, meta in zip(fields, _FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"Expressão cron inválida '{expression}': {e}") from None
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        weekday = (dt.isoweekday() % 7) in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, dt: datetime) -> datetime:
+        """Primeiro horário estritamente depois de `dt` (mesmo fuso de `dt`)."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(_MAX_STEPS):
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Expressão cron sem horário possível: '{self.expression}'")
+
+
+def next_run(cron: str, after: Optional[datetime] = None) -> datetime:
+    """Próxima execução em UTC (naive, como as demais datas do banco)."""
+    after_local = (after.replace(tzinfo=timezone.utc) if after else datetime.now(timezone.utc)).astimezone(LOCAL_TZ)
+    local = CronExpression(cron).next_after(after_local.replace(tzinfo=None))
+    return local.replace(tzinfo=LOCAL_TZ).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class BulletinScheduler:
+    """
+    Gera os boletins agendados antes da hora de ir ao ar. A cada SCHEDULE_POLL_S
+    segundos procura agendamentos vencidos e os executa um de cada vez (a cota
+    do GNews e o Groq são compartilhados com os pedidos ao vivo). O próximo
+    horário é gravado antes da geração, então uma falha não repete o agendamento
+    em laço. `generate` recebe o agendamento (dict) e devolve o ID do boletim.
+
+    Com vários workers, só o que detém a trava de líder percorre os agendamentos;
+    os demais tentam assumir a cada ciclo, caso o líder caia.
+    """
+
+    def __init__(self, generate: Callable[[Dict], Awaitable[int]]):
+        self.generate = generate
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        # Num servidor PostgreSQL, os workers podem estar em máquinas diferentes
+        self.leader = (AdvisoryLeaderLock(engine, advisory_key("scheduler"))
+                       if engine is not None and engine.dialect.name == "postgresql"
+                       else LeaderLock(os.path.join(LOCK_DIR, "scheduler.lock")))
+
+    async def start(self):
+        if not SCHEDULES_ENABLED or engine is None or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"✓ Agendamentos ativos (verificação a cada {SCHEDULE_POLL_S:.0f}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.leader.release()
+
+    async def _loop(self):
+        while True:
+            try:
+                was_leader = self.leader.held
+                # Quem já é líder só confirma que a trava continua valendo
+                if await asyncio.to_thread(self.leader.try_acquire):
+                    if not was_leader:
+                        logger.info(f"✓ Este worker (PID {os.getpid()}) executa os agendamentos")
+                    await self.run_due()
+            except Exception as e:
+                logger.error(f"✗ Erro no ciclo de agendamentos: {e}")
+            await asyncio.sleep(SCHEDULE_POLL_S)
+
+    async def run_due(self):
+        now = datetime.utcnow()
+        for schedule in await repository.schedules.due(now):
+            await self._update(schedule["id"], next_run_at=next_run(schedule["cron"], now))
+            late = now - schedule["next_run_at"]
+            if late > timedelta(minutes=SCHEDULE_MISFIRE_GRACE_MIN):
+                logger.warning(f"⚠️ Agendamento '{schedule['name']}' perdido há {late} — pulado")
+                metrics.SCHEDULED_RUNS.labels("skipped").inc()
+                continue
+            await self.run(schedule)
+
+    async def run(self, schedule: Dict) -> Optional[int]:
+        """Gera o boletim do agendamento agora; devolve o ID ou None se falhar."""
+        async with self._lock:
+            logger.info(f"Pré-produzindo boletim do agendamento '{schedule['name']}'")
+            try:
+                boletim_id = await self.generate(schedule)
+                if not boletim_id:
+                    raise RuntimeError("boletim não foi salvo no histórico")
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                logger.error(f"✗ Agendamento '{schedule['name']}' falhou: {detail}")
+                metrics.SCHEDULED_RUNS.labels("failed").inc()
+                await self._update(schedule["id"], last_run_at=datetime.utcnow(), last_error=str(detail))
+                return None
+
+            logger.info(f"✓ Boletim {boletim_id} pronto (agendamento '{schedule['name']}')")
+            metrics.SCHEDULED_RUNS.labels("ready").inc()
+            await self._update(schedule["id"], last_run_at=datetime.utcnow(),
+                               last_boletim_id=boletim_id, last_error=None)
+            return boletim_id
+
+    @staticmethod
+    async def _update(schedule_id: int, **values):
+        try:
+            await repository.schedules.update(schedule_id, **values)
+        except Exception as e:
+            logger.warning(f"Não foi possível atualizar o agendamento {schedule_id}: {e}")
+
+
+def matches_categories(stored: Optional[str], categories: List[str]) -> bool:
+    """Compara o conjunto de categorias de um boletim salvo ("a, b") com o pedido."""
+    return {c.strip() for c in (stored or "").split(",") if c.strip()} == set(categories)
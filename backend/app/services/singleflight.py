@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Junta chamadas idênticas simultâneas numa só: a primeira executa, as que
+    chegam enquanto ela roda esperam o mesmo resultado (ou a mesma exceção).
+
+    O trabalho roda numa task própria, então um cliente que desiste (desconexão,
+    timeout) não cancela a execução para os demais. Com `ttl`, o resultado
+    continua valendo por mais alguns segundos depois de pronto — útil para
+    chaves de idempotência, em que a repetição chega logo após a resposta.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self._done: Dict[Hashable, Tuple[float, asyncio.Future]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], ttl: float = 0) -> Any:
+        self._expire()
+        if key in self._done:
+            metrics.SINGLEFLIGHT_CALLS.labels(self.name, "replayed").inc()
+            return self._done[key][1].result()
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            metrics.SINGLEFLIGHT_CALLS.labels(self.name, "shared").inc()
+            logger.info(f"↺ {self.name}: pedido idêntico em andamento, aguardando o mesmo resultado")
+        else:
+            metrics.SINGLEFLIGHT_CALLS.labels(self.name, "executed").inc()
+            flight = asyncio.ensure_future(fn())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda f: self._finish(key, f, ttl))
+        return await asyncio.shield(flight)
+
+    def _finish(self, key: Hashable, flight: asyncio.Future, ttl: float):
+        self._flights.pop(key, None)
+        # Só resultados de sucesso são reaproveitados; um erro pode ser repetido
+        if ttl > 0 and not flight.cancelled() and flight.exception() is None:
+            self._done[key] = (time.monotonic() + ttl, flight)
+        elif not flight.cancelled():
+            flight.exception()  # marca a exceção como lida (sem aviso de "never retrieved")
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._done.items() if expires <= now]:
+            del self._done[key]
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import metrics
+from settings import (
+    AUDIO_DIR,
+    AUDIO_STORAGE,
+    S3_BUCKET,
+    S3_ENDPOINT_URL,
+    S3_PREFIX,
+    S3_PRESIGN_TTL_S,
+    S3_PUBLIC_ENDPOINT_URL,
+    S3_REGION,
+    S3_RESERVATION_PREFIX,
+)
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+
+# Tipo do objeto pelo sufixo: o MP3 ou, sem nenhum motor de voz, o texto do boletim
+_CONTENT_TYPES = {".mp3": "audio/mpeg", ".txt": "text/plain; charset=utf-8"}
+
+
+class AudioStorage(ABC):
+    """
+    Onde ficam os MP3 dos boletins. O TTS sempre grava em AUDIO_DIR e entrega o
+    arquivo pronto a `store`; dali em diante ele é servido, conferido e apagado
+    pelo nome (boletim_AAAAMMDD_HHMMSS.mp3).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def reserve(self, filename: str) -> bool:
+        """
+        Reserva o nome para um boletim novo, de forma atômica para todos os
+        processos que usam este armazenamento; False se ele já existe.
+        """
+
+    @abstractmethod
+    async def release(self, filename: str):
+        """Desfaz a reserva de um nome que não chegou a receber áudio."""
+
+    @abstractmethod
+    async def store(self, path: Path):
+        """Publica o arquivo pronto (MP3, ou o .txt quando nenhum motor funcionou)."""
+
+    @abstractmethod
+    async def exists(self, filename: str) -> bool:
+        """True só depois de `store`: a reserva do nome não conta."""
+
+    @abstractmethod
+    async def delete(self, filename: str) -> bool:
+        """Remove o áudio; False se ele não existia."""
+
+    def local_path(self, filename: str) -> Optional[Path]:
+        """Caminho no disco, quando a própria API serve o arquivo."""
+        return None
+
+    def url(self, filename: str, download: bool = False) -> Optional[str]:
+        """URL assinada para o cliente baixar direto do armazenamento (None = servir localmente)."""
+        return None
+
+
+class LocalStorage(AudioStorage):
+    """Diretório local (bind mount ./audio) — servido pelo StaticFiles em /audio."""
+
+    name = "local"
+
+    def __init__(self, directory: Path = AUDIO_DIR):
+        self.directory = Path(directory)
+
+    async def reserve(self, filename: str) -> bool:
+        # Arquivo vazio criado com O_EXCL: atômico entre os processos do host
+        try:
+            os.close(os.open(self.local_path(filename), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return True
+        except FileExistsError:
+            return False
+
+    async def release(self, filename: str):
+        path = self.local_path(filename)
+        try:
+            if path.stat().st_size == 0:
+                path.unlink()
+        except OSError:
+            pass
+
+    async def store(self, path: Path):
+        pass  # o TTS já gravou no lugar definitivo
+
+    async def exists(self, filename: str) -> bool:
+        return self.local_path(filename).exists()
+
+    async def delete(self, filename: str) -> bool:
+        path = self.local_path(filename)
+        if not path.exists():
+            return False
+        path.unlink()
+        return True
+
+    def local_path(self, filename: str) -> Path:
+        return self.directory / os.path.basename(filename)
+
+
+class S3Storage(AudioStorage):
+    """
+    Bucket S3 ou compatível (MinIO). O envio é feito em partes direto do
+    arquivo (upload_file), sem carregar o MP3 na memória, e a cópia local é
+    apagada em seguida. Para ouvir ou baixar, a API devolve um redirecionamento
+    para uma URL assinada: os bytes do áudio nunca passam por ela.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX,
+                 endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+                 public_endpoint_url: Optional[str] = S3_PUBLIC_ENDPOINT_URL,
+                 reservation_prefix: str = S3_RESERVATION_PREFIX):
+        if boto3 is None:
+            raise RuntimeError("AUDIO_STORAGE=s3 requer o pacote boto3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.reservation_prefix = reservation_prefix
+        # Checksums só quando exigidos: MinIO e outros compatíveis nem sempre
+        # aceitam o envio em aws-chunked dos SDKs recentes
+        config = BotoConfig(
+            signature_version="s3v4",
+            s3={"addressing_style": "path" if endpoint_url else "auto"},
+            request_checksum_calculation="when_required",
+            response_checksum_validation="when_required",
+        )
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=S3_REGION, config=config)
+        # URLs assinadas com o endereço que o navegador alcança
+        self.public_client = (
+            boto3.client("s3", endpoint_url=public_endpoint_url, region_name=S3_REGION, config=config)
+            if public_endpoint_url else self.client
+        )
+
+    def _key(self, filename: str) -> str:
+        return f"{self.prefix}{os.path.basename(filename)}"
+
+    def _reservation_key(self, filename: str) -> str:
+        return f"{self.reservation_prefix}{os.path.basename(filename)}"
+
+    async def reserve(self, filename: str) -> bool:
+        # Objeto vazio com gravação condicional, numa chave à parte: réplicas em
+        # máquinas diferentes nunca recebem o mesmo nome, e HEAD/download do
+        # áudio seguem em 404 até o envio. A reserva dura enquanto o áudio existir
+        try:
+            with metrics.observe_upstream("s3"):
+                await asyncio.to_thread(
+                    self.client.put_object, Bucket=self.bucket, Key=self._reservation_key(filename),
+                    Body=b"", IfNoneMatch="*")
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "412",
+                                                            "ConditionalRequestConflict", "409"):
+                return False
+            raise
+
+    async def release(self, filename: str):
+        (AUDIO_DIR / os.path.basename(filename)).unlink(missing_ok=True)  # áudio parcial local
+        with metrics.observe_upstream("s3"):
+            await asyncio.to_thread(
+                self.client.delete_object, Bucket=self.bucket, Key=self._reservation_key(filename))
+
+    async def store(self, path: Path):
+        content_type = _CONTENT_TYPES.get(path.suffix, "application/octet-stream")
+        with metrics.observe_upstream("s3"):
+            await asyncio.to_thread(
+                self.client.upload_file, str(path), self.bucket, self._key(path.name),
+                ExtraArgs={"ContentType": content_type})
+        path.unlink(missing_ok=True)
+        logger.info(f"✓ Arquivo enviado para s3://{self.bucket}/{self._key(path.name)}")
+
+    async def exists(self, filename: str) -> bool:
+        try:
+            with metrics.observe_upstream("s3"):
+                await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._key(filename))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def delete(self, filename: str) -> bool:
+        if not await self.exists(filename):
+            return False
+        with metrics.observe_upstream("s3"):
+            await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._key(filename))
+            await asyncio.to_thread(
+                self.client.delete_object, Bucket=self.bucket, Key=self._reservation_key(filename))
+        return True
+
+    def url(self, filename: str, download: bool = False) -> str:
+        params = {"Bucket": self.bucket, "Key": self._key(filename)}
+        if download:
+            params["ResponseContentDisposition"] = f'attachment; filename="{os.path.basename(filename)}"'
+        return self.public_client.generate_presigned_url("get_object", Params=params, ExpiresIn=S3_PRESIGN_TTL_S)
+
+
+_BACKENDS = {"local": LocalStorage, "s3": S3Storage}
+_storage: Optional[AudioStorage] = None
+
+
+def get_storage() -> AudioStorage:
+    """Armazenamento configurado em AUDIO_STORAGE, compartilhado no processo todo."""
+    global _storage
+    if _storage is None:
+        if AUDIO_STORAGE not in _BACKENDS:
+            raise ValueError(f"AUDIO_STORAGE desconhecido: '{AUDIO_STORAGE}'")
+        _storage = _BACKENDS[AUDIO_STORAGE]()
+    return _storage
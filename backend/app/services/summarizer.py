@@ -1,16 +1,83 @@
+import asyncio
+import hashlib
+import json
 import os
 import logging
-from typing import List, Dict
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from groq import Groq
+from opentelemetry import trace
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import metrics
+import repository
+from database import engine, insert_on_conflict, ArticleSummary, SummaryCache
+from services.priority import get_limiter
+from services.prompt_builder import PromptBuilder, estimate_tokens, truncate_to_tokens
+from services.singleflight import SingleFlight
+from services.upstream import get_upstream
+from settings import (
+    ARTICLE_SUMMARY_TTL_HOURS,
+    GROQ_BASE_URL,
+    GROQ_SUMMARY_MODEL,
+    GROQ_SUMMARY_MODEL_SMALL,
+    SUMMARY_ARTICLE_MAX_TOKENS,
+    SUMMARY_CACHE_TTL_HOURS,
+    SUMMARY_CONCURRENCY,
+    SUMMARY_MAX_INPUT_TOKENS,
+    SUMMARY_SMALL_MODEL_MAX_TOKENS,
+    SUMMARY_STRATEGY,
+)
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# Abertura e encerramento fixos do modo incremental, por estilo
+STYLE_TEMPLATES = {
+    "jornalistico": {
+        "intro": "Boletim de notícias. Estas são as principais manchetes do momento.",
+        "outro": "Este boletim teve informações de: {fontes}.",
+    },
+}
+
+ARTICLE_INSTRUCTION = (
+    "Você é um redator sênior de rádio. Estilo formal e direto. "
+    "Escreva UMA notícia para ser lida no ar: manchete impactante seguida de um "
+    "resumo explicativo de 2 frases. Sem introdução, sem encerramento, sem citar "
+    "fontes e sem markdown."
+)
+
+
+def _paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
 
 
 class NewsSummarizer:
     def __init__(self):
         self.api_key = os.getenv("GROQ_API_KEY")
-        self.client = Groq(api_key=self.api_key) if self.api_key else None
-        self.model = "llama-3.3-70b-versatile"
+        # Repetições ficam a cargo do UpstreamClient (com orçamento e circuit breaker)
+        self.client = Groq(api_key=self.api_key, base_url=GROQ_BASE_URL, max_retries=0) if self.api_key else None
+        self.upstream = get_upstream("groq")
+        self.model = GROQ_SUMMARY_MODEL
+        self.prompt_builder = PromptBuilder()
+        # Boletins simultâneos (lotes) com a mesma notícia: uma chamada ao Groq só
+        self._article_flights = SingleFlight("article_summary")
+        self.llm_slots = get_limiter("llm")
+
+    def reload(self):
+        """
+        Troca a chave e o cliente do Groq após salvar a configuração. Caches,
+        single-flight e limites continuam os mesmos (pode haver chamadas em curso).
+        """
+        api_key = os.getenv("GROQ_API_KEY")
+        if api_key == self.api_key:
+            return
+        old_client, self.api_key = self.client, api_key
+        self.client = Groq(api_key=api_key, base_url=GROQ_BASE_URL, max_retries=0) if api_key else None
+        if old_client is not None:
+            old_client.close()
 
     async def summarize(
         self,
@@ -18,12 +85,112 @@ class NewsSummarizer:
         style: str = "jornalistico",
         include_intro: bool = True,
         include_outro: bool = True,
-        summary_mode: str = "groq"
+        summary_mode: str = "groq",
+        bypass_cache: bool = False
     ) -> str:
         if not articles or not isinstance(articles, list):
             return "Nenhuma notícia válida para resumir."
 
-        # --- EXTRAÇÃO DE FONTES "RAIO-X" ---
+        lista_fontes_str = self._source_list(articles)
+
+        if not (summary_mode == "groq" and self.client):
+            return self._simple_format(articles, include_intro, include_outro, lista_fontes_str)
+
+        # --- CACHE DO BOLETIM INTEIRO ---
+        # Mesmo conjunto de notícias (janela de 12h do GNews) → mesmo texto, sem chamar a IA
+        cache_key = self._summary_cache_key(articles, style, include_intro, include_outro, lista_fontes_str)
+        if not bypass_cache:
+            cached = await self._load_cached_summary(cache_key)
+            if cached is not None:
+                logger.info("✓ Resumo do boletim servido do cache")
+                metrics.SUMMARY_CACHE.labels("hit").inc()
+                return cached
+        metrics.SUMMARY_CACHE.labels("bypass" if bypass_cache else "miss").inc()
+
+        try:
+            if SUMMARY_STRATEGY == "incremental":
+                text, complete = await self._summarize_incremental(
+                    articles, style, include_intro, include_outro, lista_fontes_str, bypass_cache)
+            else:
+                text, complete = await self._summarize_full(
+                    articles, include_intro, include_outro, lista_fontes_str), True
+        except Exception as e:
+            logger.error(f"Erro na IA: {e}")
+            # Em caso de erro, retorna o formato simples em vez de uma mensagem de erro crua
+            return self._simple_format(articles, include_intro, include_outro, lista_fontes_str)
+
+        # Texto com notícias em formato simples (falha parcial da IA) não vai para o cache
+        if complete:
+            await self._store_cached_summary(cache_key, text)
+        return text
+
+    async def summarize_stream(
+        self,
+        articles: List[Dict],
+        style: str = "jornalistico",
+        include_intro: bool = True,
+        include_outro: bool = True,
+        summary_mode: str = "groq",
+        bypass_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Mesmo boletim de `summarize`, entregue parágrafo a parágrafo (abertura,
+        cada notícia, encerramento) assim que cada um fica pronto — o TTS começa
+        pelas primeiras notícias enquanto a IA ainda escreve as seguintes.
+
+        Se a IA falhar antes do primeiro parágrafo, entrega o formato simples;
+        se falhar no meio, a exceção sobe e o chamador refaz pelo caminho normal.
+        """
+        if not articles or not isinstance(articles, list):
+            yield "Nenhuma notícia válida para resumir."
+            return
+
+        lista_fontes_str = self._source_list(articles)
+        if not (summary_mode == "groq" and self.client):
+            for paragraph in _paragraphs(self._simple_format(articles, include_intro, include_outro, lista_fontes_str)):
+                yield paragraph
+            return
+
+        cache_key = self._summary_cache_key(articles, style, include_intro, include_outro, lista_fontes_str)
+        if not bypass_cache:
+            cached = await self._load_cached_summary(cache_key)
+            if cached is not None:
+                logger.info("✓ Resumo do boletim servido do cache")
+                metrics.SUMMARY_CACHE.labels("hit").inc()
+                for paragraph in _paragraphs(cached):
+                    yield paragraph
+                return
+        metrics.SUMMARY_CACHE.labels("bypass" if bypass_cache else "miss").inc()
+
+        status = {"complete": True}
+        if SUMMARY_STRATEGY == "incremental":
+            stream = self._incremental_paragraphs(
+                articles, style, include_intro, include_outro, lista_fontes_str, bypass_cache, status)
+        else:
+            stream = self._full_paragraphs(articles, include_intro, include_outro, lista_fontes_str)
+
+        parts = []
+        try:
+            async for paragraph in stream:
+                parts.append(paragraph)
+                yield paragraph
+        except Exception as e:
+            if parts:
+                raise
+            logger.error(f"Erro na IA: {e}")
+            for paragraph in _paragraphs(self._simple_format(articles, include_intro, include_outro, lista_fontes_str)):
+                yield paragraph
+            return
+        finally:
+            await stream.aclose()
+
+        if status["complete"]:
+            await self._store_cached_summary(cache_key, "\n\n".join(parts))
+
+    # --- EXTRAÇÃO DE FONTES "RAIO-X" ---
+
+    @staticmethod
+    def _source_list(articles: List[Dict]) -> str:
         nomes_fontes = []
         for art in articles:
             if not isinstance(art, dict):
@@ -56,17 +223,47 @@ class NewsSummarizer:
                 nomes_fontes.append(nome.strip())
 
         fontes_unicas = sorted(list(set(nomes_fontes)))
-        lista_fontes_str = ", ".join(
-            fontes_unicas) if fontes_unicas else "G1, UOL e agências de notícias"
+        return ", ".join(fontes_unicas) if fontes_unicas else "G1, UOL e agências de notícias"
 
-        # --- PREPARAÇÃO DO CONTEÚDO ---
-        contexto = ""
-        for i, art in enumerate(articles, 1):
-            if isinstance(art, dict):
-                titulo = art.get('title', 'Notícia sem título')
-                desc = art.get('description', 'Sem detalhes adicionais.')
-                contexto += f"NOTÍCIA {i}: {titulo}. DETALHES: {desc}\n\n"
+    # --- MODO COMPLETO (um único prompt) ---
 
+    async def _summarize_full(
+        self,
+        articles: List[Dict],
+        include_intro: bool,
+        include_outro: bool,
+        lista_fontes_str: str
+    ) -> str:
+        prompt = self._full_prompt(articles, include_intro, include_outro, lista_fontes_str)
+        return await self._complete("groq.completion", kind="bulletin", **prompt)
+
+    async def _full_paragraphs(
+        self,
+        articles: List[Dict],
+        include_intro: bool,
+        include_outro: bool,
+        lista_fontes_str: str
+    ) -> AsyncIterator[str]:
+        """Resposta do Groq em streaming, cortada a cada linha em branco (um parágrafo por notícia)."""
+        prompt = self._full_prompt(articles, include_intro, include_outro, lista_fontes_str)
+        buffer = ""
+        async for delta in self._complete_stream("groq.completion_stream", kind="bulletin", **prompt):
+            buffer += delta
+            while "\n\n" in buffer:
+                paragraph, buffer = buffer.split("\n\n", 1)
+                if paragraph.strip():
+                    yield paragraph.strip()
+        if buffer.strip():
+            yield buffer.strip()
+
+    def _full_prompt(
+        self,
+        articles: List[Dict],
+        include_intro: bool,
+        include_outro: bool,
+        lista_fontes_str: str
+    ) -> Dict:
+        """Prompt único com todas as notícias, dentro do orçamento de tokens, e o modelo escolhido."""
         # --- PROMPT ---
         system_instruction = (
             "Você é um redator sênior de rádio. Estilo formal e direto. "
@@ -77,7 +274,8 @@ class NewsSummarizer:
             "4. ENCERRAMENTO: Use exatamente a frase: 'Este boletim teve informações de: [LISTA]'."
         )
 
-        user_prompt = f"""
+        def build_user_prompt(contexto: str) -> str:
+            return f"""
         Escreva o boletim com base nestas notícias:
         {contexto}
 
@@ -89,33 +287,357 @@ class NewsSummarizer:
         {'3. Encerramento citando a LISTA DE FONTES OBRIGATÓRIA.' if include_outro else ''}
         """
 
+        # --- PREPARAÇÃO DO CONTEÚDO (dentro do orçamento de tokens) ---
+        items = [
+            (art.get('title', 'Notícia sem título'), self._content(art) or 'Sem detalhes adicionais.')
+            for art in articles if isinstance(art, dict)
+        ]
+        fitted = self.prompt_builder.fit(items, overhead_text=system_instruction + build_user_prompt(""))
+        contexto = "".join(
+            f"NOTÍCIA {i}: {titulo}. DETALHES: {desc}\n\n" for i, (titulo, desc) in enumerate(fitted["items"], 1))
+        user_prompt = build_user_prompt(contexto)
+        model = self.prompt_builder.select_model(fitted["estimated_tokens"])
+
+        logger.info(f"Sumarizando com fontes: {lista_fontes_str} "
+                    f"(~{fitted['estimated_tokens']} tokens, modelo {model})")
+        return {
+            "model":              model,
+            "system_instruction": system_instruction,
+            "user_prompt":        user_prompt,
+            "estimated_tokens":   fitted["estimated_tokens"],
+            "attributes":         {"llm.articles": len(items), "llm.articles_dropped": fitted["dropped"]},
+        }
+
+    async def _complete(
+        self,
+        span_name: str,
+        model: str,
+        kind: str,
+        system_instruction: str,
+        user_prompt: str,
+        estimated_tokens: int,
+        max_tokens: Optional[int] = None,
+        attributes: Optional[Dict] = None
+    ) -> str:
+        """Chamada ao Groq com span, duração e contagem de tokens (estimados e cobrados)."""
+        extra = {"max_tokens": max_tokens} if max_tokens else {}
+        with tracer.start_as_current_span(span_name) as span:
+            span.set_attribute("llm.model", model)
+            span.set_attribute("llm.estimated_tokens", estimated_tokens)
+            for name, value in (attributes or {}).items():
+                span.set_attribute(name, value)
+            metrics.LLM_TOKENS.labels(model, kind, "estimated").inc(estimated_tokens)
+
+            # Pedidos do locutor passam à frente de lotes e agendamentos
+            async with self.llm_slots.slot():
+                start = time.perf_counter()
+                # O SDK do Groq é síncrono: roda numa thread para não travar o event loop
+                completion = await self.upstream.call(lambda timeout: asyncio.to_thread(
+                    self.client.chat.completions.create,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_instruction},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.3,
+                    timeout=timeout,
+                    **extra
+                ), kind=kind)
+            metrics.LLM_CALL_DURATION.labels(model, kind).observe(time.perf_counter() - start)
+
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                span.set_attribute("llm.prompt_tokens", usage.prompt_tokens or 0)
+                span.set_attribute("llm.completion_tokens", usage.completion_tokens or 0)
+                metrics.LLM_TOKENS.labels(model, kind, "prompt").inc(usage.prompt_tokens or 0)
+                metrics.LLM_TOKENS.labels(model, kind, "completion").inc(usage.completion_tokens or 0)
+        return completion.choices[0].message.content or ""
+
+    async def _complete_stream(
+        self,
+        span_name: str,
+        model: str,
+        kind: str,
+        system_instruction: str,
+        user_prompt: str,
+        estimated_tokens: int,
+        attributes: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Como `_complete`, mas devolve os trechos do texto conforme o Groq os gera."""
+        # Span sem "current": o contexto de um gerador atravessa os yields do chamador
+        span = tracer.start_span(span_name)
+        span.set_attribute("llm.model", model)
+        span.set_attribute("llm.estimated_tokens", estimated_tokens)
+        for name, value in (attributes or {}).items():
+            span.set_attribute(name, value)
+        metrics.LLM_TOKENS.labels(model, kind, "estimated").inc(estimated_tokens)
+
+        stream = None
         try:
-            if summary_mode == "groq" and self.client:
-                logger.info(f"Sumarizando com fontes: {lista_fontes_str}")
-                # CORREÇÃO: .chat.completions.create em vez de .chat.create
-                completion = self.client.chat.completions.create(
-                    model=self.model,
+            # A vaga fica ocupada enquanto o texto chega
+            async with self.llm_slots.slot():
+                start = time.perf_counter()
+                stream = await self.upstream.call(lambda timeout: asyncio.to_thread(
+                    self.client.chat.completions.create,
+                    model=model,
                     messages=[
                         {"role": "system", "content": system_instruction},
                         {"role": "user", "content": user_prompt}
                     ],
-                    temperature=0.3
-                )
-                return completion.choices[0].message.content
+                    temperature=0.3,
+                    stream=True,
+                    timeout=timeout
+                ), kind=f"{kind}_stream")  # aqui o timeout cobre só o início da resposta
+                # O iterador do SDK é síncrono: uma thread lê os eventos e repassa pela fila
+                loop = asyncio.get_running_loop()
+                queue: asyncio.Queue = asyncio.Queue()
 
-            return self._simple_format(articles, include_intro, include_outro, lista_fontes_str)
+                def pump():
+                    try:
+                        for chunk in stream:
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                loop.call_soon_threadsafe(queue.put_nowait, delta)
+                    except Exception as e:
+                        loop.call_soon_threadsafe(queue.put_nowait, e)
+                    finally:
+                        loop.call_soon_threadsafe(queue.put_nowait, None)
+
+                reader = asyncio.ensure_future(asyncio.to_thread(pump))
+                first = True
+                while (item := await queue.get()) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    if first:
+                        span.set_attribute("llm.time_to_first_token_s", round(time.perf_counter() - start, 3))
+                        first = False
+                    yield item
+                await reader
+                metrics.LLM_CALL_DURATION.labels(model, kind).observe(time.perf_counter() - start)
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()  # consumidor desistiu no meio: libera a conexão e a thread
+            span.end()
+
+    # --- CACHE DO BOLETIM ---
+
+    def _summary_cache_key(self, articles, style, include_intro, include_outro, fontes_str) -> str:
+        # O modelo sai do tamanho das notícias, então a configuração dos níveis entra na chave
+        bruto = json.dumps([
+            GROQ_SUMMARY_MODEL, GROQ_SUMMARY_MODEL_SMALL, SUMMARY_SMALL_MODEL_MAX_TOKENS,
+            SUMMARY_MAX_INPUT_TOKENS, SUMMARY_ARTICLE_MAX_TOKENS, style, include_intro, include_outro, SUMMARY_STRATEGY, fontes_str,
+            [self._article_hash(a) for a in articles if isinstance(a, dict)],
+        ], ensure_ascii=False)
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
 
+    async def _load_cached_summary(self, cache_key: str):
+        if engine is None or SUMMARY_CACHE_TTL_HOURS <= 0:
+            return None
+        table = SummaryCache.__table__
+        limite = datetime.utcnow() - timedelta(hours=SUMMARY_CACHE_TTL_HOURS)
+        try:
+            return await repository.run(lambda session: session.execute(select(table.c.summary_text).where(
+                table.c.cache_key == cache_key, table.c.created_at >= limite)).scalar())
         except Exception as e:
-            logger.error(f"Erro na IA: {e}")
-            # Em caso de erro, retorna o formato simples em vez de uma mensagem de erro crua
-            return self._simple_format(articles, include_intro, include_outro, lista_fontes_str)
+            logger.warning(f"Cache de boletins indisponível: {e}")
+            return None
+
+    async def _store_cached_summary(self, cache_key: str, text: str):
+        if engine is None or SUMMARY_CACHE_TTL_HOURS <= 0 or not text:
+            return
+        table = SummaryCache.__table__
+
+        def store(session: Session):
+            # Aproveita a escrita para descartar entradas vencidas
+            session.execute(table.delete().where(
+                table.c.created_at < datetime.utcnow() - timedelta(hours=SUMMARY_CACHE_TTL_HOURS)))
+            session.execute(insert_on_conflict(table).values(
+                cache_key=cache_key, summary_text=text, created_at=datetime.utcnow()
+            ).on_conflict_do_update(
+                index_elements=[table.c.cache_key],
+                set_={"summary_text": text, "created_at": datetime.utcnow()}))
+
+        try:
+            await repository.run(store)
+        except Exception as e:
+            logger.warning(f"Não foi possível guardar o boletim em cache: {e}")
+
+    # --- MODO INCREMENTAL ---
+
+    async def _summarize_incremental(
+        self,
+        articles: List[Dict],
+        style: str,
+        include_intro: bool,
+        include_outro: bool,
+        lista_fontes_str: str,
+        bypass_cache: bool = False
+    ) -> Tuple[str, bool]:
+        """
+        Resume cada notícia separadamente (só as que ainda não estão no cache),
+        com no máximo SUMMARY_CONCURRENCY chamadas simultâneas, e monta o
+        boletim com os templates do estilo. O prompt não cresce com o número de notícias.
+        Retorna o texto e se todas as notícias foram resumidas pela IA.
+        """
+        status = {}
+        parts = [p async for p in self._incremental_paragraphs(
+            articles, style, include_intro, include_outro, lista_fontes_str, bypass_cache, status)]
+        return "\n\n".join(parts), status["complete"]
+
+    async def _incremental_paragraphs(
+        self,
+        articles: List[Dict],
+        style: str,
+        include_intro: bool,
+        include_outro: bool,
+        lista_fontes_str: str,
+        bypass_cache: bool,
+        status: Dict
+    ) -> AsyncIterator[str]:
+        """
+        Parágrafos do modo incremental na ordem do boletim: as notícias novas
+        são resumidas em paralelo e cada uma sai assim que ela e as anteriores
+        estiverem prontas. Ao final, status["complete"] diz se a IA resumiu todas.
+        """
+        articles = [a for a in articles if isinstance(a, dict)]
+        keys = [self._article_hash(a) for a in articles]
+        plans = {k: self._article_prompt(a) for k, a in zip(keys, articles)}
+        models = {k: plan[2] for k, plan in plans.items()}
+
+        with tracer.start_as_current_span("summary.incremental") as span:
+            cached = {} if bypass_cache else await self._load_summaries(models, style)
+            missing = {k: a for k, a in zip(keys, articles) if k not in cached}
+            span.set_attribute("summary.articles", len(articles))
+            span.set_attribute("summary.cached", len(articles) - len(missing))
+            metrics.ARTICLE_SUMMARIES.labels("cached").inc(len(articles) - len(missing))
+            logger.info(f"Sumarização incremental: {len(missing)} nova(s), "
+                        f"{len(articles) - len(missing)} do cache")
+
+            semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+            async def summarize_one(key: str, art: Dict) -> Optional[str]:
+                async with semaphore:
+                    try:
+                        return await self._article_flights.do(
+                            plans[key], lambda: self._summarize_article(*plans[key]))
+                    except Exception as e:
+                        logger.warning(f"Resumo da notícia '{art.get('title', '')[:60]}' falhou: {e}")
+                        metrics.ARTICLE_SUMMARIES.labels("failed").inc()
+                        return None
+
+            # Criadas dentro do span: as chamadas ao Groq ficam como filhas dele
+            tasks = {k: asyncio.ensure_future(summarize_one(k, a)) for k, a in missing.items()}
+
+        template = STYLE_TEMPLATES.get(style, STYLE_TEMPLATES["jornalistico"])
+        fresh = {}
+        try:
+            if include_intro:
+                yield template["intro"]
+            for key, art in zip(keys, articles):
+                if key in tasks:
+                    text = await tasks[key]
+                    if text:
+                        fresh[key] = text
+                # Notícia sem resumo (falha da IA) entra no formato simples
+                yield cached.get(key) or fresh.get(key) or self._plain_item(art)
+            if include_outro:
+                yield template["outro"].format(fontes=lista_fontes_str)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            metrics.ARTICLE_SUMMARIES.labels("generated").inc(len(fresh))
+            await self._store_summaries(fresh, style, models)
+            status["complete"] = len(cached) + len(fresh) == len(articles)
+
+    def _article_prompt(self, art: Dict) -> Tuple[str, int, str]:
+        """Prompt de uma notícia (detalhes cortados no orçamento), tokens estimados e modelo."""
+        titulo = art.get('title', 'Notícia sem título')
+        desc = truncate_to_tokens(self._content(art), SUMMARY_ARTICLE_MAX_TOKENS) or 'Sem detalhes adicionais.'
+        prompt = f"NOTÍCIA: {titulo}. DETALHES: {desc}"
+        estimated = estimate_tokens(ARTICLE_INSTRUCTION) + estimate_tokens(prompt)
+        # Sempre o modelo grande: o prompt de uma notícia é curto por construção
+        # (limitado por SUMMARY_ARTICLE_MAX_TOKENS), e pelo tamanho todas iriam para o pequeno
+        return prompt, estimated, GROQ_SUMMARY_MODEL
+
+    async def _summarize_article(self, prompt: str, estimated_tokens: int, model: str) -> str:
+        text = await self._complete(
+            "groq.article_completion", model, "article", ARTICLE_INSTRUCTION, prompt,
+            estimated_tokens, max_tokens=200)
+        return text.strip()
+
+    @staticmethod
+    def _details(art: Dict) -> str:
+        # O coletor entrega 'summary'; artigos vindos direto do GNews trazem 'description'
+        return (art.get('summary') or art.get('description') or '').strip()
+
+    def _content(self, art: Dict) -> str:
+        # Texto da página (etapa de enriquecimento) quando houver; senão, a descrição
+        return (art.get('body') or '').strip() or self._details(art)
+
+    def _article_hash(self, art: Dict) -> str:
+        bruto = json.dumps([art.get('title', '').strip(), self._content(art)], ensure_ascii=False)
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+    async def _load_summaries(self, models: Dict[str, str], style: str) -> Dict[str, str]:
+        """`models` mapeia o hash de cada notícia para o modelo que a resumiria agora."""
+        if engine is None or not models:
+            return {}
+        table = ArticleSummary.__table__
+        conditions = [
+            table.c.article_hash.in_(list(models)),
+            table.c.style == style,
+            table.c.model.in_(set(models.values())),
+        ]
+        if ARTICLE_SUMMARY_TTL_HOURS > 0:
+            conditions.append(table.c.created_at >= datetime.utcnow() - timedelta(hours=ARTICLE_SUMMARY_TTL_HOURS))
+
+        def load(session: Session) -> Dict[str, str]:
+            rows = session.execute(table.select().where(*conditions))
+            return {row.article_hash: row.summary_text for row in rows
+                    if models[row.article_hash] == row.model}
+
+        try:
+            return await repository.run(load)
+        except Exception as e:
+            logger.warning(f"Cache de resumos indisponível: {e}")
+            return {}
+
+    async def _store_summaries(self, summaries: Dict[str, str], style: str, models: Dict[str, str]):
+        if engine is None or not summaries:
+            return
+
+        table = ArticleSummary.__table__
+
+        def store(session: Session):
+            # Aproveita a escrita para descartar resumos vencidos (notícias que saíram das manchetes)
+            if ARTICLE_SUMMARY_TTL_HOURS > 0:
+                session.execute(table.delete().where(
+                    table.c.created_at < datetime.utcnow() - timedelta(hours=ARTICLE_SUMMARY_TTL_HOURS)))
+            stmt = insert_on_conflict(table)
+            # Resumo regerado (bypass do cache) substitui o anterior
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["article_hash", "style", "model"],
+                set_={"summary_text": stmt.excluded.summary_text, "created_at": stmt.excluded.created_at})
+            session.execute(stmt, [
+                {"article_hash": k, "style": style, "model": models[k],
+                 "summary_text": text, "created_at": datetime.utcnow()}
+                for k, text in summaries.items()
+            ])
+
+        try:
+            await repository.run(store)
+        except Exception as e:
+            logger.warning(f"Não foi possível guardar resumos em cache: {e}")
+
+    def _plain_item(self, art: Dict) -> str:
+        return f"{art.get('title', 'Notícia')}. {self._details(art)}".strip()
 
     def _simple_format(self, articles, intro, outro, fontes_str):
         """Fallback formatado para quando a IA falha"""
         texto = "Boletim de notícias.\n\n" if intro else ""
         for art in articles:
             if isinstance(art, dict):
-                texto += f"{art.get('title', 'Notícia')}. {art.get('description', '')}\n\n"
+                texto += f"{self._plain_item(art)}\n\n"
         if outro:
             texto += f"Este boletim teve informações de: {fontes_str}."
         return texto
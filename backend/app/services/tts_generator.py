@@ -1,9 +1,20 @@
+import asyncio
+import io
 import os
 import logging
+import time
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
 import httpx
+from opentelemetry import trace
+
+import metrics
+from services.priority import get_limiter
+from services.quota import QuotaExceededError, get_quota
+from services.storage import get_storage
+from services.upstream import get_upstream
+from settings import AUDIO_DIR, ELEVENLABS_BASE_URL, GTTS_BASE_URL, TTS_PIPELINE_CONCURRENCY
 
 # Tentativa de importar bibliotecas opcionais
 try:
@@ -22,11 +33,22 @@ except ImportError:
     AsyncOpenAI = None
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+if gTTS:
+    class _gTTSBaseURL(gTTS):
+        """gTTS apontando para GTTS_BASE_URL em vez de translate.google.<tld>."""
+
+        def _prepare_requests(self):
+            prepared = super()._prepare_requests()
+            for pr in prepared:
+                pr.prepare_url(f"{GTTS_BASE_URL}/_/TranslateWebserverUi/data/batchexecute", None)
+            return prepared
 
 
 class TTSGenerator:
     def __init__(self, output_dir: str = "audio"):
-        self.output_dir = Path("/app/audio")
+        self.output_dir = AUDIO_DIR
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
         # Carrega chaves do ambiente
@@ -37,17 +59,42 @@ class TTSGenerator:
 
         # Cliente ElevenLabs (apenas valida se tem chave)
         self.elevenlabs_client = True if self.elevenlabs_key else False
+        self.http = httpx.AsyncClient()
+        self.elevenlabs_upstream = get_upstream("elevenlabs")
+        self.elevenlabs_quota = get_quota("elevenlabs")
 
         # Cliente Google
         self.gTTS_client = True if gTTS else False
+        self.tts_slots = get_limiter("tts")
+        self.storage = get_storage()
 
         # Cliente OpenAI (Inicializa se tiver biblioteca e chave)
-        self.openai_client = None
-        if AsyncOpenAI and self.main_api_key and self.main_api_key.startswith("sk-"):
+        self.openai_client = self._openai_client(self.main_api_key)
+
+    @staticmethod
+    def _openai_client(api_key: Optional[str]):
+        if AsyncOpenAI and api_key and api_key.startswith("sk-"):
             try:
-                self.openai_client = AsyncOpenAI(api_key=self.main_api_key)
+                return AsyncOpenAI(api_key=api_key)
             except Exception as e:
                 logger.warning(f"Erro ao iniciar cliente OpenAI: {e}")
+        return None
+
+    async def reload(self):
+        """
+        Troca as chaves após salvar a configuração. O cliente HTTP, as vagas de
+        TTS e o armazenamento seguem os mesmos; o cliente OpenAI só é refeito
+        (e o antigo fechado) se a chave mudou.
+        """
+        self.elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
+        self.elevenlabs_client = True if self.elevenlabs_key else False
+        api_key = os.getenv("GROQ_API_KEY")
+        if api_key == self.main_api_key:
+            return
+        old_client, self.main_api_key = self.openai_client, api_key
+        self.openai_client = self._openai_client(api_key)
+        if old_client is not None:
+            await old_client.close()
 
     async def generate(
         self,
@@ -59,15 +106,22 @@ class TTSGenerator:
     ) -> str:
         """
         Gera áudio com Fallback Automático: Tenta Premium (Eleven/OpenAI) -> Falha -> Usa gTTS.
+        Sínteses do locutor passam à frente das de lotes e agendamentos (services.priority).
+        O MP3 pronto (ou o .txt, se nenhum motor funcionou) vai para o armazenamento
+        (AUDIO_STORAGE) fora da vaga de TTS, para todas as réplicas o servirem.
         """
+        async with self.tts_slots.slot():
+            path = await self._generate(text, tts_engine, tts_voice_id, tld)
+        await self.storage.store(Path(path))
+        return path
+
+    async def _generate(self, text: str, tts_engine: str, tts_voice_id: str, tld: Optional[str]) -> str:
         if not text:
             raise ValueError("Texto vazio fornecido")
 
         logger.info(f"Gerando áudio (Motor solicitado: '{tts_engine}')...")
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"boletim_{timestamp}.mp3"
-        output_path = self.output_dir / filename
+        output_path = await self._reserve_output()
 
         cleaned_text = self._prepare_text(text)
         temp_path = None
@@ -75,11 +129,22 @@ class TTSGenerator:
         try:
             # --- MOTOR 1: ELEVENLABS ---
             if tts_engine == "elevenlabs":
-                if self.elevenlabs_client:
+                if self.elevenlabs_client and not await self.elevenlabs_quota.try_consume(len(cleaned_text)):
+                    logger.warning("⚠️ Cota de caracteres da ElevenLabs na reserva. Usando Google.")
+                    trace.get_current_span().add_event("tts.fallback", {"tts.from": "elevenlabs", "tts.reason": "quota"})
+                    metrics.TTS_FALLBACKS.labels("elevenlabs").inc()
+                    tts_engine = "gtts"
+                elif self.elevenlabs_client:
                     try:
-                        temp_path = await self._generate_elevenlabs(cleaned_text, output_path, tts_voice_id)
+                        with tracer.start_as_current_span("tts.elevenlabs") as span:
+                            span.set_attribute("tts.chars", len(cleaned_text))
+                            async with self.elevenlabs_quota.shaped():
+                                temp_path = await self._generate_elevenlabs(cleaned_text, output_path, tts_voice_id, "bulletin")
                     except Exception as e_premium:
                         logger.warning(f"⚠️ ElevenLabs falhou: {e_premium}. Ativando Fallback Google.")
+                        trace.get_current_span().add_event("tts.fallback", {"tts.from": "elevenlabs"})
+                        metrics.TTS_FALLBACKS.labels("elevenlabs").inc()
+                        await self.elevenlabs_quota.refund(len(cleaned_text))
                         tts_engine = "gtts"  # Força fallback
                 else:
                     logger.warning(
@@ -90,9 +155,14 @@ class TTSGenerator:
             elif tts_engine == "openai":
                 if self.openai_client:
                     try:
-                        temp_path = await self._generate_openai(cleaned_text, output_path)
+                        with tracer.start_as_current_span("tts.openai") as span:
+                            span.set_attribute("tts.chars", len(cleaned_text))
+                            with metrics.observe_upstream("openai"):
+                                temp_path = await self._generate_openai(cleaned_text, output_path)
                     except Exception as e_premium:
                         logger.warning(f"⚠️ OpenAI TTS falhou: {e_premium}. Ativando Fallback Google.")
+                        trace.get_current_span().add_event("tts.fallback", {"tts.from": "openai"})
+                        metrics.TTS_FALLBACKS.labels("openai").inc()
                         tts_engine = "gtts"  # Força fallback
                 else:
                     logger.warning(
@@ -103,40 +173,262 @@ class TTSGenerator:
             if tts_engine == "gtts":
                 if not self.gTTS_client:
                     raise RuntimeError("gTTS não instalado no servidor.")
-                temp_path = await self._generate_gtts(cleaned_text, output_path, tld or "com.br")
+                with tracer.start_as_current_span("tts.gtts") as span:
+                    span.set_attribute("tts.chars", len(cleaned_text))
+                    with metrics.observe_upstream("gtts"):
+                        temp_path = await self._generate_gtts(cleaned_text, output_path, tld or "com.br")
 
             # --- PÓS-PROCESSAMENTO (Aceleração para gTTS) ---
-            # O Google fala devagar, então aceleramos. OpenAI/ElevenLabs já têm ritmo bom.
-            if tts_engine == "gtts" and AudioSegment and temp_path:
-                try:
-                    logger.info("⚡ Acelerando áudio gTTS em 20%...")
-                    audio = AudioSegment.from_mp3(str(temp_path))
-                    faster_audio = audio.speedup(playback_speed=1.20)
-                    faster_audio.export(
-                        str(output_path), format="mp3", bitrate="192k")
-                    # Limpa temporário
-                    if temp_path != output_path and temp_path.exists():
-                        temp_path.unlink()
-                except Exception as e_speed:
-                    logger.warning(f"Falha na aceleração: {e_speed}")
-                    if temp_path != output_path:
-                        temp_path.rename(output_path)
+            if temp_path:
+                await self._finalize(temp_path, output_path, tts_engine)
 
+            if output_path.exists():
+                metrics.AUDIO_BYTES_WRITTEN.labels(tts_engine).inc(output_path.stat().st_size)
             return str(output_path)
 
         except Exception as e:
             logger.error(f"✗ Erro fatal em todos os motores: {e}")
+            await self._release_output(output_path)
             # Último recurso: Salva texto para debug
-            text_path = self.output_dir / f"boletim_{timestamp}.txt"
+            text_path = output_path.with_suffix(".txt")
             with open(text_path, 'w', encoding='utf-8') as f:
                 f.write(text)
             return str(text_path)
 
+    async def generate_pipelined(
+        self,
+        paragraphs: AsyncIterator[str],
+        tts_engine: str = "gtts",
+        tts_voice_id: str = "21m00Tcm4TlvDq8ikWAM",
+        tld: Optional[str] = "com.br"
+    ) -> Tuple[str, str]:
+        """
+        Sintetiza cada parágrafo assim que ele chega (até TTS_PIPELINE_CONCURRENCY
+        ao mesmo tempo) e junta os trechos de MP3 na ordem, de modo que a
+        narração das primeiras notícias corre junto com a escrita das seguintes.
+        Retorna (texto completo, caminho do áudio).
+
+        Se um trecho do motor premium falhar, os que ainda não começaram nem são
+        tentados e só os trechos sem áudio são refeitos com o gTTS (também em
+        paralelo): os premium já prontos — e já cobrados — ficam no boletim, que
+        sai com as duas vozes, decodificadas e regravadas num MP3 só. Sem
+        pydub/ffmpeg para isso, o boletim inteiro é refeito com o gTTS. Erros de
+        `paragraphs` sobem para o chamador.
+        """
+        engine = await self._pipeline_engine(tts_engine)
+        logger.info(f"Gerando áudio em pipeline (motor: '{engine}')...")
+
+        output_path = await self._reserve_output()
+        semaphore = asyncio.Semaphore(TTS_PIPELINE_CONCURRENCY)
+        failed = asyncio.Event()
+
+        async def synthesize(engine: str, index: int, text: str) -> bytes:
+            async with semaphore, self.tts_slots.slot():
+                if failed.is_set():
+                    raise RuntimeError("trecho anterior falhou")
+                try:
+                    return await self._synthesize_segment(
+                        engine, text, output_path, index, tts_voice_id, tld or "com.br")
+                except Exception:
+                    failed.set()
+                    raise
+
+        texts, cleaned_texts, tasks = [], [], []
+        try:
+            async for paragraph in paragraphs:
+                texts.append(paragraph)
+                cleaned = self._prepare_text(paragraph)
+                if cleaned:
+                    cleaned_texts.append(cleaned)
+                    tasks.append(asyncio.ensure_future(synthesize(engine, len(tasks), cleaned)))
+            text_done = time.perf_counter()
+            segments = await asyncio.gather(*tasks, return_exceptions=True)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._release_output(output_path)
+            raise
+
+        text = "\n\n".join(texts)
+        if not tasks:
+            await self._release_output(output_path)
+            raise ValueError("Texto vazio fornecido")
+        engines = [engine] * len(segments)
+        errors = [e for e in segments if isinstance(e, BaseException)]
+        if errors and engine != "gtts":
+            missing = [i for i, s in enumerate(segments) if isinstance(s, BaseException)]
+            logger.warning(f"⚠️ {engine} falhou no pipeline ({errors[0]}). "
+                           f"Refazendo {len(missing)} de {len(segments)} trecho(s) com Google.")
+            trace.get_current_span().add_event("tts.fallback", {
+                "tts.from": engine, "tts.pipeline": True, "tts.segments": len(missing)})
+            metrics.TTS_FALLBACKS.labels(engine).inc()
+            if len(missing) == len(segments):
+                engine = "gtts"
+            failed.clear()
+            redone = await asyncio.gather(
+                *(synthesize("gtts", i, cleaned_texts[i]) for i in missing), return_exceptions=True)
+            for i, segment in zip(missing, redone):
+                segments[i], engines[i] = segment, "gtts"
+            errors = [e for e in segments if isinstance(e, BaseException)]
+        if errors:
+            # Último recurso: o caminho em etapas (que grava o texto se nenhum motor funcionar)
+            logger.warning(f"⚠️ TTS em pipeline falhou ({errors[0]}). Tentando em etapas.")
+            await self._release_output(output_path)
+            return text, await self.generate(text, "gtts", tts_voice_id, tld)
+
+        # Quanto o áudio demorou além do texto: perto de zero = TTS escondido atrás do LLM
+        metrics.TTS_PIPELINE_TAIL.observe(time.perf_counter() - text_done)
+        with tracer.start_as_current_span("tts.join") as span:
+            span.set_attribute("tts.segments", len(segments))
+            joined = await asyncio.to_thread(self._join_segments, segments, engines, output_path)
+        if not joined and len(set(engines)) > 1:
+            # Duas vozes só se juntam decodificando; sem pydub/ffmpeg, uma voz só do começo ao fim
+            logger.warning("⚠️ Sem como unir trechos de motores diferentes. Refazendo o boletim com Google.")
+            engine = "gtts"
+            segments = await asyncio.gather(
+                *(synthesize(engine, i, t) for i, t in enumerate(cleaned_texts)), return_exceptions=True)
+            errors = [e for e in segments if isinstance(e, BaseException)]
+            if errors:
+                logger.warning(f"⚠️ TTS em pipeline falhou ({errors[0]}). Tentando em etapas.")
+                await self._release_output(output_path)
+                return text, await self.generate(text, "gtts", tts_voice_id, tld)
+        if not joined:
+            # MP3 do mesmo motor: os quadros de um trecho continuam os do anterior
+            temp_path = output_path.parent / f"temp_{output_path.name}"
+            temp_path.write_bytes(b"".join(segments))
+            await self._finalize(temp_path, output_path, engine)
+        if output_path.exists():
+            metrics.AUDIO_BYTES_WRITTEN.labels(engine).inc(output_path.stat().st_size)
+        await self.storage.store(output_path)
+        return text, str(output_path)
+
+    @staticmethod
+    def _join_segments(segments: List[bytes], engines: List[str], output_path: Path) -> bool:
+        """
+        Decodifica os trechos, acelera em 20% os do gTTS (como _finalize) e grava
+        um MP3 só — cada trecho é um arquivo com cabeçalho próprio e, no boletim
+        misto, outro codificador e taxa de amostragem. False sem pydub/ffmpeg.
+        """
+        if not AudioSegment:
+            return False
+        try:
+            audio = AudioSegment.empty()
+            for data, engine in zip(segments, engines):
+                part = AudioSegment.from_file(io.BytesIO(data), format="mp3")
+                if engine == "gtts":
+                    part = part.speedup(playback_speed=1.20)
+                audio += part
+            audio.export(str(output_path), format="mp3", bitrate="192k")
+            return True
+        except Exception as e:
+            logger.warning(f"Falha ao unir os trechos de áudio: {e}")
+            return False
+
+    async def _pipeline_engine(self, tts_engine: str) -> str:
+        """Motor usado em todos os trechos — decidido uma vez, antes do primeiro."""
+        if tts_engine == "elevenlabs":
+            if not self.elevenlabs_client:
+                logger.warning("Chave ElevenLabs não configurada. Usando Google.")
+                return "gtts"
+            if await self.elevenlabs_quota.saving():
+                logger.warning("⚠️ Cota de caracteres da ElevenLabs na reserva. Usando Google.")
+                trace.get_current_span().add_event("tts.fallback", {"tts.from": "elevenlabs", "tts.reason": "quota"})
+                metrics.TTS_FALLBACKS.labels("elevenlabs").inc()
+                return "gtts"
+            return "elevenlabs"
+        if tts_engine == "openai":
+            if not self.openai_client:
+                logger.warning("Cliente OpenAI não disponível (Chave inválida ou lib ausente). Usando Google.")
+                return "gtts"
+            return "openai"
+        return "gtts"
+
+    async def _reserve_output(self) -> Path:
+        """
+        boletim_AAAAMMDD_HHMMSS.mp3 (formato que o frontend reconhece). Boletins
+        gerados no mesmo segundo (lotes, agendamentos, outros workers ou réplicas)
+        recebem o próximo segundo livre em vez de sobrescrever o áudio um do outro:
+        o nome é reservado no próprio armazenamento (AUDIO_STORAGE).
+        """
+        moment = datetime.now()
+        while True:
+            filename = f"boletim_{moment:%Y%m%d_%H%M%S}.mp3"
+            if await self.storage.reserve(filename):
+                return self.output_dir / filename
+            moment += timedelta(seconds=1)
+
+    async def _release_output(self, path: Path):
+        """Desfaz a reserva do nome que não chegou a receber áudio."""
+        try:
+            await self.storage.release(path.name)
+        except Exception as e:
+            logger.warning(f"Não foi possível liberar o nome {path.name}: {e}")
+
+    async def _synthesize_segment(
+        self, engine: str, text: str, output_path: Path, index: int, voice_id: str, tld: str
+    ) -> bytes:
+        """MP3 de um parágrafo; os arquivos intermediários são apagados em seguida."""
+        seg_path = output_path.parent / f"seg{index:03d}_{output_path.name}"
+        try:
+            if engine == "elevenlabs":
+                if not await self.elevenlabs_quota.try_consume(len(text)):
+                    raise QuotaExceededError("cota de caracteres da ElevenLabs no limite")
+                try:
+                    with tracer.start_as_current_span("tts.elevenlabs") as span:
+                        span.set_attribute("tts.chars", len(text))
+                        async with self.elevenlabs_quota.shaped():
+                            path = await self._generate_elevenlabs(text, seg_path, voice_id, "segment")
+                except Exception:
+                    await self.elevenlabs_quota.refund(len(text))
+                    raise
+            elif engine == "openai":
+                with tracer.start_as_current_span("tts.openai") as span:
+                    span.set_attribute("tts.chars", len(text))
+                    with metrics.observe_upstream("openai"):
+                        path = await self._generate_openai(text, seg_path)
+            else:
+                with tracer.start_as_current_span("tts.gtts") as span:
+                    span.set_attribute("tts.chars", len(text))
+                    with metrics.observe_upstream("gtts"):
+                        path = await self._generate_gtts(text, seg_path, tld)
+            return path.read_bytes()
+        finally:
+            for leftover in (seg_path, seg_path.parent / f"temp_{seg_path.name}"):
+                leftover.unlink(missing_ok=True)
+
+    async def _finalize(self, temp_path: Path, output_path: Path, tts_engine: str):
+        """
+        Leva o áudio para o caminho final. O Google fala devagar, então o gTTS é
+        acelerado em 20%; OpenAI/ElevenLabs já têm ritmo bom.
+        """
+        if temp_path == output_path:
+            return
+        if tts_engine == "gtts" and AudioSegment:
+            try:
+                logger.info("⚡ Acelerando áudio gTTS em 20%...")
+                with tracer.start_as_current_span("tts.speedup"):
+                    # Decodificar e recodificar o MP3 é CPU pura: fora do event loop
+                    await asyncio.to_thread(self._speedup, temp_path, output_path)
+                # Limpa temporário
+                if temp_path.exists():
+                    temp_path.unlink()
+                return
+            except Exception as e_speed:
+                logger.warning(f"Falha na aceleração: {e_speed}")
+        temp_path.replace(output_path)
+
+    @staticmethod
+    def _speedup(temp_path: Path, output_path: Path):
+        audio = AudioSegment.from_mp3(str(temp_path))
+        faster_audio = audio.speedup(playback_speed=1.20)
+        faster_audio.export(str(output_path), format="mp3", bitrate="192k")
+
     # --- MÉTODOS PRIVADOS DE CADA MOTOR ---
 
-    async def _generate_elevenlabs(self, text: str, output_path: Path, voice_id: str) -> Path:
+    async def _generate_elevenlabs(self, text: str, output_path: Path, voice_id: str, kind: str) -> Path:
         """ Gera usando API da ElevenLabs """
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}"
         headers = {
             "xi-api-key": self.elevenlabs_key,
             "Content-Type": "application/json"
@@ -147,14 +439,20 @@ class TTSGenerator:
             "voice_settings": {"stability": 0.5, "similarity_boost": 0.75}
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=data, headers=headers, timeout=60.0)
+        async def request(timeout: float) -> httpx.Response:
+            response = await self.http.post(url, json=data, headers=headers, timeout=timeout)
             if response.status_code != 200:
-                raise Exception(f"Erro API ElevenLabs: {response.status_code} - {response.text}")
-
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
+                raise httpx.HTTPStatusError(
+                    f"Erro API ElevenLabs: {response.status_code} - {response.text}",
+                    request=response.request, response=response)
+            return response
+
+        # Circuito aberto ou timeout adaptativo estourado → o chamador cai no gTTS na hora.
+        # Boletim inteiro e trecho do pipeline têm timeouts aprendidos separadamente
+        response = await self.elevenlabs_upstream.call(request, kind=kind)
+        with open(output_path, "wb") as f:
+            for chunk in response.iter_bytes():
+                f.write(chunk)
 
         return output_path
 
@@ -179,8 +477,9 @@ class TTSGenerator:
         temp_filename = f"temp_{output_path.name}"
         temp_path = output_path.parent / temp_filename
 
-        tts = gTTS(text=text, lang='pt', tld=tld)
-        tts.save(str(temp_path))
+        tts = (_gTTSBaseURL if GTTS_BASE_URL else gTTS)(text=text, lang='pt', tld=tld)
+        # O gTTS faz as requisições de forma síncrona: numa thread, para não travar o event loop
+        await asyncio.to_thread(tts.save, str(temp_path))
 
         return temp_path
 
@@ -0,0 +1,317 @@
+import asyncio
+import contextlib
+import logging
+import random
+import time
+from typing import AsyncContextManager, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+import metrics
+from settings import UPSTREAM_HEDGING
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class UpstreamError(Exception):
+    """Falha de um serviço externo depois de esgotadas as tentativas."""
+
+
+class CircuitOpenError(UpstreamError):
+    """Circuito aberto: o serviço falhou demais e está sendo poupado."""
+
+
+def _is_client_error(exc: BaseException) -> bool:
+    """Erros 4xx (exceto 408/429) são culpa do pedido — repetir não adianta."""
+    if getattr(exc, "retryable", True) is False:
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return 400 <= code < 500 and code not in (408, 429)
+    code = getattr(exc, "status_code", None)  # erros do SDK do Groq/OpenAI
+    return isinstance(code, int) and 400 <= code < 500 and code not in (408, 429)
+
+
+class CircuitBreaker:
+    """
+    Fechado → aberto após `failure_threshold` falhas seguidas; aberto recusa
+    chamadas por `reset_timeout` segundos; depois deixa passar uma sonda
+    (meio-aberto) que fecha o circuito se der certo ou reabre se falhar.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "fechado", "meio-aberto", "aberto"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    @property
+    def probing(self) -> bool:
+        return self.state == self.HALF_OPEN
+
+    def release_probe(self):
+        """A sonda foi cancelada sem resposta: a próxima chamada vira a nova sonda."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            logger.info(f"✓ Circuito de '{self.name}' fechado novamente")
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"✗ Circuito de '{self.name}' aberto após {self.failures} falha(s)")
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.UPSTREAM_CIRCUIT_STATE.labels(self.name).set(
+            {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[state])
+
+
+class LatencyEstimator:
+    """
+    Timeout adaptativo no estilo do RTO do TCP: média móvel exponencial da
+    latência mais 4 desvios, limitado a [min_timeout, max_timeout].
+    Sem amostras, usa o máximo.
+    """
+
+    def __init__(self, min_timeout: float, max_timeout: float):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+
+    def observe(self, seconds: float):
+        if self.srtt is None:
+            self.srtt, self.rttvar = seconds, seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.srtt + 4 * self.rttvar))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Momento de disparar a cópia: bem acima do normal, bem antes do timeout."""
+        if self.srtt is None:
+            return None
+        return self.srtt + 2 * self.rttvar
+
+
+class RetryBudget:
+    """
+    Orçamento de novas tentativas (mesma regra do throttling de retry do gRPC):
+    cada falha gasta 1 ficha, cada sucesso devolve `token_ratio`; só se repete
+    enquanto houver mais da metade das fichas. Com o serviço fora do ar as
+    repetições param sozinhas em vez de multiplicar a carga.
+    """
+
+    def __init__(self, max_tokens: float = 10.0, token_ratio: float = 0.1):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self.tokens = max_tokens
+
+    def on_success(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.token_ratio)
+
+    def on_failure(self):
+        self.tokens = max(0.0, self.tokens - 1)
+
+    def can_retry(self) -> bool:
+        return self.tokens > self.max_tokens / 2
+
+
+class UpstreamClient:
+    """
+    Executa chamadas a um serviço externo com circuit breaker, repetições com
+    jitter, timeout adaptativo e, opcionalmente, requisições "hedged" (uma
+    cópia disparada quando a primeira demora além do normal).
+
+    `fn` recebe o timeout da tentativa em segundos e devolve o awaitable da
+    chamada — ex.: ``lambda t: client.get(url, timeout=t)``.
+
+    A latência é aprendida por classe de pedido (`kind`): resumos de uma notícia
+    e trechos de TTS são bem mais curtos que o boletim inteiro, e um timeout
+    aprendido com eles estouraria à toa nos pedidos grandes. Circuito e
+    orçamento de repetições continuam por serviço.
+
+    `pace`, se dado, é aberto em volta de cada tentativa — repetições e cópias
+    hedged incluídas — antes de o relógio dela começar: a espera pelo ritmo do
+    plano (services.quota) não conta como latência nem consome o timeout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        min_timeout: float,
+        max_timeout: float,
+        retries: int = 1,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge: bool = False,
+    ):
+        self.name = name
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.latencies: Dict[str, LatencyEstimator] = {}
+        self.budget = RetryBudget()
+
+    def latency(self, kind: str = "default") -> LatencyEstimator:
+        if kind not in self.latencies:
+            self.latencies[kind] = LatencyEstimator(self.min_timeout, self.max_timeout)
+        return self.latencies[kind]
+
+    async def call(self, fn: Callable[[float], Awaitable[T]], kind: str = "default",
+                   pace: Optional[Callable[[], AsyncContextManager]] = None) -> T:
+        latency = self.latency(kind)
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                if not self.budget.can_retry():
+                    break
+                metrics.UPSTREAM_RETRIES.labels(self.name).inc()
+                # "Full jitter": espera aleatória até o teto exponencial
+                await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+            if not self.breaker.allow():
+                metrics.UPSTREAM_REQUESTS.labels(self.name, "rejected").inc()
+                raise CircuitOpenError(f"{self.name}: circuito aberto") from last_error
+
+            # A sonda do meio-aberto usa o timeout cheio para medir o serviço de verdade
+            timeout = self.max_timeout if self.breaker.probing else latency.timeout()
+            metrics.UPSTREAM_TIMEOUT.labels(self.name).set(timeout)
+            try:
+                if self.hedge and not self.breaker.probing and latency.hedge_delay() is not None:
+                    return await self._hedged(fn, timeout, latency, pace)
+                return await self._attempt(fn, timeout, latency, pace)
+            except Exception as e:
+                last_error = e
+                if _is_client_error(e):
+                    raise
+                logger.warning(f"{self.name}: tentativa {attempt + 1} falhou ({type(e).__name__}: {e})")
+
+        raise UpstreamError(
+            f"{self.name}: falhou após as tentativas ({type(last_error).__name__}: {last_error})") from last_error
+
+    async def _attempt(self, fn: Callable[[float], Awaitable[T]], timeout: float, latency: LatencyEstimator,
+                       pace: Optional[Callable[[], AsyncContextManager]] = None) -> T:
+        probe = self.breaker.probing
+        try:
+            async with pace() if pace else contextlib.nullcontext():
+                start = time.perf_counter()
+                with metrics.observe_upstream(self.name):
+                    result = await asyncio.wait_for(fn(timeout), timeout)
+        except asyncio.CancelledError:
+            # Cancelada (pipeline TTS, modo incremental): nada foi medido, mas a
+            # vaga da sonda precisa voltar, senão o circuito fica meio-aberto para sempre
+            if probe:
+                self.breaker.release_probe()
+            raise
+        except asyncio.TimeoutError:
+            # Conta a espera inteira, para o timeout voltar a crescer se o serviço ficou lento
+            latency.observe(timeout)
+            self._record_failure()
+            raise
+        except Exception as e:
+            if _is_client_error(e):
+                self.breaker.record_success()  # o serviço respondeu; o pedido é que foi recusado
+            else:
+                self._record_failure()
+            raise
+        latency.observe(time.perf_counter() - start)
+        self.breaker.record_success()
+        self.budget.on_success()
+        return result
+
+    def _record_failure(self):
+        self.breaker.record_failure()
+        self.budget.on_failure()
+
+    async def _hedged(self, fn: Callable[[float], Awaitable[T]], timeout: float, latency: LatencyEstimator,
+                      pace: Optional[Callable[[], AsyncContextManager]] = None) -> T:
+        first = asyncio.ensure_future(self._attempt(fn, timeout, latency, pace))
+        done, _ = await asyncio.wait({first}, timeout=latency.hedge_delay())
+        if done:
+            return first.result()
+
+        metrics.UPSTREAM_HEDGES.labels(self.name).inc()
+        pending = {first, asyncio.ensure_future(self._attempt(fn, timeout, latency, pace))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def status(self) -> Dict:
+        return {
+            "circuit":   self.breaker.state,
+            "failures":  self.breaker.failures,
+            "timeout_s": {kind: round(e.timeout(), 3) for kind, e in self.latencies.items()},
+            "latency_s": {kind: round(e.srtt, 3) for kind, e in self.latencies.items() if e.srtt is not None},
+            "retry_tokens": round(self.budget.tokens, 2),
+            "hedge":     self.hedge,
+        }
+
+
+# Limites por serviço. ElevenLabs não repete: com o gTTS de reserva, falhar
+# rápido é melhor que insistir (e cada tentativa consome créditos).
+UPSTREAM_DEFAULTS = {
+    "gnews":      {"min_timeout": 2.0,  "max_timeout": 15.0, "retries": 2},
+    "groq":       {"min_timeout": 10.0, "max_timeout": 60.0, "retries": 1},
+    "elevenlabs": {"min_timeout": 15.0, "max_timeout": 60.0, "retries": 0, "failure_threshold": 3},
+}
+
+_clients: Dict[str, UpstreamClient] = {}
+
+
+def get_upstream(name: str) -> UpstreamClient:
+    """Cliente compartilhado por serviço — o estado do circuito vale para o processo todo."""
+    if name not in _clients:
+        _clients[name] = UpstreamClient(name, hedge=name in UPSTREAM_HEDGING, **UPSTREAM_DEFAULTS.get(
+            name, {"min_timeout": 5.0, "max_timeout": 30.0}))
+    return _clients[name]
+
+
+def upstream_status() -> Dict[str, Dict]:
+    return {name: client.status() for name, client in _clients.items()}
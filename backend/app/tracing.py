@@ -0,0 +1,72 @@
+import logging
+import os
+import sys
+
+from opentelemetry import trace
+from opentelemetry.propagate import extract
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+# Destino dos spans: "none" (padrão), "console" ou "arquivo"
+TRACING_EXPORTADOR = os.getenv("TRACING_EXPORTADOR", "none")
+TRACING_ARQUIVO = os.getenv("TRACING_ARQUIVO", "/app/data/traces.jsonl")
+
+tracer = trace.get_tracer("boletim.api")
+
+
+def configurar_tracing(nome_servico: str, arquivo: str = TRACING_ARQUIVO):
+    """
+    Registra um TracerProvider do OpenTelemetry que exporta os spans
+    para o console (stderr) ou para o arquivo JSON Lines `arquivo`.
+    Sem o opentelemetry-sdk instalado, os spans continuam no-op.
+    Também usado pelos processos do host, via telemetria.py.
+    """
+    if TRACING_EXPORTADOR == "none":
+        return
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("opentelemetry-sdk não instalado. Tracing desativado.")
+        return
+
+    if TRACING_EXPORTADOR == "arquivo":
+        saida = open(arquivo, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(
+            out=saida,
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    else:
+        # stdout é o canal JSON-RPC do servidor MCP em modo stdio
+        exporter = ConsoleSpanExporter(out=sys.stderr)
+
+    provider = TracerProvider(resource=Resource.create({"service.name": nome_servico}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"✓ Tracing ativo ({TRACING_EXPORTADOR}) para '{nome_servico}'")
+
+
+async def tracing_middleware(request, call_next):
+    """
+    Abre um span SERVER por requisição, continuando o trace recebido
+    no header W3C 'traceparent' (enviado pelo servidor MCP).
+    """
+    contexto = extract(request.headers)
+    nome = f"{request.method} {request.url.path}"
+    with tracer.start_as_current_span(nome, context=contexto, kind=SpanKind.SERVER) as span:
+        span.set_attribute("http.request.method", request.method)
+        span.set_attribute("url.path", request.url.path)
+        response = await call_next(request)
+
+        # Usa o template da rota (/api/historico/{boletim_id}) quando disponível
+        rota = request.scope.get("route")
+        if rota is not None and getattr(rota, "path", None):
+            span.update_name(f"{request.method} {rota.path}")
+            span.set_attribute("http.route", rota.path)
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+        return response
@@ -0,0 +1,163 @@
+"""
+Worker de geração — roda fora da API: `python -m worker` (no diretório do app).
+
+Reivindica tarefas da fila (JOB_QUEUE_BACKEND), executa coleta → resumo → TTS
+com os mesmos serviços da API e grava o resultado (ou o erro) de volta na
+tarefa. Vários workers, em containers ou máquinas diferentes, podem consumir a
+mesma fila. A API só enfileira com JOB_QUEUE_ENABLED=1.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+import main
+import metrics
+from config_sync import config_sync
+from database import init_db
+from services import priority
+from services.job_queue import get_job_queue
+from settings import JOB_LEASE_S, JOB_POLL_S, JOB_RETENTION_HOURS, WORKER_CONCURRENCY
+
+logger = logging.getLogger("worker")
+
+# Porta do /metrics do worker (0 = não expõe)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+
+class GenerationWorker:
+    """
+    Executa até `concurrency` tarefas ao mesmo tempo. Enquanto elas rodam, o
+    heartbeat é renovado a cada terço de JOB_LEASE_S; tarefas de workers que
+    sumiram voltam à fila. Ao receber SIGTERM/SIGINT, para de reivindicar e
+    termina as que já começou.
+    """
+
+    def __init__(self, concurrency: int = WORKER_CONCURRENCY, name: Optional[str] = None):
+        self.concurrency = max(1, concurrency)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.queue = get_job_queue()
+        self.running: Dict[int, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+
+    def stop(self):
+        if not self._stopping.is_set():
+            logger.info(f"Encerrando: aguardando {len(self.running)} tarefa(s) em andamento")
+        self._stopping.set()
+        self._wakeup.set()
+
+    async def run(self, once: bool = False):
+        await config_sync.start()
+        housekeeping = asyncio.create_task(self._housekeeping())
+        logger.info(f"✓ Worker '{self.name}' pronto ({self.concurrency} tarefa(s) por vez)")
+        try:
+            while not self._stopping.is_set():
+                await config_sync.check()
+                claimed = await self._fill()
+                if once and not claimed and not self.running:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+            if self.running:
+                await asyncio.gather(*self.running.values(), return_exceptions=True)
+        finally:
+            housekeeping.cancel()
+
+    async def _fill(self) -> int:
+        """Reivindica tarefas até ocupar todas as vagas; devolve quantas pegou."""
+        claimed = 0
+        while len(self.running) < self.concurrency and not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(self.name)
+            except Exception as e:
+                logger.error(f"✗ Erro ao consultar a fila: {e}")
+                break
+            if job is None:
+                break
+            claimed += 1
+            task = asyncio.create_task(self._execute(job))
+            self.running[job["id"]] = task
+            task.add_done_callback(lambda _, job_id=job["id"]: self._done(job_id))
+        return claimed
+
+    def _done(self, job_id: int):
+        self.running.pop(job_id, None)
+        self._wakeup.set()  # vaga livre: busca a próxima sem esperar o intervalo
+
+    async def _execute(self, job: Dict):
+        kind = job["kind"]
+        logger.info(f"Tarefa {job['id']} ({kind}, tentativa {job['attempts']}) iniciada")
+        start = time.perf_counter()
+        try:
+            # A faixa do pedido original vale aqui também (lotes e agendamentos = fundo)
+            with priority.in_lane(job["lane"]):
+                result = await main.execute_job(kind, job["payload"])
+        except HTTPException as e:
+            await self._record(self.queue.fail(job["id"], str(e.detail), e.status_code))
+            metrics.JOBS.labels(kind, "failed").inc()
+            logger.error(f"✗ Tarefa {job['id']} falhou: {e.detail}")
+            return
+        except Exception as e:
+            await self._record(self.queue.fail(job["id"], str(e)))
+            metrics.JOBS.labels(kind, "failed").inc()
+            logger.error(f"✗ Tarefa {job['id']} falhou: {e}")
+            return
+        await self._record(self.queue.complete(job["id"], result))
+        metrics.JOBS.labels(kind, "done").inc()
+        logger.info(f"✓ Tarefa {job['id']} concluída em {time.perf_counter() - start:.1f}s")
+
+    @staticmethod
+    async def _record(update):
+        try:
+            await update
+        except Exception as e:
+            # Sem o registro, a tarefa volta à fila quando o heartbeat vencer
+            logger.error(f"✗ Não foi possível gravar o resultado da tarefa: {e}")
+
+    async def _housekeeping(self):
+        interval = JOB_LEASE_S / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.queue.heartbeat(list(self.running))
+                now = datetime.utcnow()
+                await self.queue.requeue_stale(now - timedelta(seconds=JOB_LEASE_S))
+                await self.queue.purge(now - timedelta(hours=JOB_RETENTION_HOURS))
+            except Exception as e:
+                logger.warning(f"⚠️ Manutenção da fila falhou: {e}")
+
+
+async def _main(args):
+    init_db()
+    worker = GenerationWorker(args.concorrencia)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:  # Windows
+            pass
+    await worker.run(once=args.uma_vez)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker da fila de geração de boletins")
+    parser.add_argument("--concorrencia", type=int, default=WORKER_CONCURRENCY,
+                        help="tarefas executadas ao mesmo tempo (padrão: WORKER_CONCURRENCY)")
+    parser.add_argument("--uma-vez", action="store_true",
+                        help="sai quando a fila esvaziar (útil em jobs/cron)")
+    args = parser.parse_args()
+    if WORKER_METRICS_PORT:
+        from prometheus_client import start_http_server
+        start_http_server(WORKER_METRICS_PORT)
+    asyncio.run(_main(args))
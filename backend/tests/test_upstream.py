@@ -0,0 +1,262 @@
+"""
+Testes das máquinas de estado de services/upstream.py: circuit breaker,
+devolução da sonda cancelada, orçamento de repetições, cancelamento da cópia
+"hedged" e ritmo por tentativa. Sem dependências além da biblioteca padrão:
+
+    python -m unittest discover -s backend/tests
+"""
+import asyncio
+import contextlib
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from services import upstream  # noqa: E402
+from services.upstream import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    UpstreamClient,
+    UpstreamError,
+)
+
+
+class Relogio:
+    """time.monotonic controlado pelo teste."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.relogio = Relogio()
+        patcher = mock.patch.object(upstream.time, "monotonic", self.relogio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("teste", failure_threshold=3, reset_timeout=30.0)
+
+    def _abrir(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_abre_apos_falhas_seguidas(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_sucesso_zera_a_contagem(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_fechado_aberto_meio_aberto_fechado(self):
+        self._abrir()
+        self.relogio.agora += 29
+        self.assertFalse(self.breaker.allow())
+
+        self.relogio.agora += 2
+        self.assertTrue(self.breaker.allow())  # a sonda
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.probing)
+        self.assertFalse(self.breaker.allow())  # só uma sonda por vez
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_sonda_que_falha_reabre(self):
+        self._abrir()
+        self.relogio.agora += 31
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.relogio.agora += 31
+        self.assertTrue(self.breaker.allow())
+
+    def test_release_probe_libera_nova_sonda(self):
+        self._abrir()
+        self.relogio.agora += 31
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.release_probe()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+
+class RetryBudgetTest(unittest.TestCase):
+    def test_esgota_com_falhas_e_recupera_com_sucessos(self):
+        budget = RetryBudget(max_tokens=10.0, token_ratio=0.5)
+        for _ in range(4):
+            budget.on_failure()
+        self.assertTrue(budget.can_retry())
+        budget.on_failure()
+        self.assertFalse(budget.can_retry())  # 5 fichas: não passa da metade
+
+        budget.on_success()
+        self.assertTrue(budget.can_retry())
+
+    def test_fichas_ficam_entre_zero_e_o_maximo(self):
+        budget = RetryBudget(max_tokens=2.0)
+        for _ in range(5):
+            budget.on_failure()
+        self.assertEqual(budget.tokens, 0.0)
+        for _ in range(100):
+            budget.on_success()
+        self.assertEqual(budget.tokens, 2.0)
+
+
+class Falha(Exception):
+    """Erro de servidor (5xx): conta para o circuito e permite repetir."""
+
+
+class UpstreamClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Sem espera de backoff nos testes
+        patcher = mock.patch.object(upstream.random, "uniform", lambda a, b: 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_sonda_cancelada_devolve_a_vaga(self):
+        client = UpstreamClient("teste", 0.01, 5.0, retries=0, failure_threshold=1, reset_timeout=0.0)
+
+        async def falhar(timeout):
+            raise Falha("503")
+
+        with self.assertRaises(UpstreamError):
+            await client.call(falhar)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+        iniciada = asyncio.Event()
+
+        async def pendurar(timeout):
+            iniciada.set()
+            await asyncio.sleep(60)
+
+        sonda = asyncio.create_task(client.call(pendurar))
+        await iniciada.wait()
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        sonda.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await sonda
+
+        async def responder(timeout):
+            return "ok"
+
+        self.assertEqual(await client.call(responder), "ok")
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_orcamento_esgotado_para_as_repeticoes(self):
+        client = UpstreamClient("teste", 0.01, 5.0, retries=3, failure_threshold=100)
+        tentativas = 0
+
+        async def falhar(timeout):
+            nonlocal tentativas
+            tentativas += 1
+            raise Falha("503")
+
+        with self.assertRaises(UpstreamError):
+            await client.call(falhar)
+        self.assertEqual(tentativas, 4)  # 1 + 3 repetições, orçamento cheio
+
+        # Restam 6 fichas: a primeira falha leva a 5 (metade) e não há repetição
+        tentativas = 0
+        with self.assertRaises(UpstreamError):
+            await client.call(falhar)
+        self.assertEqual(tentativas, 1)
+        self.assertFalse(client.budget.can_retry())
+
+    async def test_circuito_aberto_recusa_sem_chamar(self):
+        client = UpstreamClient("teste", 0.01, 5.0, retries=0, failure_threshold=1, reset_timeout=60.0)
+
+        async def falhar(timeout):
+            raise Falha("503")
+
+        with self.assertRaises(UpstreamError):
+            await client.call(falhar)
+        chamado = False
+
+        async def responder(timeout):
+            nonlocal chamado
+            chamado = True
+
+        with self.assertRaises(CircuitOpenError):
+            await client.call(responder)
+        self.assertFalse(chamado)
+
+    async def test_copia_hedged_cancela_a_original(self):
+        client = UpstreamClient("teste", 0.5, 5.0, retries=0, hedge=True)
+        for _ in range(5):
+            client.latency().observe(0.01)  # hedge_delay ≈ 10 ms
+        chamadas = 0
+        original_cancelada = asyncio.Event()
+
+        async def lenta_depois_rapida(timeout):
+            nonlocal chamadas
+            chamadas += 1
+            if chamadas == 1:
+                try:
+                    await asyncio.sleep(60)
+                except asyncio.CancelledError:
+                    original_cancelada.set()
+                    raise
+            return "cópia"
+
+        resultado = await asyncio.wait_for(client.call(lenta_depois_rapida), 2)
+        self.assertEqual(resultado, "cópia")
+        self.assertEqual(chamadas, 2)
+        await asyncio.wait_for(original_cancelada.wait(), 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_timeout_aprendido_por_classe(self):
+        client = UpstreamClient("teste", 0.05, 2.0, retries=0)
+
+        async def responder(timeout):
+            return timeout
+
+        for _ in range(5):
+            client.latency("article").observe(0.01)
+        self.assertEqual(await client.call(responder, kind="article"), 0.05)
+        self.assertEqual(await client.call(responder, kind="bulletin"), 2.0)  # sem amostras: o máximo
+
+    async def test_ritmo_vale_para_cada_tentativa(self):
+        client = UpstreamClient("teste", 0.5, 5.0, retries=2)
+        vagas = 0
+
+        @contextlib.asynccontextmanager
+        async def ritmo():
+            nonlocal vagas
+            vagas += 1
+            await asyncio.sleep(0.6)  # espera pelo token bucket: fora do timeout da tentativa
+            yield
+
+        tentativas = 0
+
+        async def falhar_uma_vez(timeout):
+            nonlocal tentativas
+            tentativas += 1
+            if tentativas == 1:
+                raise Falha("503")
+            return "ok"
+
+        self.assertEqual(await client.call(falhar_uma_vez, pace=ritmo), "ok")
+        self.assertEqual((tentativas, vagas), (2, 2))
+        self.assertLess(client.latency().srtt, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,6 @@
+"""
+Benchmarks do Boletim de Notícias.
+
+Cada módulo é executável com `python -m benchmarks.<modulo>` a partir da
+raiz do repositório e imprime os resultados em JSON.
+"""
@@ -0,0 +1,327 @@
+"""
+Teste de carga do caminho de chat do locutor (POST /chat).
+
+Reproduz conversas gravadas em português (benchmarks/conversas/*.json) contra
+o app do interface_locutor.py, com vários usuários simultâneos. O LLM é o stub
+do Groq respondendo com as chamadas de tool roteirizadas de cada turno; o MCP
+roda em memória e o backend no mesmo processo, com GNews/gTTS/ElevenLabs nos
+stubs locais.
+
+Relata vazão, latência de cauda do /chat, latência das chamadas MCP por tool e
+o atraso do event loop. Com --max-p95-ms, --max-atraso-loop-ms ou
+--min-vazao, termina com código 1 quando algum limite é violado (uso em CI).
+
+Formato de uma conversa gravada:
+  {"nome": "...", "turnos": [
+     {"pergunta": "...", "roteiro": [{"tool": "listar_historico", "args": {...}}],
+      "resposta": "..."}]}
+  Nos args, "$campo" é substituído pelo campo do resultado da tool anterior
+  (ex.: "$audio" para o filename devolvido por gerar_boletim).
+
+Uso:
+  uv run python -m benchmarks.carga_locutor --usuarios 8 --iteracoes 3
+  uv run python -m benchmarks.carga_locutor --historico-inicial 40 --latencia-llm-ms 3000
+  uv run python -m benchmarks.carga_locutor --max-p95-ms 2500 --saida resultados/carga.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+from benchmarks.cenarios import _porta_livre, carregar_backend, preparar_ambiente
+from benchmarks.medicao import RAIZ, metadados, resumo
+from benchmarks.stubs import ConfigStubs, ServidorStubs
+
+DIR_CONVERSAS = Path(__file__).parent / "conversas"
+
+
+def carregar_conversas(diretorio: Path, nomes: str = None) -> list:
+    conversas = [json.loads(p.read_text(encoding="utf-8")) for p in sorted(diretorio.glob("*.json"))]
+    if nomes:
+        escolhidas = set(nomes.split(","))
+        conversas = [c for c in conversas if c["nome"] in escolhidas]
+    if not conversas:
+        raise SystemExit(f"Nenhuma conversa gravada encontrada em {diretorio}")
+    return conversas
+
+
+# ================================================================
+# LLM ROTEIRIZADO
+# ================================================================
+
+class RoteiroConversas:
+    """
+    Responde ao stub do Groq seguindo o roteiro do turno atual: localiza o turno
+    pela última mensagem do usuário e conta quantas tools já rodaram desde ela.
+    """
+
+    def __init__(self, conversas: list):
+        self.turnos = {t["pergunta"]: t for c in conversas for t in c["turnos"]}
+        self.desconhecidas = 0
+
+    def __call__(self, payload: dict) -> dict:
+        mensagens = payload.get("messages", [])
+        ultima_pergunta = max(i for i, m in enumerate(mensagens) if m.get("role") == "user")
+        turno = self.turnos.get(mensagens[ultima_pergunta].get("content"))
+        if turno is None:
+            self.desconhecidas += 1
+            return {"role": "assistant", "content": "Não entendi a pergunta."}
+
+        resultados = [m for m in mensagens[ultima_pergunta:] if m.get("role") == "tool"]
+        passo = len(resultados)
+        if passo >= len(turno["roteiro"]):
+            return {"role": "assistant", "content": turno["resposta"]}
+
+        chamada = turno["roteiro"][passo]
+        anterior = _json_ou_vazio(resultados[-1].get("content")) if resultados else {}
+        args = {
+            k: anterior.get(v[1:], v) if isinstance(v, str) and v.startswith("$") else v
+            for k, v in chamada.get("args", {}).items()
+        }
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_carga_{passo}",
+                "type": "function",
+                "function": {"name": chamada["tool"], "arguments": json.dumps(args, ensure_ascii=False)},
+            }],
+        }
+
+
+def _json_ou_vazio(texto) -> dict:
+    try:
+        dados = json.loads(texto or "")
+        return dados if isinstance(dados, dict) else {}
+    except (TypeError, ValueError):
+        return {}
+
+
+# ================================================================
+# MEDIÇÕES
+# ================================================================
+
+async def medir_atraso_loop(amostras: list, parar: asyncio.Event, intervalo: float = 0.01):
+    """Acorda a cada `intervalo` segundos e registra o quanto acordou atrasado (ms)."""
+    while not parar.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        amostras.append(max(0.0, (time.perf_counter() - t0 - intervalo) * 1000))
+
+
+def _historico_sintetico(turnos: int) -> list:
+    historico = []
+    for i in range(turnos):
+        historico += [
+            {"role": "user", "content": f"pergunta anterior número {i + 1} sobre o boletim de hoje"},
+            {"role": "assistant", "content": f"Resposta anterior {i + 1}: " + "informação do boletim. " * 10},
+        ]
+    return historico
+
+
+def _semear_historico(quantidade: int):
+    from database import engine, Boletim
+    with engine.begin() as conn:
+        conn.execute(Boletim.__table__.insert(), [
+            {"summary_text": f"Boletim de carga {i}. " * 20,
+             "audio_filename": f"boletim_carga_{i}.mp3",
+             "categories": "geral"}
+            for i in range(quantidade)
+        ])
+
+
+class _ServidorBackend:
+    """Backend servido por HTTP — só necessário para a consulta de versão do cache de respostas."""
+
+    def __init__(self, app, porta: int):
+        self.porta   = porta
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        prazo = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > prazo:
+                raise RuntimeError(f"Backend não subiu na porta {self.porta}")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+# ================================================================
+# EXECUÇÃO
+# ================================================================
+
+async def _usuario(indice: int, cliente: httpx.AsyncClient, conversas: list, args, registros: list):
+    await asyncio.sleep(args.rampa_s * indice / max(1, args.usuarios))
+    for iteracao in range(args.iteracoes):
+        conversa = conversas[(indice + iteracao) % len(conversas)]
+        historico = _historico_sintetico(args.historico_inicial)
+        for turno in conversa["turnos"]:
+            t0 = time.perf_counter()
+            try:
+                r = await cliente.post("/chat", json={"pergunta": turno["pergunta"], "historico": historico},
+                                       timeout=args.timeout_s)
+                resposta = r.json().get("resposta", "") if r.status_code == 200 else ""
+                erro = r.status_code != 200
+            except Exception as e:
+                resposta, erro = repr(e), True
+            ms = (time.perf_counter() - t0) * 1000
+            registros.append({
+                "conversa": conversa["nome"],
+                "ms":       ms,
+                "erro":     erro,
+                "esperada": resposta == turno["resposta"],
+            })
+            historico += [{"role": "user", "content": turno["pergunta"]},
+                          {"role": "assistant", "content": resposta}]
+
+
+async def executar(args) -> dict:
+    config = ConfigStubs()
+    if args.stubs_config:
+        with open(args.stubs_config, encoding="utf-8") as f:
+            config = ConfigStubs.de_dict(json.load(f))
+    if args.latencia_llm_ms is not None:
+        config.servicos["groq"].latencia_ms = args.latencia_llm_ms
+
+    conversas = carregar_conversas(Path(args.conversas), args.nomes)
+    roteiro   = RoteiroConversas(conversas)
+    diretorio = Path(args.diretorio or tempfile.mkdtemp(prefix="boletim-carga-"))
+
+    with ServidorStubs(config, porta=args.porta_stubs or _porta_livre()) as stubs:
+        preparar_ambiente(diretorio, stubs)
+        porta_backend = _porta_livre()
+        os.environ["BOLETIM_API_URL"]     = f"http://127.0.0.1:{porta_backend}"
+        os.environ["CACHE_RESPOSTAS_TTL"] = os.environ.get("CACHE_RESPOSTAS_TTL", "300") if args.com_cache else "0"
+        os.environ["MCP_POOL_TAMANHO"]    = str(args.pool_mcp)
+
+        backend = carregar_backend()
+        _semear_historico(args.boletins_iniciais)
+        if str(RAIZ) not in sys.path:
+            sys.path.insert(0, str(RAIZ))
+        import interface_locutor
+
+        stubs.app.state.roteiro_llm = roteiro
+        servidor_backend = _ServidorBackend(backend.app, porta_backend) if args.com_cache else None
+        if servidor_backend:
+            servidor_backend.__enter__()
+        await interface_locutor.sessao.iniciar()
+        if args.monitor_loop:
+            await interface_locutor.monitor_loop.start()
+
+        registros, atrasos, parar = [], [], asyncio.Event()
+        monitor = asyncio.create_task(medir_atraso_loop(atrasos, parar))
+        try:
+            transporte = httpx.ASGITransport(app=interface_locutor.app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://locutor") as cliente:
+                t0 = time.perf_counter()
+                await asyncio.gather(*(
+                    _usuario(i, cliente, conversas, args, registros) for i in range(args.usuarios)
+                ))
+                total_s = time.perf_counter() - t0
+        finally:
+            parar.set()
+            await monitor
+            await interface_locutor.sessao.encerrar()
+            await interface_locutor.monitor_loop.stop()
+            stubs.app.state.roteiro_llm = None
+            if servidor_backend:
+                servidor_backend.__exit__()
+
+        por_conversa = {}
+        for reg in registros:
+            por_conversa.setdefault(reg["conversa"], []).append(reg["ms"])
+
+        saida = {
+            "benchmark":  "carga_locutor",
+            **metadados(),
+            "parametros": {k: v for k, v in vars(args).items() if k != "saida"},
+            "stubs":      config.para_dict(),
+            "resultado": {
+                "requisicoes":          len(registros),
+                "tempo_total_s":        round(total_s, 3),
+                "vazao_req_s":          round(len(registros) / total_s, 3) if total_s else 0,
+                "erros":                sum(r["erro"] for r in registros),
+                "respostas_inesperadas": sum(not r["esperada"] for r in registros),
+                "perguntas_fora_roteiro": roteiro.desconhecidas,
+                "latencia_chat":        resumo([r["ms"] for r in registros]),
+                "latencia_por_conversa": {nome: resumo(ms) for nome, ms in por_conversa.items()},
+                "latencia_tools_mcp":   interface_locutor.sessao.latencias_tools(),
+                "atraso_loop":          resumo(atrasos),
+                "cache_respostas":      interface_locutor.cache_respostas.estatisticas(),
+                "bloqueios_loop":       interface_locutor.monitor_loop.report()["ofensores"],
+            },
+            "chamadas_stubs": stubs.contadores.dados,
+        }
+    saida["violacoes"] = verificar_limites(saida["resultado"], args)
+    return saida
+
+
+def verificar_limites(resultado: dict, args) -> list:
+    violacoes = []
+    p95 = resultado["latencia_chat"].get("p95_ms", 0)
+    if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+        violacoes.append(f"p95 do /chat {p95} ms > {args.max_p95_ms} ms")
+    atraso = resultado["atraso_loop"].get("p99_ms", 0)
+    if args.max_atraso_loop_ms is not None and atraso > args.max_atraso_loop_ms:
+        violacoes.append(f"p99 do atraso do event loop {atraso} ms > {args.max_atraso_loop_ms} ms")
+    if args.min_vazao is not None and resultado["vazao_req_s"] < args.min_vazao:
+        violacoes.append(f"vazão {resultado['vazao_req_s']} req/s < {args.min_vazao} req/s")
+    if resultado["erros"]:
+        violacoes.append(f"{resultado['erros']} requisições com erro")
+    return violacoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=4, help="Usuários simultâneos")
+    parser.add_argument("--iteracoes", type=int, default=2, help="Conversas reproduzidas por usuário")
+    parser.add_argument("--rampa-s", type=float, default=0.0, help="Tempo para todos os usuários começarem")
+    parser.add_argument("--conversas", default=str(DIR_CONVERSAS), help="Diretório das conversas gravadas")
+    parser.add_argument("--nomes", help="Conversas a usar, separadas por vírgula (padrão: todas)")
+    parser.add_argument("--historico-inicial", type=int, default=0, help="Turnos sintéticos antes de cada conversa")
+    parser.add_argument("--latencia-llm-ms", type=float, help="Sobrescreve a latência do stub do Groq")
+    parser.add_argument("--boletins-iniciais", type=int, default=20, help="Boletins gravados antes da carga")
+    parser.add_argument("--pool-mcp", type=int, default=2, help="Sessões MCP do locutor (MCP_POOL_TAMANHO)")
+    parser.add_argument("--monitor-loop", action="store_true",
+                        help="Liga o monitor de bloqueios e relata os trechos que travaram o loop")
+    parser.add_argument("--com-cache", action="store_true", help="Mantém o cache de respostas ligado")
+    parser.add_argument("--timeout-s", type=float, default=300)
+    parser.add_argument("--max-p95-ms", type=float, help="Falha se o p95 do /chat passar disto")
+    parser.add_argument("--max-atraso-loop-ms", type=float, help="Falha se o p99 do atraso do loop passar disto")
+    parser.add_argument("--min-vazao", type=float, help="Falha se a vazão (req/s) ficar abaixo disto")
+    parser.add_argument("--stubs-config", help="JSON de configuração dos stubs (ver benchmarks.stubs)")
+    parser.add_argument("--porta-stubs", type=int)
+    parser.add_argument("--diretorio", help="Diretório para banco e áudios (padrão: temporário)")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.saida).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+    if resultado["violacoes"]:
+        for v in resultado["violacoes"]:
+            print(f"✗ {v}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
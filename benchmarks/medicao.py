@@ -0,0 +1,45 @@
+"""Utilitários comuns dos benchmarks: estatísticas de latência e metadados da execução."""
+
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def resumo(amostras_ms: list) -> dict:
+    """Estatísticas de uma lista de latências em milissegundos."""
+    if not amostras_ms:
+        return {"n": 0}
+    ordenadas = sorted(amostras_ms)
+
+    def pct(p):
+        return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))], 3)
+
+    return {
+        "n":        len(ordenadas),
+        "media_ms": round(statistics.fmean(ordenadas), 3),
+        "p50_ms":   pct(0.50),
+        "p95_ms":   pct(0.95),
+        "p99_ms":   pct(0.99),
+        "max_ms":   round(ordenadas[-1], 3),
+    }
+
+
+def metadados() -> dict:
+    """Identifica a execução para comparar resultados entre commits."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=RAIZ,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit":    commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python":    platform.python_version(),
+        "maquina":   platform.machine(),
+    }
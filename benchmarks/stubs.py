@@ -0,0 +1,386 @@
+"""
+Stubs locais dos serviços externos: GNews, Groq (API compatível com OpenAI),
+ElevenLabs e Google TTS (gTTS), mais as páginas HTML das notícias (usadas
+pela etapa de enriquecimento — as URLs das notícias apontam para o próprio stub)
+e feeds RSS por categoria (/feeds/<categoria>.xml, com ETag e 304), além de
+um armazenamento de objetos compatível com S3 (/s3/<bucket>/<chave>, em
+memória e sem conferir assinaturas) no lugar de um MinIO.
+
+Um único servidor atende os serviços em prefixos separados; aponte o
+sistema para ele com as URLs base:
+
+  GNEWS_BASE_URL      = http://127.0.0.1:9100/gnews/api/v4
+  GROQ_BASE_URL       = http://127.0.0.1:9100/groq
+  ELEVENLABS_BASE_URL = http://127.0.0.1:9100/elevenlabs
+  GTTS_BASE_URL       = http://127.0.0.1:9100/gtts
+  S3_ENDPOINT_URL     = http://127.0.0.1:9100/s3   (com AUDIO_STORAGE=s3)
+
+Latência, taxa de erro e tamanho das respostas são configuráveis por serviço.
+
+Uso avulso:
+  uv run python -m benchmarks.stubs --porta 9100 --latencia-ms 80 --taxa-erro 0.05
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import formatdate
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+SERVICOS = ("gnews", "groq", "elevenlabs", "gtts", "artigos", "feeds", "objetos")
+
+# Quadro MPEG-1 Layer III, 128 kbps, 44.1 kHz (417 bytes) — áudio válido e silencioso
+_CABECALHO_MP3 = bytes([0xFF, 0xFB, 0x90, 0x64])
+_QUADRO_MP3    = _CABECALHO_MP3 + bytes(417 - len(_CABECALHO_MP3))
+
+
+def mp3_silencioso(tamanho_bytes: int) -> bytes:
+    quadros = max(1, tamanho_bytes // len(_QUADRO_MP3))
+    return _QUADRO_MP3 * quadros
+
+
+@dataclass
+class ConfigServico:
+    latencia_ms: float = 50.0
+    jitter_ms:   float = 0.0
+    taxa_erro:   float = 0.0
+    # GNews: artigos por resposta | Groq: palavras por parágrafo | TTS: bytes de áudio
+    # | artigos: bytes da página HTML | feeds: itens por feed
+    tamanho:     int   = 0
+
+
+@dataclass
+class ConfigStubs:
+    semente:  int = 42
+    servicos: dict = field(default_factory=lambda: {
+        "gnews":      ConfigServico(latencia_ms=120, tamanho=10),
+        "groq":       ConfigServico(latencia_ms=900, tamanho=40),
+        "elevenlabs": ConfigServico(latencia_ms=1500, tamanho=256 * 1024),
+        "gtts":       ConfigServico(latencia_ms=150, tamanho=16 * 1024),
+        "artigos":    ConfigServico(latencia_ms=200, tamanho=60 * 1024),
+        "feeds":      ConfigServico(latencia_ms=80, tamanho=20),
+        "objetos":    ConfigServico(latencia_ms=10),
+    })
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "ConfigStubs":
+        cfg = cls(semente=dados.get("semente", 42))
+        for nome, valores in (dados.get("servicos") or {}).items():
+            base = cfg.servicos.get(nome, ConfigServico())
+            cfg.servicos[nome] = ConfigServico(**{**base.__dict__, **valores})
+        return cfg
+
+    def para_dict(self) -> dict:
+        return {"semente": self.semente,
+                "servicos": {k: v.__dict__ for k, v in self.servicos.items()}}
+
+
+class Contadores:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.dados = {s: {"chamadas": 0, "erros": 0} for s in SERVICOS}
+
+    def registrar(self, servico: str, erro: bool):
+        with self._lock:
+            self.dados[servico]["chamadas"] += 1
+            if erro:
+                self.dados[servico]["erros"] += 1
+
+
+def criar_app(config: ConfigStubs, contadores: Contadores = None) -> FastAPI:
+    app = FastAPI(title="Stubs do Boletim de Notícias")
+    rnd = random.Random(config.semente)
+    contadores = contadores or Contadores()
+    app.state.contadores = contadores
+    app.state.roteiro_llm = None  # função opcional (payload) -> mensagem, usada pelos testes de carga
+
+    async def _simular(servico: str, fracao: float = 1.0) -> bool:
+        """
+        Aplica latência (ou só `fracao` dela) e decide se a chamada falha.
+        Retorna True em caso de erro.
+        """
+        cfg = config.servicos[servico]
+        atraso = (cfg.latencia_ms + (rnd.uniform(-cfg.jitter_ms, cfg.jitter_ms) if cfg.jitter_ms else 0)) * fracao
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+        erro = rnd.random() < cfg.taxa_erro
+        contadores.registrar(servico, erro)
+        return erro
+
+    # --- GNews ---
+    def _artigos(categoria: str, maximo: int, base_url: str) -> list:
+        total = min(maximo, config.servicos["gnews"].tamanho or maximo)
+        # Como no plano gratuito: manchetes com 12h de atraso
+        agora = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - 12 * 3600))
+        return [
+            {
+                "title":       f"Manchete {i + 1} de {categoria}",
+                "description": f"Resumo da notícia {i + 1} sobre {categoria}, com detalhes para o boletim.",
+                "content":     f"Conteúdo completo da notícia {i + 1}. " * 20,
+                "url":         f"{base_url}artigos/{categoria}/{i + 1}",
+                "publishedAt": agora,
+                "source":      {"name": f"Fonte {i % 4 + 1}", "url": "https://exemplo.com.br"},
+            }
+            for i in range(total)
+        ]
+
+    @app.get("/gnews/api/v4/top-headlines")
+    async def gnews_top(request: Request, category: str = "general", max: int = 10):
+        if await _simular("gnews"):
+            return JSONResponse({"errors": ["stub: erro simulado"]}, status_code=503)
+        artigos = _artigos(category, max, str(request.base_url))
+        return {"totalArticles": len(artigos), "articles": artigos}
+
+    @app.get("/gnews/api/v4/search")
+    async def gnews_search(request: Request, q: str = "", max: int = 10):
+        if await _simular("gnews"):
+            return JSONResponse({"errors": ["stub: erro simulado"]}, status_code=503)
+        artigos = _artigos(q.replace(" ", "-"), max, str(request.base_url))
+        return {"totalArticles": len(artigos), "articles": artigos}
+
+    # --- Páginas das notícias (fixture do enriquecimento) ---
+    @app.get("/artigos/{categoria}/{numero}")
+    async def pagina_artigo(categoria: str, numero: int):
+        if await _simular("artigos"):
+            return PlainTextResponse("stub: erro simulado", status_code=503)
+        # Menu, scripts e rodapé em volta do <article>, como num portal de verdade
+        paragrafo = (f"<p>Parágrafo da notícia {numero} sobre {categoria}: o texto completo traz "
+                     f"contexto, números e declarações que não cabem na descrição do GNews.</p>\n")
+        topo = (f"<html><head><title>Notícia {numero}</title><script>var anuncio = 1;</script></head><body>"
+                f"<nav><p>Menu principal com links para todas as seções do portal de notícias</p></nav>"
+                f"<article><h1>Manchete {numero} de {categoria}</h1>\n")
+        fim = "</article><footer><p>Todos os direitos reservados ao portal de notícias de exemplo.</p></footer></body></html>"
+        repeticoes = max(1, (config.servicos["artigos"].tamanho - len(topo) - len(fim)) // len(paragrafo))
+        return Response(topo + paragrafo * repeticoes + fim, media_type="text/html; charset=utf-8")
+
+    # --- Feeds RSS (um por categoria; o conteúdo não muda, então a ETag também não) ---
+    @app.get("/feeds/{categoria}.xml")
+    async def feed_rss(request: Request, categoria: str):
+        if await _simular("feeds"):
+            return PlainTextResponse("stub: erro simulado", status_code=503)
+        total = config.servicos["feeds"].tamanho or 20
+        etag = f'"{categoria}-{total}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        agora = time.time()
+        itens = "".join(
+            f"<item><title>Feed: manchete {i + 1} de {categoria}</title>"
+            f"<link>{request.base_url}artigos/{categoria}/{100 + i}</link>"
+            f"<description>&lt;p&gt;Resumo do feed para a notícia {i + 1} sobre {categoria}.&lt;/p&gt;</description>"
+            f"<category>{categoria}</category>"
+            f"<pubDate>{formatdate(agora - i * 300, usegmt=True)}</pubDate></item>"
+            for i in range(total)
+        )
+        corpo = (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                 f"<title>Stub {categoria}</title>{itens}</channel></rss>")
+        return Response(corpo, media_type="application/rss+xml; charset=utf-8", headers={"ETag": etag})
+
+    # --- Groq / OpenAI chat completions ---
+    def _texto_boletim(payload: dict) -> str:
+        palavras = config.servicos["groq"].tamanho or 40
+        prompt   = " ".join(str(m.get("content") or "") for m in payload.get("messages", []))
+        noticias = max(1, prompt.count("NOTÍCIA"))
+        corpo    = " ".join(["informação"] * palavras)
+        paragrafos = [f"Manchete {i + 1}. {corpo}." for i in range(noticias)]
+        # Resumo de uma notícia só (sumarização incremental) vem sem abertura
+        cabecalho  = "Boletim de notícias.\n\n" if noticias > 1 else ""
+        return cabecalho + "\n\n".join(paragrafos)
+
+    @app.post("/groq/openai/v1/chat/completions")
+    async def groq_chat(request: Request):
+        payload = await request.json()
+        # Em streaming, 20% da latência vai até o primeiro token e o resto se espalha pelo texto
+        if await _simular("groq", 0.2 if payload.get("stream") else 1.0):
+            return JSONResponse({"error": {"message": "stub: erro simulado"}}, status_code=503)
+
+        roteiro = app.state.roteiro_llm
+        if roteiro is not None and payload.get("tools"):
+            mensagem = roteiro(payload)
+        else:
+            mensagem = {"role": "assistant", "content": _texto_boletim(payload)}
+
+        if payload.get("stream"):
+            return _resposta_stream(payload, mensagem.get("content") or "")
+
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in payload.get("messages", []))
+        return {
+            "id":      "chatcmpl-stub",
+            "object":  "chat.completion",
+            "created": int(time.time()),
+            "model":   payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": mensagem,
+                         "finish_reason": "tool_calls" if mensagem.get("tool_calls") else "stop"}],
+            "usage": {
+                "prompt_tokens":     prompt_chars // 4,
+                "completion_tokens": len(mensagem.get("content") or "") // 4,
+                "total_tokens":      (prompt_chars + len(mensagem.get("content") or "")) // 4,
+            },
+        }
+
+    def _resposta_stream(payload: dict, texto: str) -> Response:
+        blocos = max(1, -(-len(texto) // 24))
+        pausa = max(0.005, config.servicos["groq"].latencia_ms * 0.8 / 1000 / blocos)
+
+        async def eventos():
+            for i in range(0, len(texto), 24):
+                bloco = {
+                    "id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                    "created": int(time.time()), "model": payload.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": texto[i:i + 24]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(bloco, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(pausa)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(eventos(), media_type="text/event-stream")
+
+    # --- Armazenamento de objetos (S3 em estilo path, como o MinIO) ---
+    objetos, envios = {}, {}
+    app.state.objetos = objetos
+
+    @app.api_route("/s3/{bucket}/{chave:path}", methods=["PUT", "POST", "GET", "HEAD", "DELETE"])
+    async def s3_objeto(request: Request, bucket: str, chave: str):
+        if await _simular("objetos"):
+            return Response("<Error><Code>ServiceUnavailable</Code></Error>", status_code=503,
+                            media_type="application/xml")
+        nome, params = f"{bucket}/{chave}", request.query_params
+        # Envio em partes (upload_file de arquivos grandes)
+        if request.method == "POST" and "uploads" in params:
+            envio = f"envio{len(envios) + 1}"
+            envios[envio] = {}
+            return Response(f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{chave}</Key>"
+                            f"<UploadId>{envio}</UploadId></InitiateMultipartUploadResult>",
+                            media_type="application/xml")
+        if request.method == "PUT" and "uploadId" in params:
+            envios[params["uploadId"]][int(params["partNumber"])] = await request.body()
+            return Response(headers={"ETag": f'"parte{params["partNumber"]}"'})
+        if request.method == "POST" and "uploadId" in params:
+            partes = envios.pop(params["uploadId"])
+            objetos[nome] = (b"".join(partes[n] for n in sorted(partes)), "audio/mpeg")
+            return Response(f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{chave}</Key>"
+                            f'<ETag>"{nome}"</ETag></CompleteMultipartUploadResult>', media_type="application/xml")
+        if request.method == "PUT":
+            # Gravação condicional (reserva de nome): só cria se a chave não existir
+            if request.headers.get("if-none-match") == "*" and nome in objetos:
+                return Response("<Error><Code>PreconditionFailed</Code></Error>", status_code=412,
+                                media_type="application/xml")
+            objetos[nome] = (await request.body(), request.headers.get("content-type", "application/octet-stream"))
+            return Response(headers={"ETag": f'"{nome}"'})
+        if request.method == "DELETE":
+            objetos.pop(nome, None)
+            return Response(status_code=204)
+        if nome not in objetos:
+            return Response("<Error><Code>NoSuchKey</Code></Error>", status_code=404, media_type="application/xml")
+        corpo, tipo = objetos[nome]
+        headers = {"ETag": f'"{nome}"', "Content-Length": str(len(corpo))}
+        if "response-content-disposition" in params:
+            headers["Content-Disposition"] = params["response-content-disposition"]
+        return Response(b"" if request.method == "HEAD" else corpo, media_type=tipo, headers=headers)
+
+    # --- ElevenLabs ---
+    @app.post("/elevenlabs/v1/text-to-speech/{voice_id}")
+    async def elevenlabs_tts(voice_id: str):
+        if await _simular("elevenlabs"):
+            return JSONResponse({"detail": "stub: erro simulado"}, status_code=503)
+        return Response(mp3_silencioso(config.servicos["elevenlabs"].tamanho), media_type="audio/mpeg")
+
+    # --- Google TTS (protocolo batchexecute usado pelo gTTS) ---
+    @app.post("/gtts/_/TranslateWebserverUi/data/batchexecute")
+    async def gtts_batchexecute():
+        if await _simular("gtts"):
+            return PlainTextResponse("stub: erro simulado", status_code=503)
+        audio = base64.b64encode(mp3_silencioso(config.servicos["gtts"].tamanho)).decode("ascii")
+        corpo = f')]}}\'\n\n[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null,null,null,"generic"]]\n'
+        return PlainTextResponse(corpo)
+
+    @app.get("/contadores")
+    async def ver_contadores():
+        return contadores.dados
+
+    return app
+
+
+class ServidorStubs:
+    """Roda o app de stubs com uvicorn numa thread, para uso dentro dos benchmarks."""
+
+    def __init__(self, config: ConfigStubs = None, porta: int = 9100):
+        self.config     = config or ConfigStubs()
+        self.porta      = porta
+        self.contadores = Contadores()
+        self.app        = criar_app(self.config, self.contadores)
+        self._server    = None
+        self._thread    = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.porta}"
+
+    def urls_base(self) -> dict:
+        return {
+            "GNEWS_BASE_URL":      f"{self.url}/gnews/api/v4",
+            "GROQ_BASE_URL":       f"{self.url}/groq",
+            "ELEVENLABS_BASE_URL": f"{self.url}/elevenlabs",
+            "GTTS_BASE_URL":       f"{self.url}/gtts",
+            # Só usado com AUDIO_STORAGE=s3
+            "S3_ENDPOINT_URL":     f"{self.url}/s3",
+        }
+
+    def feeds(self, categorias=("geral", "politica", "economia", "tecnologia", "esportes")) -> list:
+        """Lista no formato de NEWS_FEEDS apontando para os feeds do stub."""
+        return [{"name": f"Feed {c}", "url": f"{self.url}/feeds/{c}.xml", "categories": [c]} for c in categorias]
+
+    def iniciar(self):
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.porta, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        prazo = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > prazo:
+                raise RuntimeError(f"Stubs não subiram na porta {self.porta}")
+            time.sleep(0.05)
+        return self
+
+    def parar(self):
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=9100)
+    parser.add_argument("--config", help="JSON com {'semente': N, 'servicos': {nome: {latencia_ms, jitter_ms, taxa_erro, tamanho}}}")
+    parser.add_argument("--latencia-ms", type=float, help="Sobrescreve a latência de todos os serviços")
+    parser.add_argument("--taxa-erro", type=float, help="Sobrescreve a taxa de erro de todos os serviços")
+    args = parser.parse_args()
+
+    config = ConfigStubs()
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = ConfigStubs.de_dict(json.load(f))
+    for cfg in config.servicos.values():
+        if args.latencia_ms is not None:
+            cfg.latencia_ms = args.latencia_ms
+        if args.taxa_erro is not None:
+            cfg.taxa_erro = args.taxa_erro
+
+    uvicorn.run(criar_app(config), host="0.0.0.0", port=args.porta, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Latência por tool MCP em cada transporte: stdio, SSE e em memória.
+
+Uso:
+  uv run python -m benchmarks.transporte_mcp
+  uv run python -m benchmarks.transporte_mcp --modos memoria,stdio --repeticoes 100
+
+O backend precisa estar no ar (BOLETIM_API_URL), ou use
+BOLETIM_API_MODO=direto para que o servidor MCP chame o backend no mesmo processo.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+
+from benchmarks.medicao import RAIZ, metadados, resumo
+
+SERVIDOR_SCRIPT = str(RAIZ / "servidor_mcp.py")
+
+# Tools somente-leitura — seguras para repetir muitas vezes
+TOOLS_PADRAO = ["verificar_api", "listar_historico"]
+
+
+@asynccontextmanager
+async def _servidor_sse(porta: int):
+    """Sobe servidor_mcp.py em modo SSE num subprocesso e aguarda a porta abrir."""
+    env  = {**os.environ, "TRANSPORT": "sse", "PORT": str(porta)}
+    proc = subprocess.Popen(
+        [sys.executable, SERVIDOR_SCRIPT], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        for _ in range(100):
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", porta)
+                writer.close()
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        yield f"http://127.0.0.1:{porta}/sse"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+@asynccontextmanager
+async def _sessao(modo: str, porta_sse: int):
+    if modo == "memoria":
+        sys.path.insert(0, str(RAIZ))
+        from fastmcp.client.transports import FastMCPTransport
+        import servidor_mcp
+        async with FastMCPTransport(servidor_mcp.mcp).connect_session() as session:
+            yield session
+        return
+
+    if modo == "sse":
+        async with _servidor_sse(porta_sse) as url:
+            async with sse_client(url) as (read, write):
+                async with ClientSession(read, write) as session:
+                    yield session
+        return
+
+    params = StdioServerParameters(command=sys.executable, args=[SERVIDOR_SCRIPT])
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            yield session
+
+
+async def medir_modo(modo: str, tools: list, repeticoes: int, porta_sse: int) -> dict:
+    resultado = {}
+    inicio = time.perf_counter()
+    async with _sessao(modo, porta_sse) as session:
+        await session.initialize()
+        resultado["conexao_ms"] = round((time.perf_counter() - inicio) * 1000, 3)
+        for nome in tools:
+            # Aquecimento: primeira chamada abre conexões e importa módulos
+            await session.call_tool(nome, {})
+            amostras = []
+            for _ in range(repeticoes):
+                t0 = time.perf_counter()
+                await session.call_tool(nome, {})
+                amostras.append((time.perf_counter() - t0) * 1000)
+            resultado[nome] = resumo(amostras)
+    return resultado
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modos", default="stdio,sse,memoria")
+    parser.add_argument("--tools", default=",".join(TOOLS_PADRAO))
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--porta-sse", type=int, default=8765)
+    args = parser.parse_args()
+
+    tools = [t for t in args.tools.split(",") if t]
+    saida = {
+        "benchmark":         "transporte_mcp",
+        **metadados(),
+        "boletim_api_modo":  os.getenv("BOLETIM_API_MODO", "http"),
+        "repeticoes":        args.repeticoes,
+        "modos":             {},
+    }
+    for modo in [m for m in args.modos.split(",") if m]:
+        try:
+            saida["modos"][modo] = await medir_modo(modo, tools, args.repeticoes, args.porta_sse)
+        except Exception as e:
+            saida["modos"][modo] = {"erro": repr(e)}
+
+    print(json.dumps(saida, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
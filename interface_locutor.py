@@ -10,25 +10,43 @@ Uso:
 Variáveis de ambiente:
   LLM_MODO=ollama  → usa Ollama local (padrão, requer GPU)
   LLM_MODO=groq    → usa Groq API (recomendado para hardware modesto)
+  MCP_POOL_TAMANHO=2 → quantidade de subprocessos servidor_mcp.py no pool
+  MCP_TRANSPORTE=stdio   → subprocesso servidor_mcp.py (padrão)
+  MCP_TRANSPORTE=sse     → conecta a um servidor_mcp.py já rodando (MCP_SSE_URL)
+  MCP_TRANSPORTE=memoria → monta o servidor MCP no próprio processo
+  MONITOR_LOOP=1   → mede o atraso do event loop e captura quem o bloqueia
+                     (GET /diagnostico/loop)
 """
 
 import asyncio
+import hashlib
 import json
+from collections import OrderedDict, deque
 from contextlib import asynccontextmanager
 import logging
 import os
+import re
 import sys
+import time
+import unicodedata
 from datetime import datetime
 from pathlib import Path
 
-import requests
+import anyio
+import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import MCPError
+from mcp.types import CONNECTION_CLOSED
+from opentelemetry import trace
+
+from telemetria import LoopMonitor, configurar_tracing
 
 # ================================================
 # CONFIGURAÇÃO
@@ -45,7 +63,7 @@ OLLAMA_MODELO   = os.getenv("OLLAMA_MODELO", "qwen2.5:7b")
 
 # Groq
 GROQ_API_KEY    = os.getenv("GROQ_API_KEY",  "")
-GROQ_URL        = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_URL        = os.getenv("GROQ_BASE_URL", "https://api.groq.com") + "/openai/v1/chat/completions"
 GROQ_MODELO     = os.getenv("GROQ_MODELO",   "meta-llama/llama-4-scout-17b-16e-instruct")
 
 # Modelo ativo (para exibição no status)
@@ -59,6 +77,27 @@ PORTA_WEB       = int(os.getenv("PORTA_WEB", "5000"))
 # Limite de trocas no histórico antes de alertar
 LIMITE_HISTORICO = int(os.getenv("LIMITE_HISTORICO", "10"))
 
+# Cache de respostas somente-leitura (0 desativa)
+CACHE_RESPOSTAS_TTL = int(os.getenv("CACHE_RESPOSTAS_TTL", "300"))
+CACHE_RESPOSTAS_MAX = int(os.getenv("CACHE_RESPOSTAS_MAX", "256"))
+
+# Tools cujas respostas podem ser reaproveitadas enquanto o histórico não mudar
+TOOLS_SOMENTE_LEITURA = {"listar_historico", "ler_boletim"}
+# Tools que alteram o histórico ou os agendamentos — nunca cacheadas e invalidam o cache
+TOOLS_MUTAVEIS = {"gerar_boletim", "gerar_boletins_por_categoria", "deletar_boletim", "deletar_boletins_em_lote",
+                  "criar_agendamento", "remover_agendamento"}
+
+# Transporte até o servidor MCP: "stdio", "sse" ou "memoria"
+MCP_TRANSPORTE  = os.getenv("MCP_TRANSPORTE", "stdio")
+MCP_SSE_URL     = os.getenv("MCP_SSE_URL",    "http://localhost:8001/sse")
+
+# Pool de sessões com o servidor MCP
+MCP_POOL_TAMANHO          = int(os.getenv("MCP_POOL_TAMANHO", "2"))
+MCP_HEALTHCHECK_INTERVALO = float(os.getenv("MCP_HEALTHCHECK_INTERVALO", "15"))
+MCP_HEALTHCHECK_TIMEOUT   = float(os.getenv("MCP_HEALTHCHECK_TIMEOUT", "10"))
+MCP_TIMEOUT_INICIO        = float(os.getenv("MCP_TIMEOUT_INICIO", "30"))
+MCP_TIMEOUT_TOOL          = float(os.getenv("MCP_TIMEOUT_TOOL", "300"))
+
 _BASE           = Path(__file__).parent
 SERVIDOR_PYTHON = str(_BASE / ".venv" / "bin" / "python")
 SERVIDOR_SCRIPT = str(_BASE / "servidor_mcp.py")
@@ -73,6 +112,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("boletim.web")
 
+configurar_tracing("boletim-locutor")
+tracer = trace.get_tracer("boletim.locutor")
+monitor_loop = LoopMonitor()
+# Chamadas ao LLM e ao backend sem bloquear o event loop (as outras conversas seguem)
+cliente_http = httpx.AsyncClient()
+
 def registrar(evento: str, detalhe: str = ""):
     logger.info(json.dumps({
         "timestamp": datetime.now().isoformat(),
@@ -97,12 +142,17 @@ Quando listar boletins, use este formato simples:
 Ferramentas disponíveis:
 - verificar_api: verifica se o sistema está online
 - gerar_boletim: APENAS para criar um novo boletim do zero
+- gerar_boletins_por_categoria: cria VÁRIOS boletins novos de uma vez, um por categoria
 - confirmar_audio: confirma que o áudio foi gerado
 - listar_historico: lista boletins JÁ EXISTENTES no histórico
 - ler_boletim: lê o texto completo de um boletim pelo id
 - deletar_boletim: remove um boletim pelo id
 - deletar_boletins_em_lote: remove vários boletins de uma vez
 - regenerar_audio: converte texto em fala
+- boletim_pronto: entrega o boletim pré-produzido mais recente, pronto para ir ao ar
+- listar_agendamentos: lista os agendamentos de pré-produção de boletins
+- criar_agendamento: agenda a pré-produção de um boletim (cron no horário de Brasília)
+- remover_agendamento: remove um agendamento pelo id
 
 Categorias: geral, esportes, tecnologia, politica, economia, saude, ciencia, mundo.
 
@@ -115,7 +165,9 @@ Regras:
      "quais boletins temos", "mostra os boletins de hoje", "histórico de boletins"
    - Usuário quer CRIAR um boletim novo → use gerar_boletim
      Exemplos: "gera um boletim", "cria um boletim de esportes", "quero um boletim novo"
-   NUNCA use gerar_boletim para responder perguntas sobre boletins existentes.
+   - Usuário quer CRIAR vários boletins, um por categoria → use gerar_boletins_por_categoria
+     Exemplos: "gera um boletim de cada categoria", "faz boletins de esportes, economia e política"
+   NUNCA use gerar_boletim nem gerar_boletins_por_categoria para responder perguntas sobre boletins existentes.
 4. Ao gerar um boletim novo, siga SEMPRE esta sequência obrigatória:
    a. Chame gerar_boletim com os parâmetros solicitados.
    b. Chame confirmar_audio com o filename retornado para validar o áudio.
@@ -126,50 +178,212 @@ Regras:
       Áudio: [filename] (disponível na pasta audio/ do sistema)
 
       [campo "texto" retornado por gerar_boletim — copie integralmente, sem resumir, sem cortar]
+   d. Com gerar_boletins_por_categoria, chame confirmar_audio para cada filename retornado e
+      liste uma linha por boletim: categoria, ID e áudio (ou o erro daquela categoria).
 
 5. Ao excluir boletins, siga esta sequência OBRIGATÓRIA:
    a. Chame deletar_boletim (para um boletim) ou deletar_boletins_em_lote (para vários).
    b. CRÍTICO: NUNCA confirme exclusão sem ter chamado a tool. Jamais invente o resultado de uma exclusão.
    c. Responda apenas com o que a tool retornou. Se a tool não foi chamada, NÃO diga que o boletim foi excluído.
 6. NUNCA invente links, URLs ou caminhos que não foram retornados pelas ferramentas.
-7. O texto do boletim deve aparecer COMPLETO e INTACTO, exatamente como retornado no campo "texto" de gerar_boletim."""
+7. O texto do boletim deve aparecer COMPLETO e INTACTO, exatamente como retornado no campo "texto" de gerar_boletim.
+8. Se o usuário vai entrar no ar e quer um boletim já pronto, use boletim_pronto e depois
+   confirmar_audio; se não houver boletim pronto, use gerar_boletim.
+9. Agendamentos: para consultar use listar_agendamentos; para criar, criar_agendamento; para
+   cancelar, remover_agendamento (sem o id, chame listar_agendamentos primeiro). Como na regra 5,
+   só confirme a criação ou a remoção depois de chamar a tool."""
 
 # ================================================
-# SESSÃO MCP GLOBAL
+# POOL DE SESSÕES MCP
 # ================================================
 
-class SessaoMCP:
-    def __init__(self):
-        self.session     = None
-        self.tools       = []
-        self.tools_names = []
-        self._ctx_stack  = []
-
-    async def iniciar(self):
-        params = StdioServerParameters(
+@asynccontextmanager
+async def _conectar_mcp():
+    """Abre uma ClientSession com o servidor MCP conforme MCP_TRANSPORTE."""
+    if MCP_TRANSPORTE == "memoria":
+        # Sem subprocesso nem JSON-RPC via pipe: o FastMCP roda neste processo
+        from fastmcp.client.transports import FastMCPTransport
+        import servidor_mcp
+        async with FastMCPTransport(servidor_mcp.mcp).connect_session() as session:
+            yield session
+        return
+
+    if MCP_TRANSPORTE == "sse":
+        transporte = sse_client(MCP_SSE_URL)
+    else:
+        transporte = stdio_client(StdioServerParameters(
             command=SERVIDOR_PYTHON,
             args=[SERVIDOR_SCRIPT]
-        )
-        cm1 = stdio_client(params)
-        read, write = await cm1.__aenter__()
-        self._ctx_stack.append(cm1)
+        ))
+    async with transporte as (read, write):
+        async with ClientSession(read, write) as session:
+            yield session
 
-        cm2 = ClientSession(read, write)
-        self.session = await cm2.__aenter__()
-        self._ctx_stack.append(cm2)
 
-        await self.session.initialize()
-        tools_mcp        = await self.session.list_tools()
-        self.tools       = tools_mcp.tools
-        self.tools_names = [t.name for t in self.tools]
-        registrar("sessao_iniciada", str(self.tools_names))
+class SessaoMCP:
+    """
+    Uma sessão com o servidor MCP (por padrão, um subprocesso servidor_mcp.py).
+    Cada sessão vive numa task própria (os context managers do MCP precisam
+    entrar e sair na mesma task), que faz health check periódico e recria o
+    subprocesso quando ele morre.
+    """
+
+    def __init__(self, indice: int):
+        self.indice     = indice
+        self.session    = None
+        self.tools      = []
+        self.em_uso     = 0
+        self.chamadas   = 0
+        self.falhas     = 0
+        self.reinicios  = 0
+        self._reiniciar = asyncio.Event()
+        self._encerrando = False
+        self._task      = None
+
+    @property
+    def saudavel(self) -> bool:
+        return self.session is not None and not self._reiniciar.is_set()
+
+    def iniciar(self):
+        self._task = asyncio.create_task(self._supervisionar())
+
+    def reiniciar(self, motivo: str = ""):
+        """Marca a sessão para ser recriada pela task supervisora."""
+        if not self._reiniciar.is_set():
+            registrar("sessao_mcp_reiniciando", f"#{self.indice} {motivo}")
+            self._reiniciar.set()
 
     async def encerrar(self):
-        for cm in reversed(self._ctx_stack):
+        self._encerrando = True
+        self._reiniciar.set()
+        if self._task:
             try:
-                await cm.__aexit__(None, None, None)
+                await asyncio.wait_for(self._task, timeout=10)
             except Exception:
-                pass
+                self._task.cancel()
+
+    async def _supervisionar(self):
+        espera = 1
+        while not self._encerrando:
+            self._reiniciar.clear()
+            try:
+                await self._executar()
+                espera = 1
+            except Exception as e:
+                registrar("sessao_mcp_falhou", f"#{self.indice}: {e}")
+            finally:
+                self.session = None
+            if self._encerrando:
+                break
+            self.reinicios += 1
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 30)
+
+    async def _executar(self):
+        async with _conectar_mcp() as session:
+            await session.initialize()
+            tools_mcp    = await session.list_tools()
+            self.tools   = tools_mcp.tools
+            self.session = session
+            registrar("sessao_iniciada", f"#{self.indice} ({MCP_TRANSPORTE}) {[t.name for t in self.tools]}")
+
+            # Health check: ping periódico até ser pedido reinício/encerramento
+            while not self._reiniciar.is_set():
+                try:
+                    await asyncio.wait_for(self._reiniciar.wait(), MCP_HEALTHCHECK_INTERVALO)
+                except asyncio.TimeoutError:
+                    try:
+                        await asyncio.wait_for(session.send_ping(), MCP_HEALTHCHECK_TIMEOUT)
+                    except Exception as e:
+                        self.reiniciar(f"health check falhou: {e!r}")
+
+    def estatisticas(self) -> dict:
+        return {
+            "indice":    self.indice,
+            "saudavel":  self.saudavel,
+            "em_uso":    self.em_uso,
+            "chamadas":  self.chamadas,
+            "falhas":    self.falhas,
+            "reinicios": self.reinicios,
+        }
+
+
+def _erro_de_conexao(erro: Exception) -> bool:
+    """True quando a falha indica sessão/subprocesso morto (vale tentar em outra)."""
+    if isinstance(erro, MCPError) and erro.error.code == CONNECTION_CLOSED:
+        return True
+    return isinstance(erro, (anyio.ClosedResourceError, anyio.BrokenResourceError,
+                             anyio.EndOfStream, BrokenPipeError, ConnectionError))
+
+
+class PoolMCP:
+    """
+    Pool de sessões MCP. Cada chamada de tool vai para a sessão saudável
+    menos ocupada; se o subprocesso cair no meio da chamada, a sessão é
+    recriada e, nas tools de leitura, a chamada é repetida uma vez em outra
+    sessão (as que alteram o histórico devolvem o erro).
+    """
+
+    def __init__(self, tamanho: int = MCP_POOL_TAMANHO):
+        self.sessoes = [SessaoMCP(i) for i in range(max(1, tamanho))]
+        # Últimas latências (ms) por tool, para /status e testes de carga
+        self.latencias = {}
+
+    @property
+    def tools(self):
+        for s in self.sessoes:
+            if s.tools:
+                return s.tools
+        return []
+
+    @property
+    def tools_names(self):
+        return [t.name for t in self.tools]
+
+    async def iniciar(self):
+        for s in self.sessoes:
+            s.iniciar()
+        # Aguarda ao menos uma sessão pronta; as demais sobem em paralelo
+        await self._escolher()
+        registrar("pool_mcp_iniciado", f"{len(self.sessoes)} sessão(ões)")
+
+    async def encerrar(self):
+        await asyncio.gather(*(s.encerrar() for s in self.sessoes))
+
+    async def _escolher(self) -> SessaoMCP:
+        prazo = time.monotonic() + MCP_TIMEOUT_INICIO
+        while True:
+            prontas = [s for s in self.sessoes if s.saudavel]
+            if prontas:
+                return min(prontas, key=lambda s: s.em_uso)
+            if time.monotonic() > prazo:
+                raise RuntimeError("Nenhuma sessão MCP disponível")
+            await asyncio.sleep(0.2)
+
+    async def call_tool(self, nome: str, args: dict):
+        # Só as de leitura são repetidas: se a sessão caiu depois de o servidor já ter
+        # executado a tool, repetir gerar_boletim/deletar_* faria a ação duas vezes
+        tentativas = 2 if nome in TOOLS_SOMENTE_LEITURA else 1
+        for tentativa in range(1, tentativas + 1):
+            s = await self._escolher()
+            s.em_uso   += 1
+            s.chamadas += 1
+            inicio = time.perf_counter()
+            try:
+                resultado = await s.session.call_tool(nome, args, read_timeout_seconds=MCP_TIMEOUT_TOOL)
+                self.latencias.setdefault(nome, deque(maxlen=500)).append(
+                    (time.perf_counter() - inicio) * 1000)
+                return resultado
+            except Exception as e:
+                s.falhas += 1
+                if not _erro_de_conexao(e):
+                    raise
+                s.reiniciar(f"'{nome}' falhou: {e!r}")
+                if tentativa == tentativas:
+                    raise
+                registrar("mcp_repetindo_chamada", f"{nome} (sessão #{s.indice} caiu)")
+            finally:
+                s.em_uso -= 1
 
     def tools_ollama(self):
         return [
@@ -184,8 +398,108 @@ class SessaoMCP:
             for t in self.tools
         ]
 
+    def estatisticas(self) -> list:
+        return [s.estatisticas() for s in self.sessoes]
+
+    def latencias_tools(self) -> dict:
+        """Mediana e p95 (ms) das chamadas recentes de cada tool."""
+        resumo = {}
+        for nome, amostras in self.latencias.items():
+            ordenadas = sorted(amostras)
+            resumo[nome] = {
+                "n":      len(ordenadas),
+                "p50_ms": round(ordenadas[len(ordenadas) // 2], 1),
+                "p95_ms": round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))], 1),
+            }
+        return resumo
 
-sessao = SessaoMCP()
+
+sessao = PoolMCP()
+
+# ================================================
+# CACHE DE RESPOSTAS
+# ================================================
+
+def _normalizar_pergunta(texto: str) -> str:
+    """Reduz variações triviais: caixa, acentos, pontuação e espaços."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+class CacheRespostas:
+    """
+    Cache LRU de respostas do assistente.
+    A chave combina a pergunta normalizada, o histórico da conversa e o
+    carimbo de versão do histórico de boletins — qualquer criação ou
+    exclusão de boletim muda a versão e torna as entradas antigas inúteis.
+    """
+
+    def __init__(self, ttl: int = CACHE_RESPOSTAS_TTL, maximo: int = CACHE_RESPOSTAS_MAX):
+        self.ttl     = ttl
+        self.maximo  = maximo
+        self._itens  = OrderedDict()
+        self.acertos = 0
+        self.falhas  = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self.ttl > 0 and self.maximo > 0
+
+    def chave(self, pergunta: str, historico_anterior: list, versao: str) -> str:
+        contexto = [
+            (m.get("role"), _normalizar_pergunta(str(m.get("content") or "")))
+            for m in (historico_anterior or [])
+            if m.get("role") != "system"
+        ]
+        bruto = json.dumps([_normalizar_pergunta(pergunta), contexto, versao], ensure_ascii=False)
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+    def obter(self, chave: str):
+        item = self._itens.get(chave)
+        if item is None:
+            self.falhas += 1
+            return None
+        expira_em, resposta = item
+        if expira_em < time.monotonic():
+            del self._itens[chave]
+            self.falhas += 1
+            return None
+        self._itens.move_to_end(chave)
+        self.acertos += 1
+        return resposta
+
+    def guardar(self, chave: str, resposta: str):
+        self._itens[chave] = (time.monotonic() + self.ttl, resposta)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.maximo:
+            self._itens.popitem(last=False)
+
+    def limpar(self):
+        self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        return {
+            "ativo":    self.ativo,
+            "entradas": len(self._itens),
+            "acertos":  self.acertos,
+            "falhas":   self.falhas,
+        }
+
+
+cache_respostas = CacheRespostas()
+
+
+async def _versao_historico():
+    """Consulta o carimbo de versão do histórico no backend (None se indisponível)."""
+    try:
+        r = await cliente_http.get(f"{BOLETIM_API_URL}/api/historico/versao", timeout=3)
+        r.raise_for_status()
+        return r.json().get("versao")
+    except Exception as e:
+        registrar("cache_versao_indisponivel", str(e))
+        return None
 
 # ================================================
 # CONVERSA COM OLLAMA
@@ -218,7 +532,7 @@ def _preparar_historico_groq(historico: list) -> list:
     return resultado
 
 
-def _chamar_llm(historico: list) -> dict:
+async def _chamar_llm(historico: list) -> dict:
     """Chama o LLM configurado (Ollama ou Groq) e retorna a resposta."""
     llm_modo   = os.getenv("LLM_MODO",    LLM_MODO)
     groq_key   = os.getenv("GROQ_API_KEY", GROQ_API_KEY)
@@ -226,7 +540,7 @@ def _chamar_llm(historico: list) -> dict:
     if llm_modo == "groq":
         if not groq_key:
             raise ValueError("GROQ_API_KEY não configurada no .env")
-        resp = requests.post(
+        resp = (await cliente_http.post(
             GROQ_URL,
             headers={
                 "Authorization": f"Bearer {groq_key}",
@@ -240,7 +554,7 @@ def _chamar_llm(historico: list) -> dict:
                 "stream":      False
             },
             timeout=60
-        ).json()
+        )).json()
         # Groq usa formato OpenAI — normaliza para o formato interno
         if "choices" not in resp:
             raise ValueError(resp.get("error", {}).get("message", "Resposta inesperada do Groq"))
@@ -280,7 +594,7 @@ def _chamar_llm(historico: list) -> dict:
     else:
         # Ollama
         ollama_model = os.getenv("OLLAMA_MODELO", OLLAMA_MODELO)
-        resp = requests.post(
+        resp = (await cliente_http.post(
             os.getenv("OLLAMA_URL", OLLAMA_URL),
             json={
                 "model":    ollama_model,
@@ -289,7 +603,7 @@ def _chamar_llm(historico: list) -> dict:
                 "stream":   False
             },
             timeout=300
-        ).json()
+        )).json()
         if "message" not in resp:
             raise ValueError(resp.get("error", "Resposta inesperada do Ollama"))
         return resp
@@ -330,6 +644,8 @@ def _coerce_args(tool_name: str, args: dict) -> dict:
                 coerced[key] = float(value)
             except (ValueError, TypeError):
                 pass
+        elif expected == "boolean" and isinstance(value, str):
+            coerced[key] = value.strip().lower() in ("true", "1", "sim")
     return coerced
 
 
@@ -338,6 +654,13 @@ async def conversar(pergunta: str, historico_anterior: list = None) -> str:
     Processa uma pergunta com histórico de conversa opcional.
     historico_anterior: lista de {"role": "user"|"assistant", "content": str}
     """
+    with tracer.start_as_current_span("locutor.conversar") as span:
+        span.set_attribute("locutor.pergunta_chars", len(pergunta))
+        span.set_attribute("locutor.historico_msgs", len(historico_anterior or []))
+        return await _conversar(pergunta, historico_anterior)
+
+
+async def _conversar(pergunta: str, historico_anterior: list = None) -> str:
     # Monta o histórico completo
     historico = [{"role": "system", "content": SYSTEM_PROMPT}]
 
@@ -349,10 +672,27 @@ async def conversar(pergunta: str, historico_anterior: list = None) -> str:
 
     historico.append({"role": "user", "content": pergunta})
 
+    # Respostas somente-leitura já produzidas para esta versão do histórico
+    chave_cache = None
+    if cache_respostas.ativo:
+        versao = await _versao_historico()
+        if versao is not None:
+            chave_cache = cache_respostas.chave(pergunta, historico_anterior, versao)
+            resposta_cache = cache_respostas.obter(chave_cache)
+            if resposta_cache is not None:
+                registrar("resposta_cache", resposta_cache[:200])
+                trace.get_current_span().set_attribute("locutor.cache", True)
+                return resposta_cache
+
+    tools_usadas = set()
+
     while True:
         try:
-            resp = _chamar_llm(historico)
-        except requests.exceptions.Timeout:
+            with tracer.start_as_current_span("llm.chamada") as span_llm:
+                span_llm.set_attribute("llm.modo", os.getenv("LLM_MODO", LLM_MODO))
+                span_llm.set_attribute("llm.mensagens", len(historico))
+                resp = await _chamar_llm(historico)
+        except httpx.TimeoutException:
             return "O modelo demorou para responder. Tente novamente."
         except Exception as e:
             registrar("erro_llm", str(e))
@@ -365,8 +705,11 @@ async def conversar(pergunta: str, historico_anterior: list = None) -> str:
             for tc in msg["tool_calls"]:
                 nome = tc["function"]["name"]
                 args = _coerce_args(nome, tc["function"].get("arguments"))
+                tools_usadas.add(nome)
+                if nome in TOOLS_MUTAVEIS:
+                    cache_respostas.limpar()
                 try:
-                    resultado = await sessao.session.call_tool(nome, args)
+                    resultado = await sessao.call_tool(nome, args)
                     conteudo  = resultado.content[0].text if resultado.content else "sem resultado"
                     logger.info(json.dumps({
                         "timestamp": datetime.now().isoformat(),
@@ -386,6 +729,9 @@ async def conversar(pergunta: str, historico_anterior: list = None) -> str:
                 historico.append(tool_msg)
         else:
             registrar("resposta", msg["content"][:200])
+            # Só cacheia respostas que consultaram o histórico sem alterá-lo
+            if chave_cache and tools_usadas and tools_usadas <= TOOLS_SOMENTE_LEITURA:
+                cache_respostas.guardar(chave_cache, msg["content"])
             return msg["content"]
 
 # ================================================
@@ -395,6 +741,7 @@ async def conversar(pergunta: str, historico_anterior: list = None) -> str:
 @asynccontextmanager
 async def lifespan(app):
     # startup
+    await monitor_loop.start_if_enabled()
     await sessao.iniciar()
     print(f"\n[Sistema] Interface do locutor iniciada.")
     print(f"[Sistema] Acesse: http://localhost:{PORTA_WEB}")
@@ -402,6 +749,8 @@ async def lifespan(app):
     yield
     # shutdown
     await sessao.encerrar()
+    await cliente_http.aclose()
+    await monitor_loop.stop()
     registrar("sessao_encerrada")
 
 app = FastAPI(title="Boletim ON AIR — Assistente", lifespan=lifespan)
@@ -448,7 +797,7 @@ async def llm_reload():
 @app.get("/status")
 async def status():
     try:
-        r = requests.get(f"{BOLETIM_API_URL}/health", timeout=5)
+        r = await cliente_http.get(f"{BOLETIM_API_URL}/health", timeout=5)
         api_ok = r.status_code == 200
     except Exception:
         api_ok = False
@@ -459,11 +808,21 @@ async def status():
     return JSONResponse({
         "api_boletim": "online" if api_ok else "offline",
         "tools":       sessao.tools_names,
+        "transporte_mcp": MCP_TRANSPORTE,
+        "sessoes_mcp": sessao.estatisticas(),
+        "latencia_tools": sessao.latencias_tools(),
         "modelo":      modelo_ativo,
         "llm_modo":    llm_modo,
-        "limite_historico": LIMITE_HISTORICO
+        "limite_historico": LIMITE_HISTORICO,
+        "cache_respostas":  cache_respostas.estatisticas()
     })
 
+
+@app.get("/diagnostico/loop")
+async def diagnostico_loop(limite: int = 10):
+    """Atraso do event loop e os trechos que mais o bloquearam (MONITOR_LOOP=1)."""
+    return JSONResponse(monitor_loop.report(limite))
+
 @app.get("/", response_class=HTMLResponse)
 async def pagina_principal():
     return HTMLResponse(HTML_INTERFACE)
@@ -783,9 +1142,9 @@ if __name__ == "__main__":
 
     # Verifica pré-requisitos
     erros = []
-    if not Path(SERVIDOR_PYTHON).exists():
+    if MCP_TRANSPORTE == "stdio" and not Path(SERVIDOR_PYTHON).exists():
         erros.append(f"Python do venv não encontrado: {SERVIDOR_PYTHON}")
-    if not Path(SERVIDOR_SCRIPT).exists():
+    if MCP_TRANSPORTE != "sse" and not Path(SERVIDOR_SCRIPT).exists():
         erros.append(f"servidor_mcp.py não encontrado: {SERVIDOR_SCRIPT}")
     if erros:
         for e in erros:
@@ -793,7 +1152,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        r = requests.get(f"{BOLETIM_API_URL}/health", timeout=5)
+        r = httpx.get(f"{BOLETIM_API_URL}/health", timeout=5)
         print(f"[OK] Backend do Boletim online ({BOLETIM_API_URL})")
     except Exception:
         print(f"[AVISO] Backend não respondeu em {BOLETIM_API_URL}.")
@@ -1,37 +1,104 @@
 import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
 import httpx
 from dotenv import load_dotenv
 from fastmcp import FastMCP
 
+from telemetria import configurar_tracing, injetar_contexto
+
 load_dotenv()
+configurar_tracing("boletim-mcp")
 
 API_BASE = os.getenv("BOLETIM_API_URL", "http://localhost:8000")
 
-mcp = FastMCP("Boletim de Notícias")
+# "http"   → chama o backend FastAPI pela rede (padrão)
+# "direto" → importa o app do backend neste processo e chama as rotas via ASGI,
+#            sem socket nem processo intermediário
+API_MODO = os.getenv("BOLETIM_API_MODO", "http")
+
+# Faixa de prioridade dos pedidos deste servidor no backend: o locutor está no
+# ar, então passa à frente de lotes e agendamentos ("interativo" ou "lote")
+API_PRIORIDADE = os.getenv("BOLETIM_PRIORIDADE", "interativo")
+
+_client = None
+
+
+def _app_backend():
+    """Importa o FastAPI de backend/app no mesmo processo (modo direto)."""
+    caminho = str(Path(__file__).parent / "backend" / "app")
+    if caminho not in sys.path:
+        sys.path.insert(0, caminho)
+    import main as backend_main
+
+    return backend_main.app
+
+
+@asynccontextmanager
+async def _ciclo_de_vida(servidor):
+    """
+    No modo direto, roda o lifespan do backend (init_db e migrações,
+    config_sync, agendador e eleição de líder) antes de atender as tools
+    e o encerra junto com o servidor MCP: o ASGITransport não dispara
+    esses eventos sozinho.
+    """
+    global _client
+    if API_MODO != "direto":
+        yield
+        return
+    app = _app_backend()
+    async with app.router.lifespan_context(app):
+        try:
+            yield
+        finally:
+            if _client is not None:
+                await _client.aclose()
+                _client = None
+
+
+mcp = FastMCP("Boletim de Notícias", lifespan=_ciclo_de_vida)
+
+
+def _cliente() -> httpx.AsyncClient:
+    """Cliente HTTP compartilhado (reaproveita conexões entre chamadas de tools)."""
+    global _client
+    if _client is None:
+        # O hook propaga o trace da tool até as rotas do backend
+        hooks = {"request": [injetar_contexto]}
+        headers = {"X-Prioridade": API_PRIORIDADE}
+        if API_MODO == "direto":
+            _client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=_app_backend()),
+                base_url=API_BASE,
+                event_hooks=hooks,
+                headers=headers
+            )
+        else:
+            _client = httpx.AsyncClient(base_url=API_BASE, event_hooks=hooks, headers=headers)
+    return _client
 
 
 async def _post(endpoint: str, payload: dict) -> dict:
     """Faz uma requisição POST ao FastAPI interno."""
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(f"{API_BASE}{endpoint}", json=payload)
-        response.raise_for_status()
-        return response.json()
+    response = await _cliente().post(endpoint, json=payload, timeout=120.0)
+    response.raise_for_status()
+    return response.json()
 
 
-async def _get(endpoint: str) -> dict | list:
-    """Faz uma requisição GET ao FastAPI interno."""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(f"{API_BASE}{endpoint}")
-        response.raise_for_status()
-        return response.json()
+async def _get(endpoint: str, params: dict | None = None) -> dict | list:
+    """Faz uma requisição GET ao FastAPI interno (query string codificada pelo httpx)."""
+    response = await _cliente().get(endpoint, params=params, timeout=30.0)
+    response.raise_for_status()
+    return response.json()
 
 
 async def _delete(endpoint: str) -> dict:
     """Faz uma requisição DELETE ao FastAPI interno."""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.delete(f"{API_BASE}{endpoint}")
-        response.raise_for_status()
-        return response.json()
+    response = await _cliente().delete(endpoint, timeout=30.0)
+    response.raise_for_status()
+    return response.json()
 
 
 # ================================================================
@@ -44,10 +111,14 @@ async def gerar_boletim(
     num_artigos: int = 10,
     estilo: str = "jornalistico",
     motor_tts: str = "gtts",
-    modo_resumo: str = "none"
+    modo_resumo: str = "none",
+    ignorar_cache: bool = False,
+    chave_idempotencia: str | None = None
 ) -> dict:
     """Gera um boletim de notícias NOVO com áudio MP3. Use APENAS para criar boletins novos.
     NÃO use para listar, consultar ou mostrar boletins já existentes — use listar_historico.
+    Se o locutor vai entrar no ar agora, tente antes boletim_pronto: um boletim
+    pré-produzido por agendamento sai na hora, sem esperar a geração.
     Use esta tool quando o usuário disser frases como:
     'gera um boletim', 'cria um boletim', 'quero um boletim novo',
     'faz um boletim de esportes', 'gera 5 notícias de tecnologia'.
@@ -58,6 +129,10 @@ async def gerar_boletim(
     Parâmetro motor_tts: 'gtts' para voz Google gratuita ou
     'elevenlabs' para voz premium.
     Parâmetro modo_resumo: 'none' para texto direto, 'groq' para resumo por IA.
+    Parâmetro ignorar_cache: true para forçar um novo resumo por IA mesmo que
+    as notícias sejam as mesmas de um boletim recente ('refaz o resumo').
+    Parâmetro chave_idempotencia: identificador livre do pedido; repetir a
+    chamada com a mesma chave devolve o mesmo boletim em vez de gerar outro.
     Após gerar, sempre chame confirmar_audio com o filename retornado.
     Retorna id, nome do arquivo de áudio, categorias e texto completo do boletim."""
     try:
@@ -67,8 +142,10 @@ async def gerar_boletim(
             "style": estilo,
             "tts_engine": motor_tts,
             "summary_mode": modo_resumo,
+            "bypass_summary_cache": ignorar_cache,
             "include_intro": True,
-            "include_outro": True
+            "include_outro": True,
+            "idempotency_key": chave_idempotencia
         })
         return {
             "id": resultado.get("id"),
@@ -85,6 +162,51 @@ async def gerar_boletim(
         return {"erro": str(e)}
 
 
+@mcp.tool()
+async def gerar_boletins_por_categoria(
+    categorias: list[str],
+    num_artigos: int = 5,
+    estilo: str = "jornalistico",
+    motor_tts: str = "gtts",
+    modo_resumo: str = "none"
+) -> dict:
+    """Gera VÁRIOS boletins de uma vez, um para cada categoria, com áudio MP3 cada.
+    Bem mais rápido do que chamar gerar_boletim várias vezes seguidas.
+    Use esta tool quando o usuário disser frases como:
+    'gera um boletim de cada categoria', 'faz boletins de esportes, economia e política',
+    'quero um boletim separado para cada tema', 'prepara os boletins do programa'.
+    Parâmetro categorias: uma categoria por boletim (mesmos valores de gerar_boletim).
+    Demais parâmetros valem para todos os boletins do lote.
+    Após gerar, chame confirmar_audio com cada filename retornado.
+    Retorna, para cada categoria, id e áudio do boletim ou o erro."""
+    try:
+        resultado = await _post("/api/generate-boletins", {"boletins": [
+            {
+                "categories": [categoria],
+                "num_articles": num_artigos,
+                "style": estilo,
+                "tts_engine": motor_tts,
+                "summary_mode": modo_resumo
+            }
+            for categoria in categorias
+        ]})
+        boletins = []
+        for categoria, item in zip(categorias, resultado.get("boletins", [])):
+            boletim = item.get("boletim")
+            if boletim:
+                boletins.append({"categoria": categoria, "id": boletim.get("id"),
+                                 "audio": boletim.get("audio_filename")})
+            else:
+                boletins.append({"categoria": categoria, "erro": item.get("error")})
+        return {"boletins": boletins, "tempo_s": resultado.get("elapsed_s")}
+    except httpx.HTTPStatusError as e:
+        return {"erro": f"API retornou status {e.response.status_code}: {e.response.text}"}
+    except httpx.ConnectError:
+        return {"erro": "Não foi possível conectar à API. Verifique se o Docker está rodando."}
+    except Exception as e:
+        return {"erro": str(e)}
+
+
 @mcp.tool()
 async def regenerar_audio(
     texto: str,
@@ -200,6 +322,142 @@ async def deletar_boletins_em_lote(ate_id: int) -> dict:
         return {"erro": str(e)}
 
 
+@mcp.tool()
+async def boletim_pronto(categorias: list[str] | None = None, idade_max_min: int | None = None) -> dict:
+    """Retorna o boletim pré-produzido (por um agendamento) mais recente, pronto para ir ao ar.
+    Use esta tool quando o usuário disser frases como:
+    'vou entrar no ar', 'tem boletim pronto?', 'me dá o boletim das 7',
+    'qual o boletim de esportes pronto', 'preciso de um boletim agora'.
+    Parâmetro categorias: exatamente as categorias do boletim desejado
+    (omitir = qualquer boletim pré-produzido).
+    Parâmetro idade_max_min: idade máxima em minutos (padrão do servidor: 120).
+    Se não houver boletim pronto, use gerar_boletim.
+    Após obter, chame confirmar_audio com o filename retornado."""
+    params = {}
+    if categorias:
+        params["categorias"] = ",".join(categorias)
+    if idade_max_min is not None:
+        params["idade_max_min"] = idade_max_min
+    try:
+        resultado = await _get("/api/boletim-pronto", params=params)
+        return {
+            "id": resultado.get("id"),
+            "audio": resultado.get("audio_filename"),
+            "categorias": resultado.get("categories"),
+            "gerado_em": resultado.get("timestamp"),
+            "texto": resultado.get("summary_text", ""),
+            "status": "boletim pronto"
+        }
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return {"status": "nenhum boletim pronto", "sugestao": "use gerar_boletim"}
+        return {"erro": f"API retornou status {e.response.status_code}: {e.response.text}"}
+    except httpx.ConnectError:
+        return {"erro": "Não foi possível conectar à API. Verifique se o Docker está rodando."}
+    except Exception as e:
+        return {"erro": str(e)}
+
+
+@mcp.tool()
+async def listar_agendamentos() -> str:
+    """Lista os agendamentos de pré-produção de boletins.
+    Use esta tool quando o usuário disser frases como:
+    'quais boletins estão agendados', 'mostra os agendamentos',
+    'que horas sai o próximo boletim', 'o agendamento rodou?'.
+    Retorna id, nome, expressão cron, categorias, próxima execução (UTC),
+    último boletim gerado e último erro de cada agendamento."""
+    try:
+        agendamentos = await _get("/api/agendamentos")
+        if not agendamentos:
+            return "Nenhum agendamento cadastrado."
+        linhas = []
+        for a in agendamentos:
+            linha = (f"ID {a['id']} | {a['name']} | '{a['cron']}' | {a['categories']} | "
+                     f"{'ativo' if a['enabled'] else 'pausado'} | "
+                     f"próxima: {(a.get('next_run_at') or '?')[:16]} UTC | "
+                     f"último boletim: {a.get('last_boletim_id') or '-'}")
+            if a.get("last_error"):
+                linha += f" | último erro: {a['last_error']}"
+            linhas.append(linha)
+        return "\n".join(linhas)
+    except httpx.ConnectError:
+        return "Erro: API não está respondendo. Verifique se o Docker está rodando."
+    except Exception as e:
+        return f"Erro: {str(e)}"
+
+
+@mcp.tool()
+async def criar_agendamento(
+    nome: str,
+    cron: str,
+    categorias: list[str] = ["geral"],
+    num_artigos: int = 10,
+    estilo: str = "jornalistico",
+    motor_tts: str = "gtts",
+    modo_resumo: str | None = None
+) -> dict:
+    """Agenda a pré-produção de um boletim, para que fique pronto antes de ir ao ar.
+    Use esta tool quando o usuário disser frases como:
+    'deixa um boletim de esportes pronto todo dia às 7',
+    'agenda um boletim geral de hora em hora', 'quero boletim pronto antes do programa'.
+    Parâmetro cron: expressão de 5 campos (minuto hora dia mês dia-da-semana)
+    no horário de Brasília. Agende alguns minutos ANTES do horário no ar:
+    boletim pronto às 7h de segunda a sexta = '50 6 * * 1-5';
+    de hora em hora = '55 * * * *'.
+    Demais parâmetros: os mesmos de gerar_boletim."""
+    try:
+        return await _post("/api/agendamentos", {
+            "name": nome,
+            "cron": cron,
+            "categories": categorias,
+            "num_articles": num_artigos,
+            "style": estilo,
+            "tts_engine": motor_tts,
+            "summary_mode": modo_resumo
+        })
+    except httpx.HTTPStatusError as e:
+        return {"erro": f"API retornou status {e.response.status_code}: {e.response.text}"}
+    except httpx.ConnectError:
+        return {"erro": "Não foi possível conectar à API. Verifique se o Docker está rodando."}
+    except Exception as e:
+        return {"erro": str(e)}
+
+
+@mcp.tool()
+async def remover_agendamento(id: int) -> dict:
+    """Remove um agendamento de pré-produção (os boletins já gerados continuam no histórico).
+    Use esta tool quando o usuário disser frases como:
+    'cancela o agendamento', 'não precisa mais do boletim das 7', 'remove o agendamento X'.
+    Se o usuário não informar o id, chame listar_agendamentos primeiro."""
+    try:
+        return await _delete(f"/api/agendamentos/{id}")
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return {"erro": f"Agendamento id={id} não encontrado."}
+        return {"erro": f"API retornou status {e.response.status_code}"}
+    except httpx.ConnectError:
+        return {"erro": "Não foi possível conectar à API. Verifique se o Docker está rodando."}
+    except Exception as e:
+        return {"erro": str(e)}
+
+
+def _resumir_cotas(cotas: dict) -> dict:
+    """Frases curtas para o locutor, ex.: 'gnews': '37/100 requisições hoje (63 restantes)'."""
+    unidades = {"requests": "requisições", "characters": "caracteres"}
+    periodos = {"requests": "hoje", "characters": "no mês"}
+    resumo = {}
+    for nome, c in cotas.items():
+        unidade = unidades.get(c.get("unit"), c.get("unit"))
+        periodo = periodos.get(c.get("unit"), "")
+        if not c.get("limit"):
+            resumo[nome] = f"{c.get('used', 0)} {unidade} {periodo} (sem limite configurado)"
+            continue
+        resumo[nome] = f"{c['used']}/{c['limit']} {unidade} {periodo} ({c['remaining']} restantes)"
+        if c.get("saving"):
+            resumo[nome] += " — modo economia ativo"
+    return resumo
+
+
 @mcp.tool()
 async def verificar_api() -> dict:
     """Verifica se o sistema de Boletim de Notícias está online e operacional.
@@ -208,7 +466,8 @@ async def verificar_api() -> dict:
     'sistema online', 'checa a API', 'diagnóstico'.
     Também use antes de gerar boletins se houver dúvida sobre disponibilidade.
     Retorna status, timestamp, motor de voz configurado, motor de resumo
-    e quais chaves de API estão configuradas no sistema."""
+    quais chaves de API estão configuradas no sistema e quanto resta das
+    cotas do GNews (requisições do dia) e da ElevenLabs (caracteres do mês)."""
     try:
         resultado = await _get("/health")
         config = await _get("/api/config")
@@ -219,7 +478,8 @@ async def verificar_api() -> dict:
             "summary_mode": config.get("AI_SUMMARY_MODE"),
             "gnews_configurado": bool(config.get("GNEWS_API_KEY")),
             "elevenlabs_configurado": bool(config.get("ELEVENLABS_API_KEY")),
-            "groq_configurado": bool(config.get("GROQ_API_KEY"))
+            "groq_configurado": bool(config.get("GROQ_API_KEY")),
+            "cotas": _resumir_cotas(config.get("QUOTAS") or {})
         }
     except httpx.ConnectError:
         return {"status": "offline", "erro": "API não está respondendo. Verifique se o Docker está rodando."}
@@ -236,23 +496,20 @@ async def confirmar_audio(filename: str) -> dict:
     Retorna se o arquivo existe, seu tamanho em bytes e a URL de acesso.
     Se o arquivo não existir, retorna erro descritivo."""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.head(
-                f"{API_BASE}/audio/{filename}"
-            )
-            if response.status_code == 200:
-                tamanho = response.headers.get("content-length", "desconhecido")
-                return {
-                    "existe": True,
-                    "filename": filename,
-                    "tamanho_bytes": tamanho,
-                    "url": f"{API_BASE}/audio/{filename}",
-                    "status": "áudio disponível"
-                }
+        response = await _cliente().head(f"/audio/{filename}", timeout=10.0)
+        if response.status_code == 200:
+            tamanho = response.headers.get("content-length", "desconhecido")
             return {
-                "existe": False,
-                "erro": f"Arquivo não encontrado (status {response.status_code})"
+                "existe": True,
+                "filename": filename,
+                "tamanho_bytes": tamanho,
+                "url": f"{API_BASE}/audio/{filename}",
+                "status": "áudio disponível"
             }
+        return {
+            "existe": False,
+            "erro": f"Arquivo não encontrado (status {response.status_code})"
+        }
     except Exception as e:
         return {"existe": False, "erro": str(e)}
 
@@ -0,0 +1,42 @@
+"""
+telemetria.py — Tracing OpenTelemetry dos processos do host
+(interface_locutor.py e servidor_mcp.py).
+
+O SDK do MCP já propaga o contexto do trace no campo _meta de cada chamada
+de tool; aqui só registramos o exportador e propagamos o contexto nas
+requisições HTTP para o backend (header W3C 'traceparent').
+
+O exportador e o monitor de bloqueios do event loop (opcional) são os mesmos
+da API: backend/app/tracing.py e backend/app/loop_monitor.py.
+
+Variáveis de ambiente:
+  TRACING_EXPORTADOR=none     → desativado (padrão)
+  TRACING_EXPORTADOR=console  → imprime os spans no stderr
+  TRACING_EXPORTADOR=arquivo  → grava em TRACING_ARQUIVO (JSON Lines)
+  MONITOR_LOOP=1              → liga o monitor do event loop
+  MONITOR_LOOP_LIMITE_MS=100  → atraso a partir do qual a pilha é capturada
+"""
+
+import os
+
+import httpx
+from opentelemetry.propagate import inject
+
+# Módulos do backend sem dependências da API, importados pelo caminho do pacote
+# (namespace backend.app, a partir da raiz do repositório) para não pôr
+# backend/app no sys.path e sombrear nomes como main, settings ou database
+from backend.app.loop_monitor import LoopMonitor  # noqa: F401 (reexportado)
+from backend.app.tracing import configurar_tracing as _configurar_tracing
+
+# No host o padrão é o diretório corrente (no container da API, /app/data)
+TRACING_ARQUIVO = os.getenv("TRACING_ARQUIVO", "traces.jsonl")
+
+
+def configurar_tracing(nome_servico: str):
+    """O mesmo TracerProvider da API (backend/app/tracing.py), com o arquivo do host."""
+    _configurar_tracing(nome_servico, arquivo=TRACING_ARQUIVO)
+
+
+async def injetar_contexto(request: httpx.Request):
+    """Event hook do httpx: adiciona 'traceparent' do span atual à requisição."""
+    inject(request.headers)